@@ -1,3 +1,4 @@
+import secrets
 from datetime import datetime, timezone
 from typing import Literal
 from uuid import UUID
@@ -5,11 +6,13 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
+from ldap3.core.exceptions import LDAPException
 from passlib.context import CryptContext
 from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from uuid6 import uuid7
 
-from src.api.dependencies import get_employee_repository, get_user_repository
+from src.api.dependencies import get_ad_auth_service, get_employee_repository, get_user_repository
+from src.application.services import AdAuthService
 from src.domain.models.user import User
 from src.infrastructure.repositories import EmployeeRepository, UserRepository
 
@@ -97,6 +100,7 @@ def create_access_token(subject: str, issued_at: int, expires_delta: int) -> str
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     user_repository: UserRepository = Depends(get_user_repository),
+    employee_repository: EmployeeRepository = Depends(get_employee_repository),
 ) -> User:
     """
     1. Достаём токен из заголовка Authorization: Bearer <token>
@@ -104,6 +108,7 @@ async def get_current_user(
     3. Берём sub (user_id) из payload
     4. Ищем пользователя
     5. Проверяем, что токен не старее смены пароля
+    6. Проверяем, что сотрудник не архивирован: выданные ранее токены перестают действовать
     """
     token = credentials.credentials
 
@@ -136,6 +141,13 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+    if await employee_repository.is_archived(user.email):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Account is archived",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
     return user
 
 
@@ -165,12 +177,48 @@ async def register(
 async def login(
     payload: UserIn,
     user_repository: UserRepository = Depends(get_user_repository),
+    employee_repository: EmployeeRepository = Depends(get_employee_repository),
+    ad_auth_service: AdAuthService | None = Depends(get_ad_auth_service),
 ) -> Token:
     """
     Логин возвращает JWT, а не данные пользователя.
+    При включённом входе через AD пароль проверяется в AD; локальный хэш проверяется
+    только для учётных записей не из AD (например, администратора по умолчанию).
     """
+    ad_verified = None
+    if ad_auth_service is not None:
+        try:
+            ad_verified = await ad_auth_service.authenticate(payload.email, payload.password)
+        except (LDAPException, RuntimeError, TimeoutError):
+            raise HTTPException(status_code=503, detail="Active Directory is unavailable")
+
+        if ad_verified is None:
+            # Сотрудник из AD, которого AD больше не находит (удалён, сменил логин),
+            # не должен входить по оставшемуся локальному хэшу
+            employee = await employee_repository.get_by_email(payload.email, include_archived=True)
+            if employee is not None and employee.object_id:
+                raise HTTPException(status_code=401, detail="Invalid credentials")
+
     user = await user_repository.find_by_email(payload.email)
-    if not user or not verify_password(payload.password, user.password_hash):
+    if ad_verified is None:
+        if not user or not verify_password(payload.password, user.password_hash):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+    elif not ad_verified:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    elif not user:
+        # Сотрудник из AD входит впервые: заводим пользователя без пригодного локального пароля
+        if not await employee_repository.get_by_email(payload.email):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        user = User(
+            id=uuid7(),
+            email=payload.email,
+            password_hash=hash_password(secrets.token_urlsafe(32)),
+            role="user",
+        )
+        await user_repository.create(user)
+
+    # Верный пароль не даёт доступа уволенному или отключённому в AD сотруднику
+    if await employee_repository.is_archived(user.email):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     access_token = create_access_token(
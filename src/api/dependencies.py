@@ -1,9 +1,14 @@
+import threading
 from typing import AsyncGenerator
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.config import settings
+from src.infrastructure.cache import TTLCache, avatar_cache, position_cache
 from src.infrastructure.db.base import async_session_factory
+from src.infrastructure.ldap_client import AsyncLdapClient, LdapClient
+from src.infrastructure.ldap_pool import get_ldap_pool
 from src.infrastructure.repositories import (
     EmployeeRepository,
     PositionRepository,
@@ -11,7 +16,20 @@ from src.infrastructure.repositories import (
     UserRepository,
     AvatarRepository,
 )
-from src.application.services import AdImportService, AvatarService, UserService
+from src.application.services import (
+    AdAuthService,
+    AdImportRunner,
+    AvatarService,
+    DirectoryExportService,
+    EmployeeCsvImportService,
+    UserService,
+)
+
+ad_import_runner = AdImportRunner(async_session_factory)
+_ad_auth_service: AdAuthService | None = None
+# Синхронные зависимости FastAPI вызываются из пула потоков: без блокировки первые
+# параллельные логины создали бы несколько сервисов, а лишние никто бы не закрыл
+_ad_auth_service_lock = threading.Lock()
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -34,7 +52,7 @@ def get_employee_repository(session: AsyncSession = Depends(get_session)) -> Emp
 
 
 def get_position_repository(session: AsyncSession = Depends(get_session)) -> PositionRepository:
-    return PositionRepository(session)
+    return PositionRepository(session, cache=position_cache)
 
 
 def get_team_repository(session: AsyncSession = Depends(get_session)) -> TeamRepository:
@@ -42,7 +60,7 @@ def get_team_repository(session: AsyncSession = Depends(get_session)) -> TeamRep
 
 
 def get_avatar_repository(session: AsyncSession = Depends(get_session)) -> AvatarRepository:
-    return AvatarRepository(session)
+    return AvatarRepository(session, cache=avatar_cache)
 
 
 def get_user_service(
@@ -54,15 +72,61 @@ def get_user_service(
     return UserService(employee_repository, position_repository, user_repository, team_repository)
 
 
+def get_csv_import_service(
+    employee_repository: EmployeeRepository = Depends(get_employee_repository),
+    position_repository: PositionRepository = Depends(get_position_repository),
+    team_repository: TeamRepository = Depends(get_team_repository),
+    user_repository: UserRepository = Depends(get_user_repository),
+) -> EmployeeCsvImportService:
+    return EmployeeCsvImportService(employee_repository, position_repository, team_repository, user_repository)
+
+
 def get_avatar_service(
     avatar_repository: AvatarRepository = Depends(get_avatar_repository),
 ) -> AvatarService:
     return AvatarService(avatar_repository)
 
 
-def get_ad_import_service(
-    employee_repository: EmployeeRepository = Depends(get_employee_repository),
-    position_repository: PositionRepository = Depends(get_position_repository),
-    team_repository: TeamRepository = Depends(get_team_repository),
-) -> AdImportService:
-    return AdImportService(employee_repository, position_repository, team_repository)
+def get_directory_export_service() -> DirectoryExportService:
+    # Сессия запроса закрывается раньше, чем уходит потоковый ответ, поэтому передаётся фабрика
+    return DirectoryExportService(async_session_factory)
+
+
+def get_ad_import_runner() -> AdImportRunner:
+    return ad_import_runner
+
+
+def get_ad_auth_service() -> AdAuthService | None:
+    """Сервис входа через AD или None, если вход по паролю AD выключен."""
+    global _ad_auth_service
+
+    ad_settings = settings.ad
+    if ad_settings is None or not ad_settings.login_enabled:
+        return None
+
+    with _ad_auth_service_lock:
+        if _ad_auth_service is None:
+            client = LdapClient(
+                ad_settings.host,
+                base_dn=ad_settings.base_dn,
+                timeout=ad_settings.timeout,
+                pool=get_ldap_pool(),
+            )
+            _ad_auth_service = AdAuthService(
+                AsyncLdapClient(client, max_workers=ad_settings.pool_max_size, timeout=ad_settings.timeout),
+                TTLCache(ad_settings.login_cache_max_entries),
+                search_bases=ad_settings.search_bases,
+                success_ttl=ad_settings.login_success_ttl_seconds,
+                failure_ttl=ad_settings.login_failure_ttl_seconds,
+            )
+        return _ad_auth_service
+
+
+async def close_ad_auth_service() -> None:
+    global _ad_auth_service
+
+    with _ad_auth_service_lock:
+        service, _ad_auth_service = _ad_auth_service, None
+
+    if service is not None:
+        await service.close()
@@ -0,0 +1,54 @@
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Запас на заголовки частей и границы multipart сверх самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class MultipartSizeLimitMiddleware:
+    """
+    Ограничивает размер multipart-тела до того, как Starlette разберёт его во временный файл.
+    Запрос с большим Content-Length отклоняется сразу, остальные обрываются при превышении лимита по ходу чтения.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body is larger than {self.max_bytes} bytes"
+        content_length = self._header(scope, b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_CONTENT_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @classmethod
+    def _is_multipart(cls, scope: Scope) -> bool:
+        content_type = cls._header(scope, b"content-type") or ""
+        return content_type.lower().startswith("multipart/")
+
+    @staticmethod
+    def _header(scope: Scope, name: bytes) -> str | None:
+        for key, value in scope["headers"]:
+            if key.lower() == name:
+                return value.decode("latin-1")
+        return None
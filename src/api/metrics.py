@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from src.api.auth import get_current_user
+from src.application.dto import CacheStatsDTO, LdapPoolStatsDTO
+from src.domain.models.user import User
+from src.infrastructure.cache import avatar_cache
+from src.infrastructure.ldap_pool import get_ldap_pool
+
+router = APIRouter()
+
+
+@router.get("/metrics/avatar-cache", response_model=CacheStatsDTO)
+async def get_avatar_cache_stats(
+        current_user: User = Depends(get_current_user),
+) -> CacheStatsDTO:
+    """Счётчики попаданий/промахов/вытеснений кэша аватаров."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    return CacheStatsDTO.from_stats(avatar_cache.stats())
+
+
+@router.get("/metrics/ldap-pool", response_model=LdapPoolStatsDTO)
+async def get_ldap_pool_stats(
+        current_user: User = Depends(get_current_user),
+) -> LdapPoolStatsDTO:
+    """Размер и загрузка общего пула соединений к AD."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    try:
+        pool = get_ldap_pool()
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(error))
+
+    return LdapPoolStatsDTO.from_stats(pool.stats())
@@ -1,26 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from src.api.auth import get_current_user
-from src.api.dependencies import get_ad_import_service
-from src.application.dto import AdImportResultDTO
-from src.application.services import AdImportService
+from src.api.dependencies import get_ad_import_runner
+from src.application.dto import ImportRunDTO
+from src.application.services import AdImportRunner
+from src.application.services.ad_import import SyncMode
 from src.domain.models.user import User
 
 router = APIRouter()
 
 
-@router.post("/update", response_model=AdImportResultDTO)
+@router.post("/update", response_model=ImportRunDTO, status_code=status.HTTP_202_ACCEPTED)
 async def update_from_active_directory(
+        mode: SyncMode = Query("incremental"),
+        force_archive: bool = Query(False, alias="forceArchive"),
         current_user: User = Depends(get_current_user),
-        ad_import_service: AdImportService = Depends(get_ad_import_service),
-) -> AdImportResultDTO:
+        runner: AdImportRunner = Depends(get_ad_import_runner),
+) -> ImportRunDTO:
+    """Ставит импорт из AD в фон и сразу возвращает прогон; статус — GET /update/runs/{id}."""
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
         )
 
-    try:
-        result = await ad_import_service.update_from_ad()
-        return AdImportResultDTO(**result)
-    except ValueError as error:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+    run = await runner.start(mode, force_archive=force_archive)
+    if not run:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="AD import is already in progress"
+        )
+
+    return ImportRunDTO.from_run(run)
+
+
+@router.get("/update/runs", response_model=list[ImportRunDTO])
+async def list_import_runs(
+        limit: int = Query(20, ge=1, le=100),
+        current_user: User = Depends(get_current_user),
+        runner: AdImportRunner = Depends(get_ad_import_runner),
+) -> list[ImportRunDTO]:
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+
+    runs = await runner.get_recent_runs(limit)
+    return [ImportRunDTO.from_run(run) for run in runs]
+
+
+@router.get("/update/runs/{run_id}", response_model=ImportRunDTO)
+async def get_import_run(
+        run_id: UUID,
+        current_user: User = Depends(get_current_user),
+        runner: AdImportRunner = Depends(get_ad_import_runner),
+) -> ImportRunDTO:
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+
+    run = await runner.get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import run not found")
+
+    return ImportRunDTO.from_run(run)
@@ -1,26 +1,56 @@
+import secrets
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile, status
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 
 from src.api.dependencies import (
     get_avatar_service,
+    get_csv_import_service,
+    get_directory_export_service,
     get_employee_repository,
     get_user_service,
 )
 from src.api.auth import get_current_user, hash_password
 from src.application.dto import (
     AdminUserUpdatePayload,
+    CsvImportReportDTO,
     DetailResponse,
     UserDTO,
     UserUpdatePayload,
     UserCreatePayload,
 )
-from src.application.services import AvatarService, UserService
+from src.application.services import AvatarService, DirectoryExportService, EmployeeCsvImportService, UserService
+from src.application.services.csv_import import DEFAULT_POSITION
+from src.application.services.export import EXPORT_MEDIA_TYPES, ExportFormat
+from src.application.services.avatar import LARGE_SIZE, SMALL_SIZE
+from src.config import settings
 from src.domain.models.user import User
 from src.infrastructure.repositories import EmployeeRepository
 
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload_limited(file: UploadFile, max_bytes: int) -> bytes:
+    """Читает загруженный файл кусками и прерывается, как только превышен лимит."""
+    too_large = HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"File is larger than {max_bytes} bytes",
+    )
+
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise too_large
+
+    return bytes(buffer)
+
 
 @router.get("/users", response_model=list[UserDTO])
 async def get_users(
@@ -29,6 +59,23 @@ async def get_users(
     return await user_service.list_users()
 
 
+@router.get("/users/export")
+async def export_users(
+        export_format: ExportFormat = Query("csv", alias="format"),
+        current_user: User = Depends(get_current_user),
+        export_service: DirectoryExportService = Depends(get_directory_export_service),
+):
+    """Выгрузка справочника для HR: строки идут из серверного курсора прямо в ответ"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    return StreamingResponse(
+        export_service.stream(export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="users.{export_format}"'},
+    )
+
+
 @router.get("/users/{user_id}", response_model=UserDTO)
 async def get_user_by_id(
         user_id: UUID,
@@ -43,6 +90,34 @@ async def get_user_by_id(
     return user
 
 
+@router.get("/users/{user_id}/reports", response_model=list[UserDTO])
+async def get_user_reports(
+        user_id: UUID,
+        user_service: UserService = Depends(get_user_service),
+):
+    """Непосредственные подчинённые: явный manager_id или лидерство в командах"""
+    reports = await user_service.list_reports(user_id)
+
+    if reports is None:
+        raise HTTPException(status_code=404, detail=f"User with id '{user_id}' not found")
+
+    return reports
+
+
+@router.get("/users/{user_id}/chain", response_model=list[UserDTO])
+async def get_user_chain(
+        user_id: UUID,
+        user_service: UserService = Depends(get_user_service),
+):
+    """Руководители сотрудника снизу вверх, начиная с непосредственного"""
+    chain = await user_service.get_chain(user_id)
+
+    if chain is None:
+        raise HTTPException(status_code=404, detail=f"User with id '{user_id}' not found")
+
+    return chain
+
+
 @router.get("/me", response_model=UserDTO)
 async def get_me(
         current_user: User = Depends(get_current_user),
@@ -131,6 +206,36 @@ async def create_user(
     return created_user
 
 
+@router.post("/users/import", response_model=CsvImportReportDTO)
+async def import_users_csv(
+        request: Request,
+        team: str = Query(..., description="Корневая команда для новых сотрудников"),
+        position: str = Query(DEFAULT_POSITION),
+        current_user: User = Depends(get_current_user),
+        import_service: EmployeeCsvImportService = Depends(get_csv_import_service),
+):
+    """
+    Массовое заведение сотрудников из CSV (Name, SamAccountName, UserPrincipalName, Enabled).
+    Тело запроса — сам файл (text/csv): он разбирается по мере получения, без multipart.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
+    try:
+        report = await import_service.import_employees(
+            request.stream(),
+            team_name=team,
+            position_title=position,
+            creator=current_user,
+            # Один хэш на весь импорт: пароль никому не известен, вход — через AD или после смены пароля
+            password_hash=hash_password(secrets.token_urlsafe(32)),
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+    return report
+
+
 @router.post(
     "/users/{user_id}/avatar",
     status_code=status.HTTP_201_CREATED,
@@ -152,7 +257,7 @@ async def upload_avatar(
         if not current_employee or current_employee.id != user_id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot upload avatar for this user")
 
-    content = await file.read()
+    content = await read_upload_limited(file, settings.avatar.max_upload_bytes)
     try:
         await avatar_service.save_avatar(user_id, content)
     except ValueError as exc:
@@ -190,22 +295,44 @@ async def delete_avatar(
 @router.get("/users/{user_id}/avatar/large")
 async def get_large_avatar(
         user_id: UUID,
+        accept: str | None = Header(default=None),
         avatar_service: AvatarService = Depends(get_avatar_service),
 ):
-    avatar = await avatar_service.get_avatar(user_id)
-    if not avatar:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Avatar for user '{user_id}' not found")
-
-    return Response(content=avatar.image_large, media_type=avatar.mime_type)
+    return await _avatar_response(avatar_service, user_id, LARGE_SIZE, accept)
 
 
 @router.get("/users/{user_id}/avatar/small")
 async def get_small_avatar(
         user_id: UUID,
+        accept: str | None = Header(default=None),
+        avatar_service: AvatarService = Depends(get_avatar_service),
+):
+    return await _avatar_response(avatar_service, user_id, SMALL_SIZE, accept)
+
+
+@router.get("/users/{user_id}/avatar/{size}")
+async def get_avatar_of_size(
+        user_id: UUID,
+        size: int,
+        accept: str | None = Header(default=None),
         avatar_service: AvatarService = Depends(get_avatar_service),
 ):
-    avatar = await avatar_service.get_avatar(user_id)
-    if not avatar:
+    return await _avatar_response(avatar_service, user_id, size, accept)
+
+
+async def _avatar_response(
+        avatar_service: AvatarService,
+        user_id: UUID,
+        size: int,
+        accept: str | None,
+) -> Response:
+    mime_type = avatar_service.preferred_mime_type(accept)
+    try:
+        rendition = await avatar_service.get_rendition(user_id, size, mime_type)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+
+    if not rendition:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Avatar for user '{user_id}' not found")
 
-    return Response(content=avatar.image_small, media_type=avatar.mime_type)
+    return Response(content=rendition.content, media_type=rendition.mime_type, headers={"Vary": "Accept"})
@@ -1,9 +1,9 @@
 from pydantic import BaseModel, AliasChoices, Field, ConfigDict
 from typing import List, Optional, Literal
 from uuid import UUID
-from datetime import date
+from datetime import date, datetime
 
-from src.domain.models import Employee, Team, EmployeeStatus
+from src.domain.models import Employee, Team, EmployeeStatus, ImportRun
 from src.domain.utils.user import (
     build_full_name,
     build_short_name,
@@ -18,14 +18,100 @@ class PingResponse(BaseModel):
     ping: str
 
 
-class AdImportResultDTO(BaseModel):
+class ImportRunDTO(BaseModel):
+    id: UUID
+    status: Literal["queued", "running", "succeeded", "failed"]
+    mode: str
+    processed: int
+    imported: int | None = None
+    updated: int | None = None
+    archived: int | None = None
+    error: str | None = None
+    warning: str | None = None
+    createdAt: datetime
+    startedAt: datetime | None = None
+    finishedAt: datetime | None = None
+    heartbeatAt: datetime | None = None
+
+    @classmethod
+    def from_run(cls, run: ImportRun) -> "ImportRunDTO":
+        return cls(
+            id=run.id,
+            status=run.status,
+            mode=run.mode,
+            processed=run.processed,
+            imported=run.imported,
+            updated=run.updated,
+            archived=run.archived,
+            error=run.error,
+            warning=run.warning,
+            createdAt=run.created_at,
+            startedAt=run.started_at,
+            finishedAt=run.finished_at,
+            heartbeatAt=run.heartbeat_at,
+        )
+
+
+class CsvRowErrorDTO(BaseModel):
+    line: int
+    error: str
+
+
+class CsvImportReportDTO(BaseModel):
     imported: int
+    skipped: int
+    failed: int
+    errors: list[CsvRowErrorDTO]
 
 
 class DetailResponse(BaseModel):
     detail: str
 
 
+class CacheStatsDTO(BaseModel):
+    entries: int
+    sizeBytes: int
+    maxBytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @classmethod
+    def from_stats(cls, stats: dict[str, int]) -> "CacheStatsDTO":
+        return cls(
+            entries=stats["entries"],
+            sizeBytes=stats["size_bytes"],
+            maxBytes=stats["max_bytes"],
+            hits=stats["hits"],
+            misses=stats["misses"],
+            evictions=stats["evictions"],
+        )
+
+
+class LdapPoolStatsDTO(BaseModel):
+    size: int
+    inUse: int
+    idle: int
+    maxSize: int
+    created: int
+    discarded: int
+    acquired: int
+    waits: int
+
+    @classmethod
+    def from_stats(cls, stats: dict[str, int]) -> "LdapPoolStatsDTO":
+        return cls(
+            size=stats["size"],
+            inUse=stats["in_use"],
+            idle=stats["idle"],
+            maxSize=stats["max_size"],
+            created=stats["created"],
+            discarded=stats["discarded"],
+            acquired=stats["acquired"],
+            waits=stats["waits"],
+        )
+
+
 class TeamDTO(BaseModel):
     id: UUID
     name: str
@@ -170,6 +256,12 @@ class AdminUserUpdatePayload(UserUpdatePayload):
         validation_alias=AliasChoices("isAdmin", "is_admin"),
         serialization_alias="isAdmin",
     )
+    # null снимает явно заданного руководителя
+    manager_id: Optional[UUID] = Field(
+        default=None,
+        validation_alias=AliasChoices("managerId", "manager_id"),
+        serialization_alias="managerId",
+    )
 
 
 class UserLinkDTO(BaseModel):
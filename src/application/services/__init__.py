@@ -1,5 +1,10 @@
 from .user import UserService
 from .ad_import import AdImportService
 from .avatar import AvatarService
+from .ad_import_runner import AdImportRunner
+from .ad_auth import AdAuthService
+from .csv_import import EmployeeCsvImportService
+from .export import DirectoryExportService
 
-__all__ = ['UserService', "AdImportService", "AvatarService"]
+__all__ = ['UserService', "AdImportService", "AvatarService", "AdImportRunner", "AdAuthService",
+           "EmployeeCsvImportService", "DirectoryExportService"]
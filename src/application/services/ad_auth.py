@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+import os
+
+from ldap3.utils.conv import escape_filter_chars
+
+from src.application.services.ad_import import USER_SEARCH_FILTER
+from src.infrastructure.cache import TTLCache
+from src.infrastructure.ldap_client import AsyncLdapClient
+
+
+class AdAuthService:
+    """
+    Проверка пароля сотрудника bind'ом от его имени в AD.
+    DN ищется служебным соединением из пула, сам bind выполняется на отдельном коротком соединении.
+    Результат кэшируется по солёному хэшу пары логин/пароль, поэтому повторы одного и того же
+    запроса (ретраи клиента, перебор) не доходят до контроллеров домена.
+    """
+
+    def __init__(
+            self,
+            client: AsyncLdapClient,
+            cache: TTLCache[bytes, tuple[bool | None]],
+            *,
+            search_bases: list[str],
+            success_ttl: float,
+            failure_ttl: float,
+    ):
+        self.client = client
+        self.cache = cache
+        self.search_bases = search_bases
+        self.success_ttl = success_ttl
+        self.failure_ttl = failure_ttl
+        # Соль живёт только в памяти процесса: ключи кэша бесполезны вне его
+        self._salt = os.urandom(32)
+
+    async def authenticate(self, login: str, password: str) -> bool | None:
+        """
+        True/False — результат проверки пароля в AD.
+        None — учётной записи с таким логином в AD нет, решение остаётся за локальной проверкой.
+        """
+        if not login or not password:
+            return False
+
+        key = self._cache_key(login, password)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+
+        user_dns = await self._find_user_dns(login)
+        if not user_dns:
+            result = None
+        elif len(user_dns) > 1:
+            # Неоднозначный логин не пускаем ни под одной из учётных записей
+            result = False
+        else:
+            result = await self.client.verify_password(user_dns[0], password)
+
+        self.cache.put(key, (result,), self.success_ttl if result else self.failure_ttl)
+        return result
+
+    async def _find_user_dns(self, login: str) -> list[str]:
+        value = escape_filter_chars(login)
+        search_filter = f"(&{USER_SEARCH_FILTER}(|(mail={value})(userPrincipalName={value})))"
+
+        user_dns: list[str] = []
+        for search_base in self.search_bases:
+            entries = await self.client.search(search_base, search_filter, attributes=["distinguishedName"])
+            user_dns.extend(entry["dn"] for entry in entries if entry["dn"] not in user_dns)
+        return user_dns
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def _cache_key(self, login: str, password: str) -> bytes:
+        message = login.strip().lower().encode() + b"\0" + password.encode()
+        return hmac.new(self._salt, message, hashlib.sha256).digest()
@@ -1,22 +1,68 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import json
+import multiprocessing
+import threading
 from collections import Counter, defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from concurrent.futures import FIRST_EXCEPTION, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager, aclosing, nullcontext
 from datetime import date, datetime
-from typing import Any
+from itertools import batched
+from typing import Any, Literal
 from uuid import UUID
 
-from ldap3 import (
-    ALL_ATTRIBUTES,
-    ALL_OPERATIONAL_ATTRIBUTES,
-    Connection,
-    SIMPLE,
-    SUBTREE,
-    Server,
-)
+from ldap3 import BASE, SUBTREE, Connection, Server
+from uuid6 import uuid7
 
+from src.application.services.avatar import AvatarService
 from src.config import settings
-from src.infrastructure.repositories import EmployeeRepository, PositionRepository, TeamRepository
+from src.domain.models import Position, Team
+from src.infrastructure.ldap_pool import get_ldap_pool
+from src.infrastructure.repositories import (
+    AdSyncStateRepository,
+    EmployeeRepository,
+    PositionRepository,
+    TeamRepository,
+)
+
+SyncMode = Literal["full", "incremental"]
+
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+# (нормализованное имя, parent_id)
+TeamKey = tuple[str, UUID | None]
+
+USER_SEARCH_FILTER = "(&(objectCategory=person)(objectClass=user))"
+
+# Поля из AD, изменение которых приводит к обновлению сотрудника.
+# Любое изменение списка меняет отпечаток всех записей: первый прогон после выкладки
+# перезапишет каждого сотрудника один раз (для manager_dn это и заполняет новый manager_id)
+AD_SYNCED_FIELDS = (
+    "first_name",
+    "middle_name",
+    "last_name",
+    "city",
+    "email",
+    "phone",
+    "legal_entity",
+    "department",
+    "position",
+    "manager_dn",
+)
+
+# Фотография сотрудника, запрашивается только при settings.ad.import_photos
+PHOTO_ATTRIBUTE = "thumbnailPhoto"
+
+# Бит ACCOUNTDISABLE в userAccountControl
+ACCOUNT_DISABLED_FLAG = 0x2
+
+# Сколько страниц AD может ждать записи в БД
+PAGE_QUEUE_SIZE = 2
+
+_END_OF_PAGES = object()
 
 
 class AdImportService:
@@ -25,151 +71,636 @@ class AdImportService:
             employee_repo: EmployeeRepository,
             position_repo: PositionRepository,
             team_repo: TeamRepository,
+            sync_state_repo: AdSyncStateRepository,
+            avatar_service: AvatarService | None = None,
     ) -> None:
         self.employee_repo = employee_repo
         self.position_repo = position_repo
         self.team_repo = team_repo
+        self.sync_state_repo = sync_state_repo
+        self.avatar_service = avatar_service
+        # Имя команды -> ключ уникальности из TeamRepository.normalize_names
+        self._team_name_keys: dict[str, str] = {}
 
-    async def update_from_ad(self) -> dict[str, int]:
-        ad_users = await self._fetch_all_users()
-        if not ad_users:
-            return {"imported": 0}
-
-        existing_object_ids = await self.employee_repo.get_object_ids()
-        teams = await self.team_repo.get_all()
-        if not teams:
-            raise ValueError("No teams available to attach imported employees")
-
-        team_lookup = {(team.name, team.parent_id): team for team in teams}
-        default_team = teams[0]
-        default_leader_id = default_team.leader_employee_id
-
+    async def update_from_ad(
+            self,
+            mode: SyncMode = "incremental",
+            on_progress: ProgressCallback | None = None,
+            *,
+            force_archive: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Импорт сотрудников из AD.
+        В инкрементальном режиме запрашиваются только записи с uSNChanged выше сохранённой отметки;
+        если отметки для текущего DC нет или она невалидна, выполняется полная синхронизация.
+        on_progress получает число обработанных записей AD после каждой страницы.
+        force_archive снимает ограничение settings.ad.archive_max_fraction на этот прогон.
+        """
+        watermarks = await self.sync_state_repo.get_watermarks() if mode == "incremental" else {}
+        snapshot: dict[str, Any] = {}
+
+        with self._photo_executor() as photo_executor:
+            async with aclosing(self._stream_user_pages(watermarks, snapshot)) as pages:
+                counters = await self._import_users(pages, snapshot, on_progress, photo_executor, force_archive)
+
+        # Отметка сохраняется в той же транзакции, что и импорт, — только после успешного прогона
+        if snapshot["server_id"] and snapshot["highest_usn"] is not None:
+            await self.sync_state_repo.save(snapshot["server_id"], snapshot["highest_usn"])
+
+        return {**counters, "mode": snapshot["mode"]}
+
+    async def _import_users(
+            self,
+            pages: AsyncIterator[list[dict[str, Any]]],
+            snapshot: dict[str, Any],
+            on_progress: ProgressCallback | None = None,
+            photo_executor: Executor | None = None,
+            force_archive: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Сопоставляет и пишет сотрудников постранично, по мере прихода страниц из AD.
+        Уже известные сотрудники обновляются, только если изменился отпечаток их полей из AD.
+        Руководитель может оказаться на более поздней странице, поэтому DN руководителей
+        разрешаются в objectGUID после обработки всего каталога.
+        С photo_executor фотографии страницы импортируются в аватары после записи сотрудников.
+        """
+        processed = 0
         imported = 0
-        manager_lookup = self._build_manager_lookup(ad_users)
+        updated = 0
+        team_lookup: dict[TeamKey, Team] | None = None
+        manager_lookup: dict[str, str] = {}
         created_employees: dict[str, dict[str, Any]] = {}
+        manager_dns: dict[str, str | None] = {}
+        seen_object_ids: set[str] = set()
+        disabled_object_ids: set[str] = set()
+
+        async for page in pages:
+            if team_lookup is None:
+                known_employees = await self.employee_repo.get_ad_fingerprints()
+                archived_object_ids = await self.employee_repo.get_archived_object_ids()
+                teams = await self.team_repo.get_all()
+                if not teams:
+                    raise ValueError("No teams available to attach imported employees")
+
+                # Справочники загружаются один раз, недостающее досоздаётся пачками по страницам
+                team_lookup = {}
+                for team in teams:
+                    self._remember_team(team, team_lookup)
+                position_lookup = {
+                    self._normalize_title(position.title): position
+                    for position in await self.position_repo.get_all()
+                }
+                default_team = teams[0]
+
+            manager_lookup.update(self._build_manager_lookup(page))
+            pending_rows: list[dict[str, Any]] = []
+            changed_rows: list[dict[str, Any]] = []
+            returned_object_ids: list[str] = []
+            photos: dict[str, bytes] = {}
+            candidates: list[tuple[dict[str, Any], tuple[UUID, str | None] | None, str]] = []
+
+            # 1. Сопоставляем записи страницы и отбрасываем неизменившиеся
+            for entry in page:
+                object_id = self._first_attr(entry.get("attributes", {}), "objectGUID")
+                if not object_id or object_id in seen_object_ids:
+                    continue
+
+                # Отключённая учётная запись считается отсутствующей в AD
+                if self._is_disabled(entry):
+                    disabled_object_ids.add(object_id)
+                    continue
+
+                seen_object_ids.add(object_id)
+                if object_id in archived_object_ids:
+                    returned_object_ids.append(object_id)
+
+                mapped = self._map_entry(entry)
+                if not mapped:
+                    continue
+
+                # Фото не входит в отпечаток: его неизменность проверяется по хэшу при импорте аватаров
+                photo = self._first_attr(entry.get("attributes", {}), PHOTO_ATTRIBUTE)
+                if photo_executor is not None and photo:
+                    photos[object_id] = photo
+
+                fingerprint = self._fingerprint(mapped)
+                known = known_employees.get(mapped["object_id"])
+                if known and known[1] == fingerprint:
+                    continue
+
+                candidates.append((mapped, known, fingerprint))
+
+            # 2. Недостающие должности и команды создаём пачками
+            mapped_entries = [mapped for mapped, _, _ in candidates]
+            await self._ensure_positions(mapped_entries, position_lookup)
+            await self._ensure_teams(mapped_entries, default_team, team_lookup)
+
+            # 3. Собираем строки сотрудников из уже известных справочников
+            for mapped, known, fingerprint in candidates:
+                team = self._resolve_team(mapped, default_team, team_lookup)
+                position = position_lookup[self._normalize_title(mapped["position"])]
+                synced_fields = self._build_synced_fields(mapped, team.id, position.id, fingerprint)
+                manager_dns[mapped["object_id"]] = mapped["manager_dn"]
+
+                if known:
+                    changed_rows.append({"id": known[0], **synced_fields})
+                    continue
+
+                employee_id = uuid7()
+                pending_rows.append(self._build_employee_row(mapped, employee_id, synced_fields))
+
+                created_employees[mapped["object_id"]] = {
+                    "id": employee_id,
+                    "team_id": team.id,
+                    "manager_dn": mapped["manager_dn"],
+                }
 
-        for entry in ad_users:
-            mapped = self._map_entry(entry, manager_lookup)
-            if not mapped:
-                continue
+            # 4. Пишем сотрудников страницы пачками многострочных INSERT и UPDATE
+            for chunk in batched(pending_rows, settings.ad.import_batch_size):
+                await self.employee_repo.create_many(list(chunk))
 
-            if mapped["object_id"] in existing_object_ids:
-                continue
+            for chunk in batched(changed_rows, settings.ad.import_batch_size):
+                await self.employee_repo.update_many(list(chunk))
 
-            legal_entity_name = mapped["legal_entity"] or default_team.name
+            await self.employee_repo.restore_by_object_ids(returned_object_ids)
 
-            company_team = await self._get_or_create_team(
-                name=legal_entity_name,
-                leader_employee_id=default_leader_id,
-                parent_id=default_team.id,
-                lookup=team_lookup,
-            )
+            if photos:
+                await self._import_photos(photos, known_employees, created_employees, photo_executor)
 
-            department_name = mapped["department"]
+            processed += len(page)
+            imported += len(pending_rows)
+            updated += len(changed_rows)
 
-            if department_name:
-                team = await self._get_or_create_team(
-                    name=department_name,
-                    leader_employee_id=default_leader_id,
-                    parent_id=company_team.id,
-                    lookup=team_lookup,
-                )
-            else:
-                team = company_team
-
-            position = await self.position_repo.get_or_create(title=mapped["position"])
-
-            employee = await self.employee_repo.create(
-                {
-                    "first_name": mapped["first_name"],
-                    "middle_name": mapped["middle_name"],
-                    "last_name": mapped["last_name"],
-                    "birth_date": mapped["birth_date"],
-                    "hire_date": mapped["hire_date"],
-                    "city": mapped["city"],
-                    "email": mapped["email"],
-                    "phone": mapped["phone"],
-                    "mattermost": None,
-                    "tg": None,
-                    "about_me": None,
-                    "legal_entity": mapped["legal_entity"],
-                    "department": mapped["department"],
-                    "team_id": team.id,
-                    "position_id": position.id,
-                    "object_id": mapped["object_id"],
-                }
-            )
+            if on_progress is not None:
+                await on_progress(processed)
 
-            created_employees[mapped["object_id"]] = {
-                "id": employee.id,
-                "team_id": team.id,
-                "manager_object_id": mapped.get("manager_object_id"),
-            }
+        if team_lookup is None:
+            return {"imported": 0, "updated": 0, "archived": 0, "warning": None}
 
-            existing_object_ids.add(mapped["object_id"])
-            imported += 1
+        # Лидеры команд выбираются по тем же разрешённым DN, что и manager_id, включая дочитанные из AD
+        manager_lookup = await self._link_managers(manager_dns, manager_lookup)
+        for info in created_employees.values():
+            manager_dn = info.pop("manager_dn")
+            info["manager_object_id"] = manager_lookup.get(manager_dn) if manager_dn else None
 
         await self._assign_team_leaders(team_lookup, created_employees)
 
-        return {"imported": imported}
+        active_object_ids = known_employees.keys() - archived_object_ids
+        # Удалённые записи видны только при полной выгрузке; отключённые — в любом режиме
+        if snapshot["mode"] == "full":
+            missing_object_ids = active_object_ids - seen_object_ids
+        else:
+            missing_object_ids = active_object_ids & disabled_object_ids
+
+        archived, warning = await self._archive_missing(missing_object_ids, len(active_object_ids), force_archive)
+
+        return {"imported": imported, "updated": updated, "archived": archived, "warning": warning}
 
-    async def _get_or_create_team(
+    async def _link_managers(
             self,
-            *,
-            name: str,
-            leader_employee_id: UUID,
-            parent_id: UUID | None,
-            lookup: dict[tuple[str, UUID | None], Any],
-    ):
-        cache_key = (name, parent_id)
-        cached = lookup.get(cache_key)
-        if cached:
-            return cached
-
-        existing = await self.team_repo.find_by_name(name, parent_id=parent_id)
-
-        if existing and existing.parent_id != parent_id:
-            existing = await self.team_repo.update_parent(existing.id, parent_id)
-        elif not existing:
-            existing = await self.team_repo.create(
-                name=name, leader_employee_id=leader_employee_id, parent_id=parent_id
+            manager_dns: dict[str, str | None],
+            manager_lookup: dict[str, str],
+    ) -> dict[str, str]:
+        """
+        Сохраняет руководителя из атрибута manager в employees.manager_id.
+        В инкрементальном режиме руководитель мог не попасть в выгрузку — его DN дочитывается из AD.
+        Возвращает DN -> objectGUID, дополненный дочитанными руководителями.
+        """
+        unresolved = sorted({dn for dn in manager_dns.values() if dn and dn not in manager_lookup})
+        if unresolved:
+            manager_lookup = {**manager_lookup, **await asyncio.to_thread(self._lookup_object_ids_sync, unresolved)}
+
+        links: list[tuple[str, str | None]] = []
+        for object_id, manager_dn in manager_dns.items():
+            manager_object_id = manager_lookup.get(manager_dn) if manager_dn else None
+            links.append((object_id, manager_object_id if manager_object_id != object_id else None))
+
+        for chunk in batched(links, settings.ad.import_batch_size):
+            await self.employee_repo.set_managers_by_object_id(list(chunk))
+
+        return manager_lookup
+
+    def _lookup_object_ids_sync(self, dns: list[str]) -> dict[str, str]:
+        lookup: dict[str, str] = {}
+        with self._connection() as conn:
+            for dn in dns:
+                # Несуществующий DN возвращает noSuchObject без исключения — ссылка сбрасывается
+                conn.search(search_base=dn, search_filter="(objectClass=*)", search_scope=BASE, attributes=["objectGUID"])
+                if not conn.entries:
+                    continue
+                object_id = self._first_attr(conn.entries[0].entry_attributes_as_dict, "objectGUID")
+                if object_id:
+                    lookup[dn] = str(object_id)
+        return lookup
+
+    async def _import_photos(
+            self,
+            photos: dict[str, bytes],
+            known_employees: dict[str, tuple[UUID, str | None]],
+            created_employees: dict[str, dict[str, Any]],
+            photo_executor: Executor,
+    ) -> None:
+        by_employee_id: dict[UUID, bytes] = {}
+        for object_id, photo in photos.items():
+            if object_id in created_employees:
+                by_employee_id[created_employees[object_id]["id"]] = photo
+            elif object_id in known_employees:
+                by_employee_id[known_employees[object_id][0]] = photo
+
+        await self.avatar_service.import_photos(by_employee_id, photo_executor)
+
+    def _photo_executor(self) -> AbstractContextManager[Executor | None]:
+        if self.avatar_service is None or settings.ad is None or not settings.ad.import_photos:
+            return nullcontext()
+
+        # spawn, а не fork: процесс многопоточный (event loop, потоки LDAP)
+        return ProcessPoolExecutor(
+            max_workers=settings.ad.photo_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def _archive_missing(
+            self,
+            object_ids: set[str],
+            active_total: int,
+            force: bool = False,
+    ) -> tuple[int, str | None]:
+        """
+        Возвращает число архивированных и предупреждение, если архивация пропущена.
+        Защита от пустой или урезанной выгрузки (неверный base_dn, сбой AD): при превышении доли
+        пропускается только архивация, остальной импорт сохраняется.
+        """
+        if not object_ids:
+            return 0, None
+
+        max_fraction = settings.ad.archive_max_fraction
+        if (
+                not force
+                and len(object_ids) > settings.ad.archive_min_count
+                and len(object_ids) > active_total * max_fraction
+        ):
+            return 0, (
+                f"Skipped archiving {len(object_ids)} of {active_total} employees: "
+                f"more than {max_fraction:.0%} are missing from Active Directory"
             )
 
-        lookup[cache_key] = existing
-        return existing
+        archived = 0
+        for chunk in batched(sorted(object_ids), settings.ad.import_batch_size):
+            archived += await self.employee_repo.archive_by_object_ids(list(chunk))
+        return archived, None
+
+    def _fingerprint(self, mapped: dict[str, Any]) -> str:
+        # Даты не участвуют: при отсутствии в AD они подставляются сегодняшним днём
+        payload = [mapped[field] for field in AD_SYNCED_FIELDS]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+    def _build_synced_fields(
+            self,
+            mapped: dict[str, Any],
+            team_id: UUID,
+            position_id: UUID,
+            fingerprint: str,
+    ) -> dict[str, Any]:
+        """Поля, которыми владеет AD: они перезаписываются при каждом изменении записи в каталоге."""
+        return {
+            "first_name": mapped["first_name"],
+            "middle_name": mapped["middle_name"],
+            "last_name": mapped["last_name"],
+            "city": mapped["city"],
+            "email": mapped["email"],
+            "phone": mapped["phone"],
+            "legal_entity": mapped["legal_entity"],
+            "department": mapped["department"],
+            "team_id": team_id,
+            "position_id": position_id,
+            "ad_fingerprint": fingerprint,
+        }
+
+    def _build_employee_row(
+            self,
+            mapped: dict[str, Any],
+            employee_id: UUID,
+            synced_fields: dict[str, Any],
+    ) -> dict[str, Any]:
+        return {
+            "id": employee_id,
+            **synced_fields,
+            "birth_date": mapped["birth_date"],
+            "hire_date": mapped["hire_date"],
+            "mattermost": None,
+            "tg": None,
+            "about_me": None,
+            "object_id": mapped["object_id"],
+        }
+
+    def _normalize_title(self, title: str) -> str:
+        return " ".join(title.split())
+
+    def _team_key(self, name: str, parent_id: UUID | None) -> TeamKey:
+        # Ключ посчитан в БД той же формулой, что и teams.normalized_name (см. _load_team_name_keys)
+        return self._team_name_keys[name], parent_id
+
+    def _remember_team(self, team: Team, team_lookup: dict[TeamKey, Team]) -> None:
+        self._team_name_keys[team.name] = team.normalized_name
+        team_lookup[(team.normalized_name, team.parent_id)] = team
+
+    async def _load_team_name_keys(self, names: set[str]) -> None:
+        missing = names - self._team_name_keys.keys()
+        if missing:
+            self._team_name_keys.update(await self.team_repo.normalize_names(missing))
+
+    def _company_name(self, mapped: dict[str, Any], default_team: Team) -> str:
+        return mapped["legal_entity"] or default_team.name
 
-    async def _fetch_all_users(self) -> list[dict[str, Any]]:
-        return await asyncio.to_thread(self._fetch_all_users_sync)
+    def _resolve_team(
+            self,
+            mapped: dict[str, Any],
+            default_team: Team,
+            team_lookup: dict[TeamKey, Team],
+    ) -> Team:
+        company_team = team_lookup[self._team_key(self._company_name(mapped, default_team), default_team.id)]
+
+        if not mapped["department"]:
+            return company_team
+
+        return team_lookup[self._team_key(mapped["department"], company_team.id)]
+
+    async def _ensure_positions(
+            self,
+            mapped_entries: list[dict[str, Any]],
+            position_lookup: dict[str, Position],
+    ) -> None:
+        missing = sorted(
+            {self._normalize_title(mapped["position"]) for mapped in mapped_entries} - position_lookup.keys()
+        )
+        if not missing:
+            return
+
+        for position in await self.position_repo.create_many(missing):
+            position_lookup[self._normalize_title(position.title)] = position
+
+        # Конфликт вставки: должность успел создать параллельный запрос
+        conflicted = [title for title in missing if title not in position_lookup]
+        if conflicted:
+            for position in await self.position_repo.get_by_titles(conflicted):
+                position_lookup[self._normalize_title(position.title)] = position
+
+    async def _ensure_teams(
+            self,
+            mapped_entries: list[dict[str, Any]],
+            default_team: Team,
+            team_lookup: dict[TeamKey, Team],
+    ) -> None:
+        await self._load_team_name_keys({
+            name
+            for mapped in mapped_entries
+            for name in (self._company_name(mapped, default_team), mapped["department"])
+            if name
+        })
+
+        # Юрлица — дочерние команды корневой, отделы — дочерние юрлиц, поэтому два уровня по очереди
+        companies = {
+            self._team_key(name, default_team.id): name
+            for name in (self._company_name(mapped, default_team) for mapped in mapped_entries)
+        }
+        await self._create_missing_teams(companies, default_team.leader_employee_id, team_lookup)
 
-    def _fetch_all_users_sync(self) -> list[dict[str, Any]]:
+        departments: dict[TeamKey, str] = {}
+        for mapped in mapped_entries:
+            if mapped["department"]:
+                company_team = team_lookup[
+                    self._team_key(self._company_name(mapped, default_team), default_team.id)
+                ]
+                departments[self._team_key(mapped["department"], company_team.id)] = mapped["department"]
+
+        await self._create_missing_teams(departments, default_team.leader_employee_id, team_lookup)
+
+    async def _create_missing_teams(
+            self,
+            requested: dict[TeamKey, str],
+            leader_employee_id: UUID,
+            team_lookup: dict[TeamKey, Team],
+    ) -> None:
+        missing = {key: name for key, name in requested.items() if key not in team_lookup}
+        if not missing:
+            return
+
+        created = await self.team_repo.create_many([
+            {"name": name, "parent_id": key[1], "leader_employee_id": leader_employee_id}
+            for key, name in missing.items()
+        ])
+        for team in created:
+            self._remember_team(team, team_lookup)
+
+        for key, name in missing.items():
+            if key not in team_lookup:
+                team = await self.team_repo.find_by_name(name, parent_id=key[1])
+                if not team:
+                    raise ValueError(f"Team '{name}' could not be created")
+                team_lookup[key] = team
+
+    async def _stream_user_pages(
+            self,
+            watermarks: dict[str, int],
+            snapshot: dict[str, Any],
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Отдаёт страницы AD по мере их получения.
+        LDAP читается в отдельном потоке; ограниченная очередь даёт следующей странице
+        загружаться, пока пишется текущая, и не даёт потоку убежать вперёд записи в БД.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=PAGE_QUEUE_SIZE)
+        stop = threading.Event()
+
+        def emit(page: list[dict[str, Any]]) -> None:
+            asyncio.run_coroutine_threadsafe(queue.put(page), loop).result()
+
+        async def produce() -> None:
+            try:
+                await asyncio.to_thread(self._fetch_user_pages_sync, watermarks, snapshot, emit, stop)
+            except Exception as exc:
+                await queue.put(exc)
+            else:
+                await queue.put(_END_OF_PAGES)
+
+        producer = asyncio.create_task(produce())
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END_OF_PAGES:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Поток может ждать места в очереди — вычитываем её, пока он не завершится
+            stop.set()
+            while not producer.done():
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({producer, getter}, return_when=asyncio.FIRST_COMPLETED)
+                getter.cancel()
+
+    def _fetch_user_pages_sync(
+            self,
+            watermarks: dict[str, int],
+            snapshot: dict[str, Any],
+            emit: Callable[[list[dict[str, Any]]], None],
+            stop: threading.Event,
+    ) -> None:
+        """
+        Выгружает все базы поиска параллельно, у каждой базы своё соединение.
+        Пользователь, найденный под несколькими базами, отдаётся один раз.
+        USN имеет смысл только на том DC, с которого он прочитан, поэтому соединения поиска
+        закрепляются за этим DC. Если база всё же прочитана с другого DC (например, одно имя хоста
+        в DNS ведёт на несколько DC), она выгружается полностью, а отметка прогона не сохраняется.
+        """
         ad_settings = settings.ad
 
+        if ad_settings is None:
+            raise ValueError("Active Directory is not configured")
         if not ad_settings.user or not ad_settings.password:
             raise ValueError("Active Directory credentials are not configured")
 
-        server = Server(ad_settings.host, use_ssl=ad_settings.use_ssl)
-        conn = Connection(
-            server,
-            user=ad_settings.user,
-            password=ad_settings.password.get_secret_value(),
-            authentication=SIMPLE,
-            auto_bind=True,
+        with self._connection() as conn:
+            state_server = conn.server
+            # USN фиксируем до поиска: изменения во время выгрузки попадут в следующий прогон
+            server_id, highest_usn = self._read_server_state(conn)
+            since_usn = self._resolve_watermark(watermarks, server_id, highest_usn)
+            snapshot.update(
+                server_id=server_id,
+                highest_usn=highest_usn,
+                mode="full" if since_usn is None else "incremental",
+            )
+            requested = ad_settings.attributes
+            if self.avatar_service is not None and ad_settings.import_photos:
+                requested = [*requested, PHOTO_ATTRIBUTE]
+            attributes = self._requested_attributes(conn, requested)
+
+        search_bases = self._collapse_search_bases(ad_settings.search_bases)
+        emitted_object_ids: set[str] = set()
+        lock = threading.Lock()
+
+        def emit_unique(page: list[dict[str, Any]]) -> None:
+            with lock:
+                unique = []
+                for entry in page:
+                    object_id = self._first_attr(entry.get("attributes", {}), "objectGUID")
+                    if object_id and object_id in emitted_object_ids:
+                        continue
+                    if object_id:
+                        emitted_object_ids.add(object_id)
+                    unique.append(entry)
+            if unique:
+                emit(unique)
+
+        def fetch_base(base_dn: str) -> None:
+            with self._connection(state_server) as base_conn:
+                base_since_usn = since_usn
+                if server_id and self._read_server_state(base_conn)[0] != server_id:
+                    base_since_usn = None
+                    with lock:
+                        snapshot["highest_usn"] = None
+
+                for page in self._iter_user_pages(
+                    base_conn,
+                    base_dn=base_dn,
+                    page_size=ad_settings.page_size,
+                    attributes=attributes,
+                    since_usn=base_since_usn,
+                ):
+                    if stop.is_set():
+                        break
+                    emit_unique(page)
+
+        workers = max(1, min(ad_settings.fetch_concurrency, len(search_bases)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ad-fetch") as executor:
+            futures = [executor.submit(fetch_base, base_dn) for base_dn in search_bases]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            # Ошибка одной базы прерывает остальные: неполная выгрузка не должна архивировать сотрудников
+            failed = [future for future in done if future.exception()]
+            if failed:
+                stop.set()
+                raise failed[0].exception()
+
+    def _connection(self, server: Server | None = None) -> AbstractContextManager[Connection]:
+        # Соединения берутся из общего пула, поэтому повторный прогон не платит за TCP и bind
+        return get_ldap_pool().acquire(server)
+
+    def _collapse_search_bases(self, base_dns: list[str]) -> list[str]:
+        # Поиск идёт по поддереву, поэтому база внутри другой базы ничего не добавит
+        normalized: dict[str, str] = {}
+        for base_dn in base_dns:
+            normalized.setdefault(",".join(part.strip() for part in base_dn.split(",")).lower(), base_dn)
+        return [
+            base_dn
+            for key, base_dn in normalized.items()
+            if not any(key != other and key.endswith("," + other) for other in normalized)
+        ]
+
+    def _read_server_state(self, conn: Connection) -> tuple[str | None, int | None]:
+        conn.search(
+            search_base="",
+            search_filter="(objectClass=*)",
+            search_scope=BASE,
+            attributes=["dsServiceName", "highestCommittedUSN"],
         )
+        if not conn.entries:
+            return None, None
+
+        attributes = conn.entries[0].entry_attributes_as_dict
+        server_id = self._first_attr(attributes, "dsServiceName")
 
         try:
-            return self._dump_all_users(
-                conn,
-                base_dn=ad_settings.base_dn,
-                page_size=ad_settings.page_size,
-            )
-        finally:
-            if conn.bound:
-                conn.unbind()
+            highest_usn = int(self._first_attr(attributes, "highestCommittedUSN"))
+        except (TypeError, ValueError):
+            highest_usn = None
+
+        return (str(server_id) if server_id else None), highest_usn
+
+    def _resolve_watermark(
+            self,
+            watermarks: dict[str, int],
+            server_id: str | None,
+            highest_usn: int | None,
+    ) -> int | None:
+        if not server_id or highest_usn is None:
+            return None
+
+        since_usn = watermarks.get(server_id)
+
+        # Отметка выше текущего USN означает восстановление DC из резервной копии
+        if since_usn is None or since_usn > highest_usn:
+            return None
+
+        return since_usn
 
-    def _dump_all_users(self, conn: Connection, *, base_dn: str, page_size: int) -> list[dict[str, Any]]:
-        users: list[dict[str, Any]] = []
+    def _requested_attributes(self, conn: Connection, attributes: list[str]) -> list[str]:
+        # ldap3 отклоняет поиск с атрибутом, которого нет в схеме (например, birthDate в чистом AD)
+        schema = conn.server.schema
+        if schema is None:
+            return list(attributes)
 
-        search_filter = "(&(objectCategory=person)(objectClass=user))"
+        return [name for name in attributes if name in schema.attribute_types]
+
+    def _build_search_filter(self, since_usn: int | None) -> str:
+        if since_usn is None:
+            return USER_SEARCH_FILTER
+
+        # AD поддерживает только >=, поэтому сдвигаем отметку на единицу
+        return f"(&{USER_SEARCH_FILTER}(uSNChanged>={since_usn + 1}))"
+
+    def _iter_user_pages(
+            self,
+            conn: Connection,
+            *,
+            base_dn: str,
+            page_size: int,
+            attributes: list[str],
+            since_usn: int | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        search_filter = self._build_search_filter(since_usn)
         cookie = None
 
         while True:
@@ -177,15 +708,19 @@ class AdImportService:
                 search_base=base_dn,
                 search_filter=search_filter,
                 search_scope=SUBTREE,
-                attributes=[ALL_ATTRIBUTES, ALL_OPERATIONAL_ATTRIBUTES],
+                attributes=attributes,
                 paged_size=page_size,
                 paged_cookie=cookie,
             )
+            # search() возвращает False и для пустой выборки, поэтому решает код результата:
+            # любой, кроме 0, — недочитанная база, по которой архивировались бы живые сотрудники
+            if conn.result.get("result") != 0:
+                raise RuntimeError(f"Search error in '{base_dn}': {conn.result}")
 
-            for entry in conn.entries:
-                users.append(
-                    {"dn": entry.entry_dn, "attributes": entry.entry_attributes_as_dict}
-                )
+            yield [
+                {"dn": entry.entry_dn, "attributes": entry.entry_attributes_as_dict}
+                for entry in conn.entries
+            ]
 
             controls = conn.result.get("controls", {})
             page_control = controls.get("1.2.840.113556.1.4.319", {})
@@ -194,13 +729,7 @@ class AdImportService:
             if not cookie:
                 break
 
-        return users
-
-    def _map_entry(
-            self,
-            entry: dict[str, Any],
-            manager_lookup: dict[str, str],
-    ) -> dict[str, Any] | None:
+    def _map_entry(self, entry: dict[str, Any]) -> dict[str, Any] | None:
         attributes: dict[str, Any] = entry.get("attributes", {})
 
         if self._is_service_account(entry):
@@ -236,8 +765,6 @@ class AdImportService:
         city = self._normalize_city(self._first_attr(attributes, "l"))
 
         manager_dn = self._first_attr(attributes, "manager")
-        manager_dn_lower = str(manager_dn).lower() if manager_dn else None
-        manager_object_id = manager_lookup.get(manager_dn_lower) if manager_dn_lower else None
 
         return {
             "object_id": object_id,
@@ -252,7 +779,7 @@ class AdImportService:
             "legal_entity": self._first_attr(attributes, "company"),
             "department": self._first_attr(attributes, "department"),
             "position": self._first_attr(attributes, "title") or "Сотрудник",
-            "manager_object_id": manager_object_id,
+            "manager_dn": str(manager_dn).lower() if manager_dn else None,
         }
 
     def _build_manager_lookup(self, entries: list[dict[str, Any]]) -> dict[str, str]:
@@ -294,6 +821,15 @@ class AdImportService:
         city = str(value).strip()
         return city or None
 
+    def _is_disabled(self, entry: dict[str, Any]) -> bool:
+        attributes: dict[str, Any] = entry.get("attributes", {})
+        try:
+            flags = int(self._first_attr(attributes, "userAccountControl") or 0)
+        except (TypeError, ValueError):
+            return False
+
+        return bool(flags & ACCOUNT_DISABLED_FLAG)
+
     def _is_service_account(self, entry: dict[str, Any]) -> bool:
         dn = entry.get("dn", "")
         attributes: dict[str, Any] = entry.get("attributes", {})
@@ -306,7 +842,7 @@ class AdImportService:
 
     async def _assign_team_leaders(
             self,
-            team_lookup: dict[tuple[str, UUID | None], Any],
+            team_lookup: dict[TeamKey, Team],
             created_employees: dict[str, dict[str, Any]],
     ) -> None:
         members_by_team: dict[UUID, list[str]] = defaultdict(list)
@@ -338,5 +874,4 @@ class AdImportService:
 
             leader_id = created_employees[candidate_object_id]["id"]
             updated_team = await self.team_repo.update_leader(team_id, leader_id)
-            lookup_key = (updated_team.name, updated_team.parent_id)
-            team_lookup[lookup_key] = updated_team
+            self._remember_team(updated_team, team_lookup)
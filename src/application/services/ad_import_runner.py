@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.application.services.ad_import import AdImportService, SyncMode
+from src.application.services.avatar import AvatarService
+from src.domain.models import ImportRun
+from src.infrastructure.repositories import (
+    AdSyncStateRepository,
+    AvatarRepository,
+    EmployeeRepository,
+    ImportRunRepository,
+    PositionRepository,
+    TeamRepository,
+)
+
+INTERRUPTED_ERROR = "Import was interrupted by application restart"
+
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+# Несколько пропущенных пульсов подряд: процесс, выполнявший прогон, уже не работает
+STALE_AFTER = HEARTBEAT_INTERVAL * 4
+
+
+class AdImportRunner:
+    """
+    Запускает импорт из AD фоновой задачей в текущем процессе.
+    Состояние прогонов хранится в import_runs: клиент получает id сразу и опрашивает статус,
+    а частичный уникальный индекс не даёт запустить второй импорт параллельно.
+    Пока прогон выполняется, процесс обновляет его heartbeat_at; прогон без пульса дольше
+    stale_after считается брошенным упавшим процессом, живые прогоны других процессов не трогаются.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker[AsyncSession],
+            *,
+            heartbeat_interval: timedelta = HEARTBEAT_INTERVAL,
+            stale_after: timedelta = STALE_AFTER,
+    ):
+        self._session_factory = session_factory
+        self._heartbeat_interval = heartbeat_interval
+        self._stale_after = stale_after
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def start(self, mode: SyncMode, *, force_archive: bool = False) -> ImportRun | None:
+        """Ставит импорт в очередь. Возвращает None, если предыдущий импорт ещё не завершён."""
+        async with self._session_factory() as session:
+            repository = ImportRunRepository(session)
+            # Брошенный прогон иначе занимал бы единственный слот до перезапуска приложения
+            await repository.fail_stale(INTERRUPTED_ERROR, self._stale_after)
+            run = await repository.create(mode=mode)
+            await session.commit()
+
+        if run is None:
+            return None
+
+        task = asyncio.create_task(self._execute(run.id, mode, force_archive))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return run
+
+    async def get_run(self, run_id: UUID) -> ImportRun | None:
+        async with self._session_factory() as session:
+            return await ImportRunRepository(session).get_by_id(run_id)
+
+    async def get_recent_runs(self, limit: int) -> list[ImportRun]:
+        async with self._session_factory() as session:
+            return await ImportRunRepository(session).get_recent(limit)
+
+    async def recover(self) -> int:
+        """Вызывается при старте: брошенные прогоны упавших процессов уже не завершатся сами."""
+        async with self._session_factory() as session:
+            failed = await ImportRunRepository(session).fail_stale(INTERRUPTED_ERROR, self._stale_after)
+            await session.commit()
+        return failed
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _execute(self, run_id: UUID, mode: SyncMode, force_archive: bool) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(run_id))
+        try:
+            async with self._session_factory() as session:
+                await ImportRunRepository(session).mark_running(run_id)
+                await session.commit()
+
+            async with self._session_factory() as session:
+                service = AdImportService(
+                    EmployeeRepository(session),
+                    PositionRepository(session),
+                    TeamRepository(session),
+                    AdSyncStateRepository(session),
+                    AvatarService(AvatarRepository(session)),
+                )
+                result = await service.update_from_ad(
+                    mode,
+                    on_progress=lambda processed: self._report_progress(run_id, processed),
+                    force_archive=force_archive,
+                )
+                # Итог прогона фиксируется в одной транзакции с импортом
+                await ImportRunRepository(session).finish(
+                    run_id,
+                    mode=result["mode"],
+                    imported=result["imported"],
+                    updated=result["updated"],
+                    archived=result["archived"],
+                    warning=result["warning"],
+                )
+                await session.commit()
+        except asyncio.CancelledError:
+            # Остановка приложения: иначе прогон остался бы «running» до истечения пульса
+            await self._fail(run_id, INTERRUPTED_ERROR)
+            raise
+        except Exception as exc:
+            await self._fail(run_id, str(exc) or type(exc).__name__)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _fail(self, run_id: UUID, error: str) -> None:
+        async with self._session_factory() as session:
+            await ImportRunRepository(session).fail(run_id, error)
+            await session.commit()
+
+    async def _heartbeat(self, run_id: UUID) -> None:
+        interval = self._heartbeat_interval.total_seconds()
+        while True:
+            await asyncio.sleep(interval)
+            # Сбой одного пульса не прерывает импорт: прогон станет брошенным только через stale_after
+            try:
+                async with self._session_factory() as session:
+                    await ImportRunRepository(session).heartbeat(run_id)
+                    await session.commit()
+            except Exception:
+                continue
+
+    async def _report_progress(self, run_id: UUID, processed: int) -> None:
+        # Отдельная короткая транзакция, чтобы прогресс был виден до окончания импорта
+        async with self._session_factory() as session:
+            await ImportRunRepository(session).set_progress(run_id, processed)
+            await session.commit()
@@ -1,4 +1,8 @@
+import asyncio
+import hashlib
+from concurrent.futures import Executor
 from io import BytesIO
+from itertools import batched
 from typing import TYPE_CHECKING, Tuple
 from uuid import UUID
 
@@ -6,9 +10,16 @@ if TYPE_CHECKING:  # pragma: no cover - only for type checkers
     from PIL import Image as PILImage
     from PIL import UnidentifiedImageError
 
-from src.domain.models import Avatar
+from src.config import settings
+from src.domain.models import Avatar, AvatarRendition
 from src.infrastructure.repositories import AvatarRepository
 
+PNG_MIME_TYPE = "image/png"
+WEBP_MIME_TYPE = "image/webp"
+
+SMALL_SIZE = 32
+LARGE_SIZE = 128
+
 
 class AvatarService:
     def __init__(self, avatar_repository: AvatarRepository):
@@ -18,65 +29,204 @@ class AvatarService:
         if not content:
             raise ValueError("Empty image content provided")
 
-        Image, UnidentifiedImageError = self._load_image_library()
-
-        try:
-            with Image.open(BytesIO(content)) as image:
-                image.load()
-                prepared_image = self._prepare_image(image)
-        except UnidentifiedImageError as exc:
-            raise ValueError("Uploaded file is not a valid image") from exc
-
-        small_image, large_image = self._render_sizes(prepared_image)
+        master = render_master(content, settings.avatar.master_size, settings.avatar.max_image_pixels)
 
         avatar = Avatar(
             employee_id=employee_id,
-            mime_type="image/png",
-            image_small=small_image,
-            image_large=large_image,
+            image_hash=hashlib.sha256(master).hexdigest(),
+            mime_type=PNG_MIME_TYPE,
+            master=master,
         )
 
         return await self.avatar_repository.upsert(avatar)
 
-    async def get_avatar(self, employee_id: UUID) -> Avatar | None:
-        return await self.avatar_repository.get_by_employee_id(employee_id)
+    async def import_photos(self, photos: dict[UUID, bytes], executor: Executor) -> int:
+        """
+        Массовый импорт фотографий сотрудников (thumbnailPhoto из AD).
+        Фото, не изменившиеся с прошлого импорта (sha256 исходника), и аватары, загруженные
+        вручную, пропускаются. Мастеры рендерятся в executor (пул процессов), пишутся пачками.
+        """
+        if not photos:
+            return 0
+
+        source_hashes = await self.avatar_repository.get_source_hashes(list(photos))
+        changed: dict[UUID, tuple[bytes, str]] = {}
+        for employee_id, content in photos.items():
+            source_hash = hashlib.sha256(content).hexdigest()
+            # None — аватар загружен вручную, AD его не перетирает
+            if employee_id in source_hashes and source_hashes[employee_id] in (None, source_hash):
+                continue
+            changed[employee_id] = (content, source_hash)
+
+        loop = asyncio.get_running_loop()
+        masters = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    executor,
+                    render_master,
+                    content,
+                    settings.avatar.master_size,
+                    settings.avatar.max_image_pixels,
+                )
+                for content, _ in changed.values()
+            ),
+            return_exceptions=True,
+        )
+
+        avatars: list[Avatar] = []
+        for (employee_id, (_, source_hash)), master in zip(changed.items(), masters):
+            # Битое фото одного сотрудника не должно прерывать импорт
+            if isinstance(master, ValueError):
+                continue
+            if isinstance(master, BaseException):
+                raise master
+            avatars.append(
+                Avatar(
+                    employee_id=employee_id,
+                    image_hash=hashlib.sha256(master).hexdigest(),
+                    mime_type=PNG_MIME_TYPE,
+                    master=master,
+                    source_hash=source_hash,
+                )
+            )
+
+        for chunk in batched(avatars, settings.avatar.import_batch_size):
+            await self.avatar_repository.upsert_many(list(chunk))
+        return len(avatars)
+
+    async def get_rendition(self, employee_id: UUID, size: int, mime_type: str) -> AvatarRendition | None:
+        """
+        Возвращает аватар нужного размера и формата.
+        Отсутствующий рендер строится из мастера при первом запросе и сохраняется.
+        """
+        if size not in {SMALL_SIZE, LARGE_SIZE, *settings.avatar.sizes}:
+            raise ValueError(f"Unsupported avatar size '{size}'")
+
+        image_hash = await self.avatar_repository.get_image_hash(employee_id)
+        if not image_hash:
+            return None
+
+        rendition = await self.avatar_repository.get_rendition(image_hash, size, mime_type)
+        if rendition:
+            return rendition
+
+        master = await self.avatar_repository.get_master(image_hash)
+        if not master:
+            return None
+
+        content = await asyncio.to_thread(_render, master, size, mime_type)
+        rendition = AvatarRendition(image_hash=image_hash, size=size, mime_type=mime_type, content=content)
+        return await self.avatar_repository.save_rendition(rendition)
 
     async def delete_avatar(self, employee_id: UUID) -> None:
         avatar_exists = await self.avatar_repository.delete_by_employee_id(employee_id)
         if not avatar_exists:
             raise ValueError(f"No avatar found for user '{employee_id}'")
 
-    def _load_image_library(self) -> Tuple["PILImage", "UnidentifiedImageError"]:
-        try:
-            from PIL import Image, UnidentifiedImageError  # type: ignore
-        except ModuleNotFoundError as exc:
-            raise RuntimeError(
-                "Pillow is required for avatar processing. Please install the 'pillow' package."
-            ) from exc
-
-        return Image, UnidentifiedImageError
-
-    def _prepare_image(self, image: "PILImage") -> "PILImage":
-        if image.mode not in ("RGB", "RGBA"):
-            image = image.convert("RGB")
-
-        width, height = image.size
-        side = min(width, height)
-        left = (width - side) // 2
-        top = (height - side) // 2
-        right = left + side
-        bottom = top + side
-
-        return image.crop((left, top, right, bottom))
-
-    def _render_sizes(self, image: "PILImage") -> Tuple[bytes, bytes]:
-        large = self._resize_to_png(image, 128)
-        small = self._resize_to_png(image, 32)
-        return small, large
-
-    def _resize_to_png(self, image: "PILImage", size: int) -> bytes:
-        Image, _ = self._load_image_library()
-        resized = image.resize((size, size), Image.Resampling.LANCZOS)
-        buffer = BytesIO()
+    def preferred_mime_type(self, accept: str | None) -> str:
+        """WebP, если клиент явно его принимает, иначе PNG."""
+        if self._accepts(accept, WEBP_MIME_TYPE):
+            return WEBP_MIME_TYPE
+        return PNG_MIME_TYPE
+
+    def _accepts(self, accept: str | None, media_type: str) -> bool:
+        if not accept:
+            return False
+
+        for part in accept.split(","):
+            media_range, *params = (item.strip() for item in part.split(";"))
+            if media_range.lower() != media_type:
+                continue
+
+            quality = 1.0
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            return quality > 0
+
+        return False
+
+
+def render_master(content: bytes, master_size: int, max_image_pixels: int) -> bytes:
+    """
+    Декодирует загруженное изображение и строит квадратный PNG-мастер.
+    Функция верхнего уровня, чтобы её можно было выполнять в пуле процессов.
+    """
+    Image, UnidentifiedImageError = _load_image_library()
+
+    try:
+        with Image.open(BytesIO(content)) as image:
+            # Image.open читает только заголовок, поэтому размеры проверяются до декодирования
+            width, height = image.size
+            if width * height > max_image_pixels:
+                raise ValueError("Image dimensions are too large")
+
+            # Для JPEG декодер сразу масштабирует с шагом 1/2..1/8, для остальных форматов no-op
+            image.draft(None, (master_size, master_size))
+            image.load()
+            prepared_image = _prepare_image(image, master_size)
+    except Image.DecompressionBombError as exc:
+        raise ValueError("Image dimensions are too large") from exc
+    except UnidentifiedImageError as exc:
+        raise ValueError("Uploaded file is not a valid image") from exc
+    except OSError as exc:
+        # Заголовок прочитан, но данные обрезаны или повреждены — ошибка декодера при load()
+        raise ValueError("Uploaded image is truncated or corrupt") from exc
+
+    # Мастер не увеличиваем: апскейл только раздует хранилище
+    side = min(prepared_image.size[0], master_size)
+
+    return _resize(prepared_image, side, PNG_MIME_TYPE)
+
+
+def _load_image_library() -> Tuple["PILImage", "UnidentifiedImageError"]:
+    try:
+        from PIL import Image, UnidentifiedImageError  # type: ignore
+    except ModuleNotFoundError as exc:
+        raise RuntimeError(
+            "Pillow is required for avatar processing. Please install the 'pillow' package."
+        ) from exc
+
+    return Image, UnidentifiedImageError
+
+
+def _prepare_image(image: "PILImage", target_size: int) -> "PILImage":
+    # reduce не поддерживает палитру, 1-битные и 16-битные режимы, поэтому сначала приводим к RGB
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+
+    # Быстрое целочисленное уменьшение, запас x2 оставляем для качественного LANCZOS
+    factor = min(image.size) // (target_size * 2)
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    width, height = image.size
+    side = min(width, height)
+    left = (width - side) // 2
+    top = (height - side) // 2
+    right = left + side
+    bottom = top + side
+
+    return image.crop((left, top, right, bottom))
+
+
+def _render(master: bytes, size: int, mime_type: str) -> bytes:
+    Image, _ = _load_image_library()
+    with Image.open(BytesIO(master)) as image:
+        image.load()
+        return _resize(image, size, mime_type)
+
+
+def _resize(image: "PILImage", size: int, mime_type: str) -> bytes:
+    Image, _ = _load_image_library()
+    resized = image.resize((size, size), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    if mime_type == WEBP_MIME_TYPE:
+        resized.save(buffer, format="WEBP", quality=85, method=4)
+    else:
         resized.save(buffer, format="PNG")
-        return buffer.getvalue()
+    return buffer.getvalue()
@@ -0,0 +1,369 @@
+import codecs
+import csv
+from collections.abc import AsyncIterator
+from datetime import date
+from typing import Any
+from uuid import UUID
+
+from uuid6 import uuid7
+
+from src.domain.models import Team, User
+from src.infrastructure.repositories import (
+    EmployeeRepository,
+    PositionRepository,
+    TeamRepository,
+    UserRepository,
+)
+
+# Формат выгрузки Get-ADUser | Export-Csv, как в src/res/test_users.csv
+REQUIRED_COLUMNS = ("Name", "SamAccountName", "UserPrincipalName", "Enabled")
+
+# Строк в одной многострочной вставке
+IMPORT_BATCH_SIZE = 500
+
+# Отчёт об ошибках ограничен, чтобы битый файл не раздувал ответ
+MAX_REPORTED_ERRORS = 1000
+
+DEFAULT_POSITION = "Сотрудник"
+
+# Запись в кавычках не может занимать больше строк: дальше кавычка считается незакрытой
+MAX_RECORD_LINES = 100
+
+# Предел длины записи в символах (не больше 4 байт UTF-8 каждый): поток без перевода строки
+# иначе копился бы в памяти до конца запроса
+MAX_RECORD_CHARS = 64 * 1024
+
+# (номер первой строки записи, поля или ошибка разбора)
+CsvRecord = tuple[int, list[str] | ValueError]
+
+
+class _NeedMoreLines(Exception):
+    """Строки текущей записи ещё не пришли целиком."""
+
+
+class _LineBuffer:
+    """Источник строк для csv.reader, который можно дополнять и откатывать к началу записи."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self.position = 0
+        self.closed = False
+
+    def __iter__(self) -> "_LineBuffer":
+        return self
+
+    def __next__(self) -> str:
+        if self.position < len(self.lines):
+            self.position += 1
+            return self.lines[self.position - 1]
+        if self.closed:
+            raise StopIteration
+        raise _NeedMoreLines
+
+
+class CsvRecordReader:
+    """
+    Собирает записи CSV из произвольных кусков текста.
+    Границы записей определяет csv.reader: перевод строки внутри кавычек запись не завершает,
+    а кавычка в середине поля — обычный символ. Если запись не закончилась через MAX_RECORD_LINES
+    строк или не разбирается, вместо полей отдаётся ValueError с номером её первой строки,
+    и разбор продолжается со следующей строки. Запись длиннее MAX_RECORD_CHARS тоже отдаётся
+    как ValueError; если лимит превысила строка, которая ещё не закончилась, её остаток
+    пропускается до перевода строки без накопления в памяти.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._buffer = _LineBuffer()
+        # strict: ошибки кавычек и незакрытая кавычка в конце файла — csv.Error, а не молча склеенное поле
+        self._reader = csv.reader(self._buffer, strict=True)
+        self._first_line = 1
+        self._skipping_line = False
+
+    def feed(self, text: str) -> list[CsvRecord]:
+        """Возвращает завершённые записи с номером строки, на которой каждая началась."""
+        if self._skipping_line:
+            newline = text.find("\n")
+            if newline < 0:
+                return []
+            text = text[newline + 1:]
+            self._skipping_line = False
+            self._first_line += 1
+
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        self._buffer.lines.extend(line + "\n" for line in lines)
+        records = self._take()
+
+        # В буфере остались только строки незавершённой записи, к ним допишется _pending
+        if len(self._pending) + sum(map(len, self._buffer.lines)) > MAX_RECORD_CHARS:
+            records.append((self._first_line, self._too_long()))
+            self._first_line += len(self._buffer.lines)
+            self._buffer.lines.clear()
+            self._pending = ""
+            self._skipping_line = True
+        return records
+
+    def close(self) -> list[CsvRecord]:
+        if self._pending:
+            self._buffer.lines.append(self._pending)
+            self._pending = ""
+        self._buffer.closed = True
+        return self._take()
+
+    def _take(self) -> list[CsvRecord]:
+        buffer = self._buffer
+        records: list[CsvRecord] = []
+
+        while True:
+            start = buffer.position
+            line_number = self._first_line + start
+            try:
+                fields = next(self._reader)
+            except StopIteration:
+                break
+            except _NeedMoreLines:
+                if len(buffer.lines) - start > MAX_RECORD_LINES:
+                    error = ValueError("Unterminated quoted field")
+                elif self._length(start, len(buffer.lines)) > MAX_RECORD_CHARS:
+                    error = self._too_long()
+                else:
+                    buffer.position = start
+                    break
+                records.append((line_number, error))
+                buffer.position = start + 1
+                continue
+            except csv.Error as exc:
+                if buffer.closed and buffer.position == len(buffer.lines):
+                    # Кавычка не закрылась до конца файла: остальные строки разбираем заново
+                    records.append((line_number, ValueError("Unterminated quoted field")))
+                    buffer.position = start + 1
+                else:
+                    records.append((line_number, ValueError(f"Malformed CSV record: {exc}")))
+                continue
+
+            if self._length(start, buffer.position) > MAX_RECORD_CHARS:
+                records.append((line_number, self._too_long()))
+            elif len(fields) > 1 or (fields and fields[0].strip()):
+                records.append((line_number, fields))
+
+        # Разобранные строки больше не нужны
+        del buffer.lines[:buffer.position]
+        self._first_line += buffer.position
+        buffer.position = 0
+        return records
+
+    def _length(self, start: int, end: int) -> int:
+        return sum(map(len, self._buffer.lines[start:end]))
+
+    @staticmethod
+    def _too_long() -> ValueError:
+        return ValueError(f"CSV record is longer than {MAX_RECORD_CHARS} characters")
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[CsvRecord]:
+    """
+    Разбирает CSV по мере поступления байтов, не держа файл в памяти целиком.
+    Запись, которую не удалось разобрать, приходит как ValueError вместо списка полей.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    reader = CsvRecordReader()
+
+    try:
+        async for chunk in chunks:
+            for record in reader.feed(decoder.decode(chunk)):
+                yield record
+        tail = decoder.decode(b"", final=True)
+    except UnicodeDecodeError as exc:
+        raise ValueError("CSV file must be UTF-8 encoded") from exc
+
+    for record in reader.feed(tail) + reader.close():
+        yield record
+
+
+class EmployeeCsvImportService:
+    """
+    Массовое заведение сотрудников и учётных записей из CSV.
+    Ошибки отдельных строк попадают в отчёт и не прерывают импорт остальных.
+    """
+
+    def __init__(
+            self,
+            employee_repo: EmployeeRepository,
+            position_repo: PositionRepository,
+            team_repo: TeamRepository,
+            user_repo: UserRepository,
+    ):
+        self.employee_repo = employee_repo
+        self.position_repo = position_repo
+        self.team_repo = team_repo
+        self.user_repo = user_repo
+
+    async def import_employees(
+            self,
+            chunks: AsyncIterator[bytes],
+            *,
+            team_name: str,
+            position_title: str,
+            creator: User,
+            password_hash: str,
+    ) -> dict[str, Any]:
+        """
+        password_hash — один хэш случайного пароля на весь импорт: локальный вход
+        невозможен, пока пароль не задан, а вход через AD работает сразу.
+        """
+        team = await self._resolve_team(team_name, creator)
+        position = await self.position_repo.get_or_create(title=" ".join(position_title.split()))
+
+        report: dict[str, Any] = {"imported": 0, "skipped": 0, "failed": 0, "errors": []}
+        header: list[str] | None = None
+        seen_emails: set[str] = set()
+        batch: list[tuple[int, dict[str, Any]]] = []
+
+        async for line_number, record in iter_csv_records(chunks):
+            if isinstance(record, ValueError):
+                if header is None:
+                    raise ValueError(f"CSV header on line {line_number}: {record}")
+                self._fail(report, line_number, str(record))
+                continue
+
+            if header is None:
+                header = self._parse_header(record)
+                continue
+
+            try:
+                row = self._parse_row(header, record)
+            except ValueError as error:
+                self._fail(report, line_number, str(error))
+                continue
+
+            if row is None:
+                report["skipped"] += 1
+                continue
+
+            email_key = row["email"].lower()
+            if email_key in seen_emails:
+                self._fail(report, line_number, f"Duplicate UserPrincipalName '{row['email']}'")
+                continue
+            seen_emails.add(email_key)
+
+            batch.append((line_number, row))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await self._write_batch(batch, report, team, position.id, password_hash)
+                batch = []
+
+        if header is None:
+            raise ValueError("CSV file is empty")
+
+        await self._write_batch(batch, report, team, position.id, password_hash)
+        # Конфликты с базой обнаруживаются при записи пачки, позже ошибок разбора
+        report["errors"].sort(key=lambda error: error["line"])
+        return report
+
+    async def _resolve_team(self, team_name: str, creator: User) -> Team:
+        name = " ".join(team_name.split())
+        if not name:
+            raise ValueError("Team name cannot be empty")
+
+        team = await self.team_repo.find_by_name(name, parent_id=None)
+        if team:
+            return team
+
+        creator_employee = await self.employee_repo.get_by_email(creator.email)
+        if not creator_employee:
+            raise ValueError("Creator employee record not found")
+
+        return await self.team_repo.get_or_create(
+            name=name,
+            leader_employee_id=creator_employee.id,
+            parent_id=None,
+        )
+
+    def _parse_header(self, record: list[str]) -> list[str]:
+        header = [column.strip() for column in record]
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+        return header
+
+    def _parse_row(self, header: list[str], record: list[str]) -> dict[str, Any] | None:
+        """Строка сотрудника или None для отключённой учётной записи."""
+        if len(record) != len(header):
+            raise ValueError(f"Expected {len(header)} columns, got {len(record)}")
+
+        values = {column: value.strip() for column, value in zip(header, record)}
+
+        enabled = values["Enabled"].lower()
+        if enabled == "false":
+            return None
+        if enabled != "true":
+            raise ValueError("Enabled must be True or False")
+
+        name_parts = values["Name"].split()
+        if not name_parts:
+            raise ValueError("Name is required")
+
+        email = values["UserPrincipalName"]
+        if not email:
+            raise ValueError("UserPrincipalName is required")
+        if "@" not in email:
+            raise ValueError(f"UserPrincipalName '{email}' is not an email address")
+
+        # Разбор имени тот же, что и для displayName при импорте из AD
+        return {
+            "first_name": name_parts[0],
+            "middle_name": " ".join(name_parts[1:-1]),
+            "last_name": name_parts[-1] if len(name_parts) > 1 else None,
+            "email": email,
+        }
+
+    async def _write_batch(
+            self,
+            batch: list[tuple[int, dict[str, Any]]],
+            report: dict[str, Any],
+            team: Team,
+            position_id: UUID,
+            password_hash: str,
+    ) -> None:
+        if not batch:
+            return
+
+        emails = [row["email"] for _, row in batch]
+        existing_employees = await self.employee_repo.find_existing_emails(emails)
+        existing_users = await self.user_repo.find_existing_emails(emails)
+
+        today = date.today()
+        employee_rows: list[dict[str, Any]] = []
+        user_rows: list[dict[str, Any]] = []
+
+        for line_number, row in batch:
+            email_key = row["email"].lower()
+            if email_key in existing_employees:
+                self._fail(report, line_number, "Employee with the same email already exists")
+                continue
+
+            # Дат в выгрузке нет: как и при импорте из AD, подставляется сегодняшний день
+            employee_rows.append({
+                "id": uuid7(),
+                **row,
+                "birth_date": today,
+                "hire_date": today,
+                "team_id": team.id,
+                "position_id": position_id,
+            })
+            if email_key not in existing_users:
+                user_rows.append({
+                    "id": uuid7(),
+                    "email": row["email"],
+                    "password_hash": password_hash,
+                    "role": "user",
+                })
+
+        await self.employee_repo.create_many(employee_rows)
+        await self.user_repo.create_many(user_rows)
+        report["imported"] += len(employee_rows)
+
+    def _fail(self, report: dict[str, Any], line_number: int, error: str) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "error": error})
@@ -0,0 +1,259 @@
+import csv
+import io
+import json
+import re
+import zipfile
+from collections.abc import AsyncIterator
+from datetime import date
+from typing import Any, Literal
+from uuid import UUID
+from xml.sax.saxutils import escape
+
+from sqlalchemy import RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.domain.models import EmployeeStatus, Team
+from src.infrastructure.repositories import EmployeeRepository, TeamRepository
+from src.utils.user import build_team_lookup, collect_team_path
+
+ExportFormat = Literal["csv", "ndjson", "xlsx"]
+
+# Строк, читаемых из курсора и отдаваемых клиенту за раз
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_COLUMNS = (
+    "id",
+    "lastName",
+    "firstName",
+    "middleName",
+    "email",
+    "phone",
+    "city",
+    "position",
+    "team",
+    "status",
+    "hireDate",
+    "birthDate",
+    "legalEntity",
+    "department",
+)
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Разделитель уровней команды в плоских форматах
+TEAM_PATH_SEPARATOR = " / "
+
+# С этих символов Excel и другие табличные редакторы начинают формулу при открытии CSV
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Телефоны (+7 900 000-00-00) и отрицательные числа начинаются с «+»/«-», но формулой с вызовами
+# быть не могут: только цифры, пробелы, скобки и дефисы
+_PLAIN_NUMBER = re.compile(r"[+-]?[\d ()-]*\d[\d ()-]*")
+
+
+class DirectoryExportService:
+    """
+    Потоковая выгрузка справочника сотрудников.
+    Ответ отдаётся уже после выхода из обработчика, поэтому выгрузка работает в собственной сессии.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]):
+        self._session_factory = session_factory
+
+    async def stream(self, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        writer = _WRITERS[export_format]()
+
+        async with self._session_factory() as session:
+            lookup = build_team_lookup(await TeamRepository(session).get_all())
+
+            yield writer.start()
+            async for rows in EmployeeRepository(session).iter_export_rows(EXPORT_BATCH_SIZE):
+                chunk = writer.write([self._to_record(row, lookup) for row in rows])
+                if chunk:
+                    yield chunk
+            yield writer.finish()
+
+    def _to_record(self, row: RowMapping, lookup: dict[UUID, Team]) -> dict[str, Any]:
+        team = lookup.get(row["team_id"])
+        return {
+            "id": str(row["id"]),
+            "lastName": row["last_name"],
+            "firstName": row["first_name"],
+            "middleName": row["middle_name"] or None,
+            "email": row["email"],
+            "phone": row["phone"],
+            "city": row["city"],
+            "position": row["position"],
+            "team": [node.name for node in reversed(collect_team_path(team, lookup))],
+            "status": EmployeeStatus(row["status"] or EmployeeStatus.ACTIVE).value,
+            "hireDate": row["hire_date"],
+            "birthDate": row["birth_date"],
+            "legalEntity": row["legal_entity"],
+            "department": row["department"],
+        }
+
+
+def _csv_cell(value: Any) -> str:
+    # Апостроф заставляет редактор показать ячейку как текст (защита от CSV injection)
+    text = _flat_value(value)
+    if not text.startswith(CSV_FORMULA_PREFIXES) or _PLAIN_NUMBER.fullmatch(text):
+        return text
+    return "'" + text
+
+
+def _flat_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return TEAM_PATH_SEPARATOR.join(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class _CsvWriter:
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def start(self) -> bytes:
+        # BOM нужен Excel, чтобы кириллица открылась в UTF-8; импорт CSV его пропускает
+        self._writer.writerow(EXPORT_COLUMNS)
+        return "\ufeff".encode() + self._drain()
+
+    def write(self, records: list[dict[str, Any]]) -> bytes:
+        self._writer.writerows([_csv_cell(record[column]) for column in EXPORT_COLUMNS] for record in records)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        return b""
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+class _NdjsonWriter:
+    def start(self) -> bytes:
+        return b""
+
+    def write(self, records: list[dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps(record, ensure_ascii=False, default=_flat_value) + "\n" for record in records
+        ).encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ByteSink:
+    """Файл только на запись: zipfile пишет в него, а готовые байты сразу уходят клиенту."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# Управляющие символы запрещены в XML 1.0
+_XML_ILLEGAL_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Users" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+class _XlsxWriter:
+    """
+    Минимальный XLSX: одна страница, строки как inline-строки (без sharedStrings и стилей).
+    Лист пишется в zip потоково, сжатые данные отдаются по мере накопления.
+    """
+
+    def __init__(self):
+        self._sink = _ByteSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet: Any = None
+
+    def start(self) -> bytes:
+        self._zip.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        self._zip.writestr("xl/workbook.xml", _XLSX_WORKBOOK)
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+
+        # Размер листа заранее неизвестен, поэтому сразу с zip64
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self._sheet.write(self._row(EXPORT_COLUMNS))
+        return self._sink.drain()
+
+    def write(self, records: list[dict[str, Any]]) -> bytes:
+        self._sheet.write(b"".join(
+            self._row([_flat_value(record[column]) for column in EXPORT_COLUMNS]) for record in records
+        ))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+        return self._sink.drain()
+
+    def _row(self, values: tuple[str, ...] | list[str]) -> bytes:
+        cells = "".join(
+            f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_XML_ILLEGAL_CHARS.sub("", value))}</t></is></c>'
+            for value in values
+        )
+        return f"<row>{cells}</row>".encode()
+
+
+_WRITERS = {"csv": _CsvWriter, "ndjson": _NdjsonWriter, "xlsx": _XlsxWriter}
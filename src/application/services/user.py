@@ -81,6 +81,23 @@ class UserService:
 
         return UserDTO.from_employee(emp, boss=boss, is_admin=is_admin, team_lookup=lookup)
 
+    async def list_reports(self, user_id: UUID) -> list[UserDTO] | None:
+        """Непосредственные подчинённые сотрудника."""
+        manager = await self.employee_repo.get_by_id(user_id)
+        if not manager:
+            return None
+
+        reports = await self.employee_repo.get_direct_reports(user_id)
+        return await self._build_user_dtos([(report, manager) for report in reports])
+
+    async def get_chain(self, user_id: UUID) -> list[UserDTO] | None:
+        """Цепочка руководителей от непосредственного до верхнего."""
+        if not await self.employee_repo.get_by_id(user_id):
+            return None
+
+        chain = await self.employee_repo.get_reporting_chain(user_id)
+        return await self._build_user_dtos(list(zip(chain, [*chain[1:], None])))
+
     async def get_me(self, current_user: User) -> UserDTO | None:
         emp = await self.employee_repo.get_by_email(current_user.email)
         if not emp:
@@ -148,6 +165,9 @@ class UserService:
         if team_names:
             update_data["team_id"] = await self._resolve_team_id(employee, team_names)
 
+        if "manager_id" in payload.model_fields_set:
+            update_data["manager_id"] = await self._resolve_manager_id(employee, payload.manager_id)
+
         if update_data:
             employee = await self.employee_repo.update_partial(user_id, update_data)
 
@@ -196,7 +216,8 @@ class UserService:
         if await self.user_repo.find_by_email(email):
             raise ValueError("User already registered")
 
-        if await self.employee_repo.get_by_email(email):
+        # Архивный сотрудник тоже занимает email
+        if await self.employee_repo.get_by_email(email, include_archived=True):
             raise ValueError("Employee with the same email already exists")
 
         new_user = User(id=uuid7(), email=email, password_hash=password_hash, role=role)
@@ -216,7 +237,7 @@ class UserService:
             if not creator_employee:
                 raise ValueError("Creator employee record not found")
 
-            team = await self.team_repo.create(
+            team = await self.team_repo.get_or_create(
                 name=team_name,
                 leader_employee_id=creator_employee.id,
                 parent_id=None,
@@ -291,7 +312,7 @@ class UserService:
             if not team:
                 if i != team_names_len - 1:
                     raise ValueError(f"Team '{name}' not found")
-                team = await self.team_repo.create(
+                team = await self.team_repo.get_or_create(
                     name=name,
                     leader_employee_id=employee.id,
                     parent_id=parent_id,
@@ -306,6 +327,29 @@ class UserService:
 
         return parent_team.id
 
+    async def _build_user_dtos(self, employees: list[tuple[Employee, Employee | None]]) -> list[UserDTO]:
+        if not employees:
+            return []
+
+        lookup = build_team_lookup(await self.team_repo.get_all())
+        admin_emails = await self.user_repo.find_admin_emails([employee.email for employee, _ in employees])
+
+        return [
+            UserDTO.from_employee(employee, boss=boss, is_admin=employee.email in admin_emails, team_lookup=lookup)
+            for employee, boss in employees
+        ]
+
+    async def _resolve_manager_id(self, employee: Employee, manager_id: UUID | None) -> UUID | None:
+        if manager_id is None:
+            return None
+        if manager_id == employee.id:
+            raise ValueError("Employee cannot be their own manager")
+
+        manager = await self.employee_repo.get_by_id(manager_id)
+        if not manager:
+            raise ValueError(f"Manager with id '{manager_id}' not found")
+        return manager.id
+
     async def _are_employees_in_teams_below(self, team: Team) -> bool:
         teams_below = await self.team_repo.find_by_parent_id(team.id)
         for child in teams_below:
@@ -38,7 +38,75 @@ class ActiveDirectorySettings(BaseSettings):
     use_ssl: bool = False
     user: Optional[str] = None
     password: Optional[SecretStr] = None
+    # Резервные контроллеры домена, опрашиваются по кругу вместе с host
+    hosts: list[str] = Field(default_factory=list)
+    timeout: int = 10
+    pool_max_size: int = 8
+    pool_acquire_timeout: float = 30.0
+    # Соединение, простоявшее дольше, проверяется перед выдачей из пула
+    pool_keepalive_seconds: float = 300.0
+    # Вход в /auth/login по паролю AD (bind от имени пользователя)
+    login_enabled: bool = False
+    # Сколько помнить успешную и неуспешную проверку одной и той же пары логин/пароль
+    login_success_ttl_seconds: float = 60.0
+    login_failure_ttl_seconds: float = 15.0
+    login_cache_max_entries: int = 10_000
     page_size: int = 1000
+    # Дополнительные базы поиска (OU, юрлица); пустой список означает поиск только под base_dn
+    base_dns: list[str] = Field(default_factory=list)
+    # Сколько баз выгружается одновременно, у каждой своё соединение
+    fetch_concurrency: int = 4
+    import_batch_size: int = 1000
+    # Импорт фотографий из thumbnailPhoto в аватары; рендер идёт в photo_workers процессах
+    import_photos: bool = False
+    photo_workers: int = 2
+    # Полная синхронизация не архивирует больше этой доли активных сотрудников за прогон
+    archive_max_fraction: float = 0.1
+    # Столько пропавших сотрудников архивируется без проверки доли: в маленьком каталоге доля теряет смысл
+    archive_min_count: int = 10
+    # Атрибуты, которые читает импорт (AdImportService._map_entry и соседние методы)
+    attributes: list[str] = Field(
+        default_factory=lambda: [
+            "objectGUID",
+            "distinguishedName",
+            "mail",
+            "userPrincipalName",
+            "displayName",
+            "name",
+            "givenName",
+            "middleName",
+            "sn",
+            "title",
+            "department",
+            "company",
+            "l",
+            "telephoneNumber",
+            "manager",
+            "birthDate",
+            "whenCreated",
+            "userAccountControl",
+        ]
+    )
+
+    model_config = SettingsConfigDict(extra="forbid")
+
+    @property
+    def search_bases(self) -> list[str]:
+        return self.base_dns or [self.base_dn]
+
+    @property
+    def servers(self) -> list[str]:
+        return [self.host, *(host for host in self.hosts if host != self.host)]
+
+
+class AvatarSettings(BaseSettings):
+    cache_max_bytes: int = 32 * 1024 * 1024
+    max_upload_bytes: int = 5 * 1024 * 1024
+    max_image_pixels: int = 24_000_000
+    sizes: list[int] = Field(default_factory=lambda: [32, 64, 128, 256])
+    master_size: int = 512
+    # Аватаров в одной пакетной вставке: мастер весит до сотен килобайт
+    import_batch_size: int = 100
 
     model_config = SettingsConfigDict(extra="forbid")
 
@@ -54,5 +122,7 @@ class Settings(BaseSettings):
 
     ad: Optional[ActiveDirectorySettings] = None
 
+    avatar: AvatarSettings = Field(default_factory=AvatarSettings)
+
 
 settings = Settings()
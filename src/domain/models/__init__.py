@@ -4,7 +4,9 @@ from .team import Team
 from .status_history import StatusHistory
 from .status import EmployeeStatus
 from .user import User
-from .avatar import Avatar
+from .avatar import Avatar, AvatarRendition
+from .ad_sync_state import AdSyncState
+from .import_run import ImportRun
 
 __all__ = [
     "Employee",
@@ -14,4 +16,7 @@ __all__ = [
     "EmployeeStatus",
     "User",
     "Avatar",
+    "AvatarRendition",
+    "AdSyncState",
+    "ImportRun",
 ]
@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict
+
+
+class AdSyncState(BaseModel):
+    server_id: str
+    highest_usn: int
+    synced_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
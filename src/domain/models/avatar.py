@@ -5,8 +5,19 @@ from pydantic import BaseModel, ConfigDict
 
 class Avatar(BaseModel):
     employee_id: UUID
+    image_hash: str
     mime_type: str
-    image_small: bytes
-    image_large: bytes
+    master: bytes
+    # sha256 исходной фотографии из AD; None — аватар загружен вручную
+    source_hash: str | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AvatarRendition(BaseModel):
+    image_hash: str
+    size: int
+    mime_type: str
+    content: bytes
 
     model_config = ConfigDict(from_attributes=True)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
-from datetime import date
+from datetime import date, datetime
 
 from .position import Position
 from .team import Team
@@ -25,6 +25,8 @@ class Employee(BaseModel):
     about_me: str | None = None
     legal_entity: str | None = None
     department: str | None = None
+    archived_at: datetime | None = None
+    manager_id: UUID | None = None
     position: Position
     team: Team
     status_history: list[StatusHistory] = Field(default_factory=list)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Literal
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
+
+ImportRunStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class ImportRun(BaseModel):
+    id: UUID
+    status: ImportRunStatus
+    mode: str
+    processed: int = 0
+    imported: int | None = None
+    updated: int | None = None
+    archived: int | None = None
+    error: str | None = None
+    warning: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    heartbeat_at: datetime | None = None
+
+    model_config = ConfigDict(from_attributes=True)
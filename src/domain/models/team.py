@@ -7,5 +7,7 @@ class Team(BaseModel):
     name: str
     parent_id: UUID | None = None
     leader_employee_id: UUID
+    # Вычисляемый в БД ключ уникальности (teams.normalized_name)
+    normalized_name: str | None = None
 
     model_config = ConfigDict(from_attributes=True)
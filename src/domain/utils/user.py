@@ -83,6 +83,11 @@ def resolve_status(employee: Employee) -> EmployeeStatus:
 
 
 def resolve_boss_id(employee: Employee, lookup: Dict[UUID, Team]) -> Optional[UUID]:
+    # Явно заданный руководитель важнее руководителей команд
+    manager_id = getattr(employee, "manager_id", None)
+    if manager_id and manager_id != employee.id:
+        return manager_id
+
     team = employee.team
     if not team:
         return None
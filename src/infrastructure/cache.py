@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+from src.config import settings
+from src.domain.models import Position
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class ByteSizeLRUCache(Generic[K, V]):
+    """
+    LRU-кэш, ограниченный суммарным размером значений в байтах.
+    Размер значения передаётся явно при записи, поэтому кэш подходит для любых объектов.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: K, value: V, size: int) -> None:
+        with self._lock:
+            self._discard(key)
+            # Значение больше всего кэша только вытеснило бы остальные записи
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self._current_bytes += size
+
+            while self._current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _discard(self, key: K) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._current_bytes -= entry[1]
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Кэш с временем жизни у каждой записи и ограничением числа записей.
+    При переполнении вытесняется запись, записанная раньше всех.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: K, value: V, ttl: float) -> None:
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class PositionCache:
+    """
+    Процессный кэш должностей по названию. Должностей немного и они не удаляются,
+    поэтому кэш не ограничен по размеру и не требует инвалидации.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, Position] = {}
+        self._lock = threading.Lock()
+
+    def get(self, title: str) -> Position | None:
+        with self._lock:
+            return self._entries.get(title)
+
+    def put(self, position: Position) -> None:
+        with self._lock:
+            self._entries[position.title] = position
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+avatar_cache: ByteSizeLRUCache = ByteSizeLRUCache(settings.avatar.cache_max_bytes)
+position_cache = PositionCache()
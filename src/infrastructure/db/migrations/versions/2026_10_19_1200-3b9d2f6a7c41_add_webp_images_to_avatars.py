@@ -0,0 +1,28 @@
+"""add webp images to avatars
+
+Revision ID: 3b9d2f6a7c41
+Revises: 25cd2ef418e1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2f6a7c41'
+down_revision: Union[str, Sequence[str], None] = '25cd2ef418e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('avatars', sa.Column('image_small_webp', sa.LargeBinary(), nullable=True))
+    op.add_column('avatars', sa.Column('image_large_webp', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('avatars', 'image_large_webp')
+    op.drop_column('avatars', 'image_small_webp')
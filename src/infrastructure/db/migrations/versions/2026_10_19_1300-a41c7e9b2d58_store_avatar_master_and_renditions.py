@@ -0,0 +1,54 @@
+"""store avatar master and lazily rendered renditions
+
+Revision ID: a41c7e9b2d58
+Revises: 3b9d2f6a7c41
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c7e9b2d58'
+down_revision: Union[str, Sequence[str], None] = '3b9d2f6a7c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('avatars', sa.Column('master', sa.LargeBinary(), nullable=True))
+    # Оригиналы старых загрузок не сохранялись, лучшее, что есть, — PNG 128px
+    op.execute("UPDATE avatars SET master = image_large, mime_type = 'image/png'")
+    op.alter_column('avatars', 'master', nullable=False)
+
+    op.drop_column('avatars', 'image_large_webp')
+    op.drop_column('avatars', 'image_small_webp')
+    op.drop_column('avatars', 'image_large')
+    op.drop_column('avatars', 'image_small')
+
+    op.create_table(
+        'avatar_renditions',
+        sa.Column('employee_id', sa.UUID(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mime_type', sa.String(length=128), nullable=False),
+        sa.Column('content', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['employee_id'], ['avatars.employee_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('employee_id', 'size', 'mime_type')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('avatar_renditions')
+
+    op.add_column('avatars', sa.Column('image_small', sa.LargeBinary(), nullable=True))
+    op.add_column('avatars', sa.Column('image_large', sa.LargeBinary(), nullable=True))
+    op.add_column('avatars', sa.Column('image_small_webp', sa.LargeBinary(), nullable=True))
+    op.add_column('avatars', sa.Column('image_large_webp', sa.LargeBinary(), nullable=True))
+    op.execute("UPDATE avatars SET image_small = master, image_large = master")
+    op.alter_column('avatars', 'image_small', nullable=False)
+    op.alter_column('avatars', 'image_large', nullable=False)
+
+    op.drop_column('avatars', 'master')
@@ -0,0 +1,118 @@
+"""deduplicate avatar images by content hash
+
+Revision ID: c52e8f1a9b63
+Revises: a41c7e9b2d58
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52e8f1a9b63'
+down_revision: Union[str, Sequence[str], None] = 'a41c7e9b2d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRACK_IMAGE_REFS_FUNCTION = """
+CREATE OR REPLACE FUNCTION avatars_track_image_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE avatar_images SET ref_count = ref_count + 1 WHERE hash = NEW.image_hash;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE avatar_images SET ref_count = ref_count - 1 WHERE hash = OLD.image_hash;
+        DELETE FROM avatar_images WHERE hash = OLD.image_hash AND ref_count <= 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'avatar_images',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('mime_type', sa.String(length=128), nullable=False, server_default='image/png'),
+        sa.Column('content', sa.LargeBinary(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('hash')
+    )
+    op.execute(
+        "INSERT INTO avatar_images (hash, mime_type, content, ref_count) "
+        "SELECT encode(sha256(master), 'hex'), min(mime_type), master, count(*) "
+        "FROM avatars GROUP BY master"
+    )
+
+    op.add_column('avatars', sa.Column('image_hash', sa.String(length=64), nullable=True))
+    op.execute("UPDATE avatars SET image_hash = encode(sha256(master), 'hex')")
+    op.alter_column('avatars', 'image_hash', nullable=False)
+    op.create_foreign_key(
+        'avatars_image_hash_fkey', 'avatars', 'avatar_images', ['image_hash'], ['hash']
+    )
+    op.create_index('ix_avatars_image_hash', 'avatars', ['image_hash'])
+    op.drop_column('avatars', 'master')
+    op.drop_column('avatars', 'mime_type')
+
+    # Рендеры — производные данные, проще перестроить их по требованию
+    op.drop_table('avatar_renditions')
+    op.create_table(
+        'avatar_renditions',
+        sa.Column('image_hash', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mime_type', sa.String(length=128), nullable=False),
+        sa.Column('content', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['image_hash'], ['avatar_images.hash'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('image_hash', 'size', 'mime_type')
+    )
+
+    op.execute(TRACK_IMAGE_REFS_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER avatars_image_refs_insert_delete "
+        "AFTER INSERT OR DELETE ON avatars "
+        "FOR EACH ROW EXECUTE FUNCTION avatars_track_image_refs()"
+    )
+    op.execute(
+        "CREATE TRIGGER avatars_image_refs_update "
+        "AFTER UPDATE OF image_hash ON avatars "
+        "FOR EACH ROW WHEN (OLD.image_hash IS DISTINCT FROM NEW.image_hash) "
+        "EXECUTE FUNCTION avatars_track_image_refs()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS avatars_image_refs_update ON avatars")
+    op.execute("DROP TRIGGER IF EXISTS avatars_image_refs_insert_delete ON avatars")
+    op.execute("DROP FUNCTION IF EXISTS avatars_track_image_refs()")
+
+    op.drop_table('avatar_renditions')
+    op.create_table(
+        'avatar_renditions',
+        sa.Column('employee_id', sa.UUID(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mime_type', sa.String(length=128), nullable=False),
+        sa.Column('content', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['employee_id'], ['avatars.employee_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('employee_id', 'size', 'mime_type')
+    )
+
+    op.add_column('avatars', sa.Column('master', sa.LargeBinary(), nullable=True))
+    op.add_column(
+        'avatars',
+        sa.Column('mime_type', sa.String(length=128), nullable=False, server_default='image/png'),
+    )
+    op.execute(
+        "UPDATE avatars SET master = avatar_images.content, mime_type = avatar_images.mime_type "
+        "FROM avatar_images WHERE avatar_images.hash = avatars.image_hash"
+    )
+    op.alter_column('avatars', 'master', nullable=False)
+    op.drop_index('ix_avatars_image_hash', table_name='avatars')
+    op.drop_constraint('avatars_image_hash_fkey', 'avatars', type_='foreignkey')
+    op.drop_column('avatars', 'image_hash')
+
+    op.drop_table('avatar_images')
@@ -0,0 +1,32 @@
+"""add ad sync state
+
+Revision ID: d7a3e5b1f284
+Revises: c52e8f1a9b63
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3e5b1f284'
+down_revision: Union[str, Sequence[str], None] = 'c52e8f1a9b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ad_sync_state',
+        sa.Column('server_id', sa.String(), nullable=False),
+        sa.Column('highest_usn', sa.BigInteger(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('server_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ad_sync_state')
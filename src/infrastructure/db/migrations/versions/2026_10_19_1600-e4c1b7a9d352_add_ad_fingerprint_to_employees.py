@@ -0,0 +1,26 @@
+"""add ad_fingerprint to employees
+
+Revision ID: e4c1b7a9d352
+Revises: d7a3e5b1f284
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c1b7a9d352'
+down_revision: Union[str, Sequence[str], None] = 'd7a3e5b1f284'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('employees', sa.Column('ad_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('employees', 'ad_fingerprint')
@@ -0,0 +1,50 @@
+"""add import runs
+
+Revision ID: f1b8c3d6e027
+Revises: e4c1b7a9d352
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b8c3d6e027'
+down_revision: Union[str, Sequence[str], None] = 'e4c1b7a9d352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'import_runs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', sa.String(length=16), server_default='queued', nullable=False),
+        sa.Column('mode', sa.String(length=16), nullable=False),
+        sa.Column('processed', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('imported', sa.Integer(), nullable=True),
+        sa.Column('updated', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_import_runs_created_at', 'import_runs', ['created_at'])
+    op.create_index(
+        'uq_import_runs_single_active',
+        'import_runs',
+        [sa.text('(true)')],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_import_runs_single_active', table_name='import_runs')
+    op.drop_index('ix_import_runs_created_at', table_name='import_runs')
+    op.drop_table('import_runs')
@@ -0,0 +1,28 @@
+"""add archived_at to employees
+
+Revision ID: 0a6d2f9c4e15
+Revises: f1b8c3d6e027
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6d2f9c4e15'
+down_revision: Union[str, Sequence[str], None] = 'f1b8c3d6e027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('employees', sa.Column('archived_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('import_runs', sa.Column('archived', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('import_runs', 'archived')
+    op.drop_column('employees', 'archived_at')
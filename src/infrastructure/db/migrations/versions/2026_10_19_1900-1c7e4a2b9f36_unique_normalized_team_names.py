@@ -0,0 +1,69 @@
+"""unique normalized team names
+
+Revision ID: 1c7e4a2b9f36
+Revises: 0a6d2f9c4e15
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c7e4a2b9f36'
+down_revision: Union[str, Sequence[str], None] = '0a6d2f9c4e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NORMALIZED_NAME_SQL = "lower(regexp_replace(btrim(name), '\\s+', ' ', 'g'))"
+
+DUPLICATE_TEAMS_SQL = """
+CREATE TEMPORARY TABLE team_merge AS
+SELECT id, keeper_id
+FROM (
+    SELECT id, first_value(id) OVER (PARTITION BY normalized_name, parent_id ORDER BY id) AS keeper_id
+    FROM teams
+) ranked
+WHERE id <> keeper_id
+"""
+
+
+def upgrade() -> None:
+    op.add_column(
+        'teams',
+        sa.Column('normalized_name', sa.String(), sa.Computed(NORMALIZED_NAME_SQL, persisted=True), nullable=False),
+    )
+
+    # Сливаем дубликаты в самую раннюю команду. После переноса дочерних команд
+    # дубликаты могут появиться уровнем ниже, поэтому повторяем, пока они есть.
+    conn = op.get_bind()
+    while True:
+        conn.execute(sa.text(DUPLICATE_TEAMS_SQL))
+        merged = conn.execute(sa.text("SELECT count(*) FROM team_merge")).scalar_one()
+        if merged:
+            conn.execute(sa.text(
+                "UPDATE employees SET team_id = m.keeper_id FROM team_merge m WHERE employees.team_id = m.id"
+            ))
+            conn.execute(sa.text(
+                "UPDATE teams SET parent_id = m.keeper_id FROM team_merge m WHERE teams.parent_id = m.id"
+            ))
+            conn.execute(sa.text("DELETE FROM teams USING team_merge m WHERE teams.id = m.id"))
+        conn.execute(sa.text("DROP TABLE team_merge"))
+        if not merged:
+            break
+
+    op.create_index(
+        'uq_teams_normalized_name_parent_id',
+        'teams',
+        ['normalized_name', 'parent_id'],
+        unique=True,
+        postgresql_nulls_not_distinct=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_teams_normalized_name_parent_id', table_name='teams')
+    op.drop_column('teams', 'normalized_name')
@@ -0,0 +1,46 @@
+"""unique position titles
+
+Revision ID: 2d8f5b3a0e47
+Revises: 1c7e4a2b9f36
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8f5b3a0e47'
+down_revision: Union[str, Sequence[str], None] = '1c7e4a2b9f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DUPLICATE_POSITIONS_SQL = """
+CREATE TEMPORARY TABLE position_merge AS
+SELECT id, keeper_id
+FROM (
+    SELECT id, first_value(id) OVER (PARTITION BY title ORDER BY id) AS keeper_id
+    FROM positions
+) ranked
+WHERE id <> keeper_id
+"""
+
+
+def upgrade() -> None:
+    # Сливаем одноимённые должности в самую раннюю
+    conn = op.get_bind()
+    conn.execute(sa.text(DUPLICATE_POSITIONS_SQL))
+    conn.execute(sa.text(
+        "UPDATE employees SET position_id = m.keeper_id FROM position_merge m WHERE employees.position_id = m.id"
+    ))
+    conn.execute(sa.text("DELETE FROM positions USING position_merge m WHERE positions.id = m.id"))
+    conn.execute(sa.text("DROP TABLE position_merge"))
+
+    op.create_index('uq_positions_title', 'positions', ['title'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_positions_title', table_name='positions')
@@ -0,0 +1,26 @@
+"""add source_hash to avatars
+
+Revision ID: 3e9a6c4b1f58
+Revises: 2d8f5b3a0e47
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e9a6c4b1f58'
+down_revision: Union[str, Sequence[str], None] = '2d8f5b3a0e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('avatars', sa.Column('source_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('avatars', 'source_hash')
@@ -0,0 +1,32 @@
+"""add manager_id to employees
+
+Revision ID: 4f0b7d5c2a69
+Revises: 3e9a6c4b1f58
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f0b7d5c2a69'
+down_revision: Union[str, Sequence[str], None] = '3e9a6c4b1f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('employees', sa.Column('manager_id', sa.UUID(), nullable=True))
+    op.create_foreign_key(
+        'employees_manager_id_fkey', 'employees', 'employees', ['manager_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index(op.f('ix_employees_manager_id'), 'employees', ['manager_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_employees_manager_id'), table_name='employees')
+    op.drop_constraint('employees_manager_id_fkey', 'employees', type_='foreignkey')
+    op.drop_column('employees', 'manager_id')
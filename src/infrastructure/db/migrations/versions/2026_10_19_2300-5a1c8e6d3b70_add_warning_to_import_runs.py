@@ -0,0 +1,26 @@
+"""add warning to import_runs
+
+Revision ID: 5a1c8e6d3b70
+Revises: 4f0b7d5c2a69
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a1c8e6d3b70'
+down_revision: Union[str, Sequence[str], None] = '4f0b7d5c2a69'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('import_runs', sa.Column('warning', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('import_runs', 'warning')
@@ -0,0 +1,29 @@
+"""add heartbeat to import_runs
+
+Revision ID: 6b2d9f1e4c81
+Revises: 5a1c8e6d3b70
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2d9f1e4c81'
+down_revision: Union[str, Sequence[str], None] = '5a1c8e6d3b70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'import_runs',
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('import_runs', 'heartbeat_at')
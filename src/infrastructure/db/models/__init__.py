@@ -6,6 +6,8 @@ from . import status_history as _status_history
 from . import employee as _employee
 from . import user as _user
 from . import avatar as _avatar
+from . import ad_sync_state as _ad_sync_state
+from . import import_run as _import_run
 
 TeamOrm = _team.TeamOrm
 PositionOrm = _position.PositionOrm
@@ -13,6 +15,10 @@ StatusHistoryOrm = _status_history.StatusHistoryOrm
 EmployeeOrm = _employee.EmployeeOrm
 UserOrm = _user.UserOrm
 AvatarOrm = _avatar.AvatarOrm
+AvatarImageOrm = _avatar.AvatarImageOrm
+AvatarRenditionOrm = _avatar.AvatarRenditionOrm
+AdSyncStateOrm = _ad_sync_state.AdSyncStateOrm
+ImportRunOrm = _import_run.ImportRunOrm
 
 __all__ = [
     "Base",
@@ -22,4 +28,8 @@ __all__ = [
     "EmployeeOrm",
     "UserOrm",
     "AvatarOrm",
+    "AvatarImageOrm",
+    "AvatarRenditionOrm",
+    "AdSyncStateOrm",
+    "ImportRunOrm",
 ]
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class AdSyncStateOrm(Base):
+    """
+    Отметка последней успешной синхронизации с AD.
+    uSNChanged локален для контроллера домена, поэтому отметка хранится по каждому DC отдельно.
+    """
+    __tablename__ = "ad_sync_state"
+
+    server_id: Mapped[str] = mapped_column(String, primary_key=True)
+    highest_usn: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    synced_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
@@ -2,19 +2,82 @@ from __future__ import annotations
 
 from uuid import UUID
 
-from sqlalchemy import ForeignKey, LargeBinary, String
+from sqlalchemy import DDL, ForeignKey, Integer, LargeBinary, String, event
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
 
 
+class AvatarImageOrm(Base):
+    """Уникальные мастер-изображения, адресуемые sha256 содержимого."""
+
+    __tablename__ = "avatar_images"
+
+    hash: Mapped[str] = mapped_column(String(length=64), primary_key=True)
+    mime_type: Mapped[str] = mapped_column(String(length=128), default="image/png")
+    content: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+
 class AvatarOrm(Base):
     __tablename__ = "avatars"
 
     employee_id: Mapped[UUID] = mapped_column(
         PG_UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True
     )
-    mime_type: Mapped[str] = mapped_column(String(length=128), default="image/png")
-    image_small: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
-    image_large: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    image_hash: Mapped[str] = mapped_column(
+        String(length=64), ForeignKey("avatar_images.hash"), nullable=False, index=True
+    )
+    # sha256 исходной фотографии из AD; у загруженных вручную аватаров NULL
+    source_hash: Mapped[str | None] = mapped_column(String(length=64), nullable=True)
+
+
+class AvatarRenditionOrm(Base):
+    __tablename__ = "avatar_renditions"
+
+    image_hash: Mapped[str] = mapped_column(
+        String(length=64), ForeignKey("avatar_images.hash", ondelete="CASCADE"), primary_key=True
+    )
+    size: Mapped[int] = mapped_column(Integer, primary_key=True)
+    mime_type: Mapped[str] = mapped_column(String(length=128), primary_key=True)
+    content: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+# Счётчик ссылок ведёт БД: так он остаётся верным и при каскадном удалении сотрудника
+TRACK_IMAGE_REFS_FUNCTION = """
+CREATE OR REPLACE FUNCTION avatars_track_image_refs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE avatar_images SET ref_count = ref_count + 1 WHERE hash = NEW.image_hash;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE avatar_images SET ref_count = ref_count - 1 WHERE hash = OLD.image_hash;
+        DELETE FROM avatar_images WHERE hash = OLD.image_hash AND ref_count <= 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+TRACK_IMAGE_REFS_TRIGGERS = (
+    """
+    CREATE TRIGGER avatars_image_refs_insert_delete
+    AFTER INSERT OR DELETE ON avatars
+    FOR EACH ROW EXECUTE FUNCTION avatars_track_image_refs()
+    """,
+    """
+    CREATE TRIGGER avatars_image_refs_update
+    AFTER UPDATE OF image_hash ON avatars
+    FOR EACH ROW WHEN (OLD.image_hash IS DISTINCT FROM NEW.image_hash)
+    EXECUTE FUNCTION avatars_track_image_refs()
+    """,
+)
+
+event.listen(
+    AvatarOrm.__table__,
+    "after_create",
+    DDL(TRACK_IMAGE_REFS_FUNCTION).execute_if(dialect="postgresql"),
+)
+for trigger_ddl in TRACK_IMAGE_REFS_TRIGGERS:
+    event.listen(AvatarOrm.__table__, "after_create", DDL(trigger_ddl).execute_if(dialect="postgresql"))
@@ -3,9 +3,9 @@ from __future__ import annotations
 from typing import Optional, TYPE_CHECKING
 from uuid import UUID
 from uuid6 import uuid7
-from datetime import date
+from datetime import date, datetime
 
-from sqlalchemy import String, Date, ForeignKey, Boolean
+from sqlalchemy import String, Date, DateTime, ForeignKey, Boolean
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
@@ -27,6 +27,10 @@ class EmployeeOrm(Base):
     middle_name: Mapped[str] = mapped_column(String, nullable=False)
     last_name: Mapped[str] = mapped_column(String, nullable=True)
     object_id: Mapped[str | None] = mapped_column(String, nullable=True, unique=True)
+    # Хэш полей, пришедших из AD при последней синхронизации
+    ad_fingerprint: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Сотрудник удалён или отключён в AD; из справочника скрывается, но не удаляется
+    archived_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     birth_date: Mapped[date] = mapped_column(Date, nullable=False)
     is_birthyear_visible: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
     hire_date: Mapped[date] = mapped_column(Date, nullable=False)
@@ -47,6 +51,10 @@ class EmployeeOrm(Base):
     position_id: Mapped[UUID] = mapped_column(
         PG_UUID(as_uuid=True), ForeignKey("positions.id"), nullable=False
     )
+    # Непосредственный руководитель из атрибута manager в AD или заданный администратором
+    manager_id: Mapped[UUID | None] = mapped_column(
+        PG_UUID(as_uuid=True), ForeignKey("employees.id", ondelete="SET NULL"), nullable=True, index=True
+    )
 
     team: Mapped["TeamOrm"] = relationship(
         "TeamOrm",
@@ -0,0 +1,46 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import DateTime, Index, Integer, String, Text, func, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from uuid6 import uuid7
+
+from .base import Base
+
+ACTIVE_IMPORT_STATUSES = ("queued", "running")
+
+
+class ImportRunOrm(Base):
+    __tablename__ = "import_runs"
+
+    id: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid7)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, server_default="queued")
+    mode: Mapped[str] = mapped_column(String(16), nullable=False)
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    imported: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    updated: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    archived: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Успешный прогон, часть которого пропущена (например, архивация сверх порога)
+    warning: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Обновляется процессом, выполняющим прогон; по давности отличаем брошенные прогоны от живых
+    heartbeat_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    __table_args__ = (
+        # Не больше одного незавершённого импорта одновременно, даже при нескольких процессах
+        Index(
+            "uq_import_runs_single_active",
+            text("(true)"),
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        Index("ix_import_runs_created_at", "created_at"),
+    )
@@ -1,5 +1,5 @@
 from uuid import UUID
-from sqlalchemy import String
+from sqlalchemy import Index, String
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from uuid6 import uuid7
@@ -10,6 +10,9 @@ from src.infrastructure.db.models.employee import EmployeeOrm
 
 class PositionOrm(Base):
     __tablename__ = "positions"
+    __table_args__ = (
+        Index("uq_positions_title", "title", unique=True),
+    )
 
     id: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True),
                                      primary_key=True,
@@ -4,7 +4,7 @@ from typing import Optional, TYPE_CHECKING
 from uuid import UUID
 from uuid6 import uuid7
 
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import Computed, ForeignKey, Index, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
@@ -13,6 +13,9 @@ from .base import Base
 if TYPE_CHECKING:
     from .employee import EmployeeOrm
 
+# Регистр и повторяющиеся пробелы не различают команды
+NORMALIZED_NAME_SQL = "lower(regexp_replace(btrim(name), '\\s+', ' ', 'g'))"
+
 
 class TeamOrm(Base):
     __tablename__ = "teams"
@@ -21,6 +24,7 @@ class TeamOrm(Base):
         PG_UUID(as_uuid=True), primary_key=True, default=uuid7
     )
     name: Mapped[str] = mapped_column(String, nullable=False)
+    normalized_name: Mapped[str] = mapped_column(String, Computed(NORMALIZED_NAME_SQL, persisted=True))
 
     parent_id: Mapped[UUID | None] = mapped_column(
         PG_UUID(as_uuid=True), ForeignKey("teams.id")
@@ -52,3 +56,13 @@ class TeamOrm(Base):
         primaryjoin="TeamOrm.leader_employee_id == EmployeeOrm.id",
         foreign_keys="TeamOrm.leader_employee_id",
     )
+
+    __table_args__ = (
+        Index(
+            "uq_teams_normalized_name_parent_id",
+            "normalized_name",
+            "parent_id",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
@@ -1,14 +1,23 @@
 from __future__ import annotations
+import asyncio
 import os
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Any, TypeVar
 from ldap3 import Server, Connection, Tls, ALL, SUBTREE, ALL_ATTRIBUTES, MODIFY_REPLACE, SIMPLE
 import ssl
 
+from src.infrastructure.ldap_pool import LdapConnectionPool
+
+# OID контрола simple paged results
+PAGED_RESULTS_CONTROL = "1.2.840.113556.1.4.319"
+
 
 class LdapClient:
     """
     Простой LDAP-клиент на ldap3.
     Подходит для OpenLDAP/389-DS/AD (с корректировками DN и атрибутов).
+    С pool операции выполняются на соединениях общего пула, а не на собственном.
     """
 
     def __init__(
@@ -21,8 +30,16 @@ class LdapClient:
         bind_password: Optional[str] = None,
         base_dn: str = "",
         timeout: int = 5,
+        pool: Optional[LdapConnectionPool] = None,
     ):
         self.base_dn = base_dn
+        self.timeout = timeout
+        self.pool = pool
+        self.conn: Optional[Connection] = None
+        if pool is not None:
+            self.server = pool.server_pool
+            return
+
         tls = None
         if use_ssl or start_tls:
             tls = Tls(
@@ -64,31 +81,79 @@ class LdapClient:
         base = search_base or self.base_dn
         attrs = attributes or ALL_ATTRIBUTES
 
-        ok = self.conn.search(
-            search_base=base,
-            search_filter=ldap_filter,
-            search_scope=scope,
-            attributes=attrs,
-            size_limit=size_limit,
-        )
-        if not ok:
-            raise RuntimeError(f"Search error: {self.conn.result}")
-
-        results: List[Dict[str, Any]] = []
-        for entry in self.conn.response:
-            if entry.get("type") != "searchResEntry":
-                continue
-            results.append(
-                {"dn": entry["dn"], "attributes": entry["attributes"]}
+        with self._connection() as conn:
+            ok = conn.search(
+                search_base=base,
+                search_filter=ldap_filter,
+                search_scope=scope,
+                attributes=attrs,
+                size_limit=size_limit,
             )
-        return results
+            # ldap3 возвращает False и для успешного поиска без результатов
+            if not ok and conn.result.get("result") != 0:
+                raise RuntimeError(f"Search error: {conn.result}")
+
+            results: List[Dict[str, Any]] = []
+            for entry in conn.response:
+                if entry.get("type") != "searchResEntry":
+                    continue
+                results.append(
+                    {"dn": entry["dn"], "attributes": entry["attributes"]}
+                )
+            return results
+
+    def iter_search(
+        self,
+        search_base: Optional[str],
+        ldap_filter: str,
+        attributes: Optional[List[str]] = None,
+        scope=SUBTREE,
+        page_size: int = 500,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Постраничный поиск (simple paged results, RFC 2696): записи отдаются по мере
+        прихода страниц, в памяти держится одна страница, серверный size limit не мешает.
+        Соединение занято, пока генератор не исчерпан или не закрыт.
+        """
+        base = search_base or self.base_dn
+        attrs = attributes or ALL_ATTRIBUTES
+        cookie = None
+
+        with self._connection() as conn:
+            while True:
+                ok = conn.search(
+                    search_base=base,
+                    search_filter=ldap_filter,
+                    search_scope=scope,
+                    attributes=attrs,
+                    paged_size=page_size,
+                    paged_cookie=cookie,
+                )
+                if not ok and conn.result.get("result") != 0:
+                    raise RuntimeError(f"Search error: {conn.result}")
+
+                for entry in conn.response:
+                    if entry.get("type") != "searchResEntry":
+                        continue
+                    yield {"dn": entry["dn"], "attributes": entry["attributes"]}
+
+                controls = conn.result.get("controls", {})
+                cookie = controls.get(PAGED_RESULTS_CONTROL, {}).get("value", {}).get("cookie")
+                if not cookie:
+                    break
 
     # --- Проверка логина пользователя (bind-as-user) ---
     def verify_password(self, user_dn: str, password: str) -> bool:
         """
         Пытается забиндиться от имени пользователя. Пароль не хранится.
         """
-        tmp = Connection(self.server, user=user_dn, password=password, auto_bind=False)
+        # Bind с пустым паролем сервер считает анонимным и принимает
+        if not password:
+            return False
+
+        tmp = Connection(
+            self.server, user=user_dn, password=password, receive_timeout=self.timeout, auto_bind=False
+        )
         try:
             return tmp.bind()
         finally:
@@ -96,30 +161,121 @@ class LdapClient:
 
     # --- Создание записи ---
     def add_entry(self, dn: str, attributes: Dict[str, Any]) -> None:
-        ok = self.conn.add(dn, attributes=attributes)
-        if not ok:
-            raise RuntimeError(f"Add failed: {self.conn.result}")
+        with self._connection() as conn:
+            ok = conn.add(dn, attributes=attributes)
+            if not ok:
+                raise RuntimeError(f"Add failed: {conn.result}")
 
     # --- Обновление атрибутов (полная замена значений) ---
     def replace_attributes(self, dn: str, attributes: Dict[str, Any]) -> None:
         changes = {k: [(MODIFY_REPLACE, v if isinstance(v, list) else [v])] for k, v in attributes.items()}
-        ok = self.conn.modify(dn, changes)
-        if not ok:
-            raise RuntimeError(f"Modify failed: {self.conn.result}")
+        with self._connection() as conn:
+            ok = conn.modify(dn, changes)
+            if not ok:
+                raise RuntimeError(f"Modify failed: {conn.result}")
 
     # --- Удаление записи ---
     def delete_entry(self, dn: str) -> None:
-        ok = self.conn.delete(dn)
-        if not ok:
-            raise RuntimeError(f"Delete failed: {self.conn.result}")
+        with self._connection() as conn:
+            ok = conn.delete(dn)
+            if not ok:
+                raise RuntimeError(f"Delete failed: {conn.result}")
 
     # --- Закрытие соединения ---
     def close(self) -> None:
+        # Соединения пула принадлежат пулу и закрываются вместе с ним
+        if self.conn is None:
+            return
         try:
             self.conn.unbind()
         except Exception:
             pass
 
+    @contextmanager
+    def _connection(self) -> Iterator[Connection]:
+        if self.pool is not None:
+            with self.pool.acquire() as conn:
+                yield conn
+        else:
+            yield self.conn
+
+
+T = TypeVar("T")
+
+
+class AsyncLdapClient:
+    """
+    Асинхронная обёртка над LdapClient для обработчиков FastAPI.
+    Блокирующие вызовы выполняются на собственном ограниченном пуле потоков,
+    чтобы медленный AD не занимал общий executor event loop.
+    """
+
+    def __init__(self, client: LdapClient, *, max_workers: int = 4, timeout: float = 10.0):
+        self.client = client
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ldap")
+        # Слот освобождается, когда поток действительно закончил работу, а не когда вызов
+        # отменён: так отменённые и просроченные вызовы не копят очередь в executor
+        self._slots = asyncio.Semaphore(max_workers)
+
+    async def search(
+        self,
+        search_base: Optional[str],
+        ldap_filter: str,
+        attributes: Optional[List[str]] = None,
+        scope=SUBTREE,
+        size_limit: int = 0,
+        *,
+        timeout: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        return await self._call(
+            self.client.search, search_base, ldap_filter, attributes, scope, size_limit, timeout=timeout
+        )
+
+    async def verify_password(self, user_dn: str, password: str, *, timeout: Optional[float] = None) -> bool:
+        return await self._call(self.client.verify_password, user_dn, password, timeout=timeout)
+
+    async def add_entry(self, dn: str, attributes: Dict[str, Any], *, timeout: Optional[float] = None) -> None:
+        await self._call(self.client.add_entry, dn, attributes, timeout=timeout)
+
+    async def replace_attributes(
+        self, dn: str, attributes: Dict[str, Any], *, timeout: Optional[float] = None
+    ) -> None:
+        await self._call(self.client.replace_attributes, dn, attributes, timeout=timeout)
+
+    async def delete_entry(self, dn: str, *, timeout: Optional[float] = None) -> None:
+        await self._call(self.client.delete_entry, dn, timeout=timeout)
+
+    async def close(self) -> None:
+        # Ещё не начатые вызовы отменяются, начатые дорабатывают в своих потоках
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+    async def _call(self, func: Callable[..., T], *args: Any, timeout: Optional[float] = None) -> T:
+        """
+        Выполняет вызов в пуле с ограничением по времени (включая ожидание свободного потока).
+        При таймауте или отмене ещё не начатый вызов снимается с очереди;
+        уже идущий LDAP-запрос ограничен receive_timeout соединения.
+        """
+        loop = asyncio.get_running_loop()
+
+        def release(_) -> None:
+            try:
+                loop.call_soon_threadsafe(self._slots.release)
+            except RuntimeError:
+                # event loop уже закрыт — освобождать слот некому
+                pass
+
+        async with asyncio.timeout(self.timeout if timeout is None else timeout):
+            await self._slots.acquire()
+            try:
+                future = self._executor.submit(func, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(release)
+            return await asyncio.wrap_future(future)
+
 
 def from_env() -> LdapClient:
     """
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from ldap3 import (
+    AUTO_BIND_NO_TLS,
+    AUTO_BIND_TLS_BEFORE_BIND,
+    BASE,
+    NO_ATTRIBUTES,
+    ROUND_ROBIN,
+    SIMPLE,
+    Connection,
+    Server,
+    ServerPool,
+)
+from ldap3.core.exceptions import LDAPException
+
+from src.config import settings
+
+if TYPE_CHECKING:  # pragma: no cover - only for type checkers
+    from src.config.settings import ActiveDirectorySettings
+
+
+class LdapConnectionPool:
+    """
+    Пул привязанных (bind) соединений к нескольким контроллерам домена.
+    ServerPool перебирает DC по кругу и пропускает недоступные; соединение,
+    упавшее с ошибкой LDAP, выбрасывается, и следующее открывается с новым bind.
+    acquire(server) выдаёт соединение с конкретным DC — для операций, которым нужен один DC.
+    """
+
+    def __init__(
+            self,
+            hosts: list[str],
+            *,
+            port: int = 389,
+            use_ssl: bool = False,
+            start_tls: bool = False,
+            user: str | None = None,
+            password: str | None = None,
+            max_size: int = 8,
+            acquire_timeout: float = 30.0,
+            keepalive_seconds: float = 300.0,
+            receive_timeout: int = 10,
+    ):
+        self.server_pool = ServerPool(
+            [Server(host, port=port, use_ssl=use_ssl, connect_timeout=receive_timeout) for host in hosts],
+            ROUND_ROBIN,
+            # Два круга попыток по всем DC, недоступный DC исключается на минуту
+            active=2,
+            exhaust=60,
+        )
+        self.user = user
+        self.password = password
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.keepalive_seconds = keepalive_seconds
+        self.receive_timeout = receive_timeout
+        self.start_tls = start_tls and not use_ssl
+
+        # Свободные соединения со временем последнего использования; берём последнее (LIFO)
+        self._idle: list[tuple[Connection, float]] = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        self.created = 0
+        self.discarded = 0
+        self.acquired = 0
+        self.waits = 0
+
+    @contextmanager
+    def acquire(self, server: Server | None = None) -> Iterator[Connection]:
+        conn = self._checkout(server)
+        try:
+            yield conn
+        except LDAPException:
+            self._release(conn, broken=True)
+            raise
+        except BaseException:
+            self._release(conn, broken=False)
+            raise
+        else:
+            self._release(conn, broken=False)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+
+        for conn in idle:
+            self._unbind(conn)
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "size": self._size,
+                "in_use": self._size - len(self._idle),
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "created": self.created,
+                "discarded": self.discarded,
+                "acquired": self.acquired,
+                "waits": self.waits,
+            }
+
+    def _checkout(self, server: Server | None) -> Connection:
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            evicted = None
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("LDAP connection pool is closed")
+                    index = self._find_idle(server)
+                    if index is not None:
+                        conn, last_used = self._idle.pop(index)
+                        break
+                    if self._size < self.max_size:
+                        # Место резервируем сразу, а сам bind делаем вне блокировки
+                        self._size += 1
+                        conn, last_used = None, None
+                        break
+                    if self._idle:
+                        # Свободные соединения есть, но к другим DC: самое старое уступает место
+                        evicted, _ = self._idle.pop(0)
+                        self.discarded += 1
+                        conn, last_used = None, None
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RuntimeError("LDAP connection pool exhausted")
+                    self.waits += 1
+                    self._condition.wait(remaining)
+
+            if evicted is not None:
+                self._unbind(evicted)
+
+            if conn is None:
+                try:
+                    conn = self._open(server)
+                except BaseException:
+                    self._forget()
+                    raise
+            elif not self._is_alive(conn, last_used):
+                self._unbind(conn)
+                self._forget()
+                continue
+
+            with self._condition:
+                self.acquired += 1
+            return conn
+
+    def _find_idle(self, server: Server | None) -> int | None:
+        if server is None:
+            return len(self._idle) - 1 if self._idle else None
+
+        for index in range(len(self._idle) - 1, -1, -1):
+            if self._idle[index][0].server is server:
+                return index
+        return None
+
+    def _release(self, conn: Connection, *, broken: bool) -> None:
+        if broken or conn.closed:
+            self._unbind(conn)
+            self._forget()
+            return
+
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._condition.notify()
+                return
+
+        self._unbind(conn)
+
+    def _open(self, server: Server | None = None) -> Connection:
+        conn = Connection(
+            server or self.server_pool,
+            user=self.user,
+            password=self.password,
+            authentication=SIMPLE,
+            receive_timeout=self.receive_timeout,
+            auto_bind=AUTO_BIND_TLS_BEFORE_BIND if self.start_tls else AUTO_BIND_NO_TLS,
+        )
+        with self._condition:
+            self.created += 1
+        return conn
+
+    def _is_alive(self, conn: Connection, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.keepalive_seconds:
+            return True
+
+        # Долго простаивавшее соединение DC или межсетевой экран могли уже закрыть
+        try:
+            return conn.search("", "(objectClass=*)", search_scope=BASE, attributes=NO_ATTRIBUTES)
+        except LDAPException:
+            return False
+
+    def _forget(self) -> None:
+        with self._condition:
+            self._size -= 1
+            self.discarded += 1
+            self._condition.notify()
+
+    def _unbind(self, conn: Connection) -> None:
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+
+_pool: LdapConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def build_ldap_pool(ad_settings: ActiveDirectorySettings) -> LdapConnectionPool:
+    return LdapConnectionPool(
+        ad_settings.servers,
+        port=ad_settings.port,
+        use_ssl=ad_settings.use_ssl,
+        user=ad_settings.user,
+        password=ad_settings.password.get_secret_value() if ad_settings.password else None,
+        max_size=ad_settings.pool_max_size,
+        acquire_timeout=ad_settings.pool_acquire_timeout,
+        keepalive_seconds=ad_settings.pool_keepalive_seconds,
+        receive_timeout=ad_settings.timeout,
+    )
+
+
+def get_ldap_pool() -> LdapConnectionPool:
+    """Общий для процесса пул соединений к AD, создаётся при первом обращении."""
+    global _pool
+
+    if settings.ad is None:
+        raise ValueError("Active Directory is not configured")
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = build_ldap_pool(settings.ad)
+        return _pool
+
+
+def close_ldap_pool() -> None:
+    global _pool
+
+    with _pool_lock:
+        pool, _pool = _pool, None
+
+    if pool is not None:
+        pool.close()
@@ -3,6 +3,8 @@ from .position import PositionRepository
 from .team import TeamRepository
 from .user import UserRepository
 from .avatar import AvatarRepository
+from .ad_sync_state import AdSyncStateRepository
+from .import_run import ImportRunRepository
 
 __all__ = [
     "EmployeeRepository",
@@ -10,4 +12,6 @@ __all__ = [
     "TeamRepository",
     "UserRepository",
     "AvatarRepository",
+    "AdSyncStateRepository",
+    "ImportRunRepository",
 ]
@@ -0,0 +1,29 @@
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.domain.models import AdSyncState
+from src.infrastructure.db.models import AdSyncStateOrm
+
+
+class AdSyncStateRepository:
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def get_watermarks(self) -> dict[str, int]:
+        stmt = select(AdSyncStateOrm.server_id, AdSyncStateOrm.highest_usn)
+        result = await self._session.execute(stmt)
+        return {server_id: highest_usn for server_id, highest_usn in result.all()}
+
+    async def save(self, server_id: str, highest_usn: int) -> AdSyncState:
+        stmt = (
+            insert(AdSyncStateOrm)
+            .values(server_id=server_id, highest_usn=highest_usn)
+            .on_conflict_do_update(
+                index_elements=[AdSyncStateOrm.server_id],
+                set_={"highest_usn": highest_usn, "synced_at": func.now()},
+            )
+            .returning(AdSyncStateOrm)
+        )
+        state_orm: AdSyncStateOrm = (await self._session.execute(stmt)).scalar_one()
+        return AdSyncState.model_validate(state_orm)
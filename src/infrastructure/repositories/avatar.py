@@ -1,52 +1,150 @@
+from typing import Any
 from uuid import UUID
 
 from sqlalchemy import select, delete
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.domain.models import Avatar
-from src.infrastructure.db.models import AvatarOrm
+from src.domain.models import Avatar, AvatarRendition
+from src.infrastructure.cache import ByteSizeLRUCache
+from src.infrastructure.db.models import AvatarImageOrm, AvatarOrm, AvatarRenditionOrm
+
+RenditionKey = tuple[str, int, str]
 
 
 class AvatarRepository:
-    def __init__(self, session: AsyncSession):
+    """
+    Аватары хранятся по хэшу содержимого: одинаковые загрузки разных сотрудников
+    ссылаются на одно изображение и общие рендеры. ref_count поддерживается триггером.
+    """
+
+    def __init__(
+            self,
+            session: AsyncSession,
+            cache: ByteSizeLRUCache[RenditionKey, AvatarRendition] | None = None,
+    ):
         self._session = session
+        self._cache = cache
 
     async def upsert(self, avatar: Avatar) -> Avatar:
-        stmt = (
+        await self._upsert_images([
+            {"hash": avatar.image_hash, "mime_type": avatar.mime_type, "content": avatar.master}
+        ])
+
+        avatar_stmt = (
             insert(AvatarOrm)
-            .values(
-                employee_id=avatar.employee_id,
-                mime_type=avatar.mime_type,
-                image_small=avatar.image_small,
-                image_large=avatar.image_large,
-            )
+            .values(employee_id=avatar.employee_id, image_hash=avatar.image_hash, source_hash=avatar.source_hash)
             .on_conflict_do_update(
                 index_elements=[AvatarOrm.employee_id],
-                set_={
-                    "mime_type": avatar.mime_type,
-                    "image_small": avatar.image_small,
-                    "image_large": avatar.image_large,
-                },
+                set_={"image_hash": avatar.image_hash, "source_hash": avatar.source_hash},
             )
-            .returning(AvatarOrm)
         )
+        await self._session.execute(avatar_stmt)
+        await self._session.flush()
+        return avatar
 
-        result = await self._session.execute(stmt)
-        avatar_orm: AvatarOrm = result.scalar_one()
+    async def upsert_many(self, avatars: list[Avatar]) -> None:
+        """
+        Пакетная запись аватаров, импортированных из AD.
+        Аватар, загруженный вручную (source_hash IS NULL), не перезаписывается.
+        """
+        if not avatars:
+            return
+
+        images = {
+            avatar.image_hash: {"hash": avatar.image_hash, "mime_type": avatar.mime_type, "content": avatar.master}
+            for avatar in avatars
+        }
+        image_hashes = await self._upsert_images(list(images.values()))
+
+        avatar_stmt = insert(AvatarOrm).values([
+            {"employee_id": avatar.employee_id, "image_hash": avatar.image_hash, "source_hash": avatar.source_hash}
+            for avatar in avatars
+        ])
+        avatar_stmt = avatar_stmt.on_conflict_do_update(
+            index_elements=[AvatarOrm.employee_id],
+            set_={"image_hash": avatar_stmt.excluded.image_hash, "source_hash": avatar_stmt.excluded.source_hash},
+            where=AvatarOrm.source_hash.is_not(None),
+        )
+        await self._session.execute(avatar_stmt)
+
+        # Изображения сотрудников с ручной загрузкой остались без ссылок
+        await self._delete_unreferenced(image_hashes)
         await self._session.flush()
-        return Avatar.model_validate(avatar_orm)
 
-    async def get_by_employee_id(self, employee_id: UUID) -> Avatar | None:
-        stmt = select(AvatarOrm).where(AvatarOrm.employee_id == employee_id)
-        result = await self._session.execute(stmt)
-        avatar_orm: AvatarOrm | None = result.scalar_one_or_none()
-        if not avatar_orm:
+    async def get_source_hashes(self, employee_ids: list[UUID]) -> dict[UUID, str | None]:
+        """employee_id -> source_hash для сотрудников, у которых уже есть аватар."""
+        stmt = select(AvatarOrm.employee_id, AvatarOrm.source_hash).where(AvatarOrm.employee_id.in_(employee_ids))
+        return {employee_id: source_hash for employee_id, source_hash in await self._session.execute(stmt)}
+
+    async def get_image_hash(self, employee_id: UUID) -> str | None:
+        stmt = select(AvatarOrm.image_hash).where(AvatarOrm.employee_id == employee_id)
+        return (await self._session.execute(stmt)).scalar_one_or_none()
+
+    async def get_master(self, image_hash: str) -> bytes | None:
+        stmt = select(AvatarImageOrm.content).where(AvatarImageOrm.hash == image_hash)
+        return (await self._session.execute(stmt)).scalar_one_or_none()
+
+    async def get_rendition(self, image_hash: str, size: int, mime_type: str) -> AvatarRendition | None:
+        # Содержимое по хэшу неизменно, поэтому запись в кэше не требует инвалидации
+        key = (image_hash, size, mime_type)
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+        stmt = select(AvatarRenditionOrm).where(
+            AvatarRenditionOrm.image_hash == image_hash,
+            AvatarRenditionOrm.size == size,
+            AvatarRenditionOrm.mime_type == mime_type,
+        )
+        rendition_orm: AvatarRenditionOrm | None = (await self._session.execute(stmt)).scalar_one_or_none()
+        if not rendition_orm:
             return None
-        return Avatar.model_validate(avatar_orm)
+
+        rendition = AvatarRendition.model_validate(rendition_orm)
+        self._remember(rendition)
+        return rendition
+
+    async def save_rendition(self, rendition: AvatarRendition) -> AvatarRendition:
+        # Параллельный запрос мог отрендерить тот же размер — результат идентичен
+        stmt = (
+            insert(AvatarRenditionOrm)
+            .values(**rendition.model_dump())
+            .on_conflict_do_nothing()
+        )
+        await self._session.execute(stmt)
+        await self._session.flush()
+        self._remember(rendition)
+        return rendition
 
     async def delete_by_employee_id(self, employee_id: UUID) -> bool:
         stmt = delete(AvatarOrm).where(AvatarOrm.employee_id == employee_id).returning(AvatarOrm.employee_id)
         result = await self._session.execute(stmt)
-        employee_id = result.scalar_one_or_none()
-        return employee_id is not None
+        deleted_id = result.scalar_one_or_none()
+        return deleted_id is not None
+
+    async def _upsert_images(self, images: list[dict[str, Any]]) -> list[str]:
+        """
+        DO UPDATE, в отличие от DO NOTHING, блокирует существующую строку до конца транзакции:
+        параллельное удаление последней ссылки не удалит изображение между его записью
+        и вставкой ссылающегося аватара. Сортировка по хэшу задаёт общий порядок блокировок.
+        """
+        stmt = insert(AvatarImageOrm).values(sorted(images, key=lambda image: image["hash"]))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AvatarImageOrm.hash],
+            set_={"mime_type": stmt.excluded.mime_type},
+        ).returning(AvatarImageOrm.hash)
+        return list((await self._session.execute(stmt)).scalars())
+
+    async def _delete_unreferenced(self, image_hashes: list[str]) -> None:
+        stmt = delete(AvatarImageOrm).where(
+            AvatarImageOrm.hash.in_(image_hashes),
+            AvatarImageOrm.ref_count <= 0,
+        )
+        await self._session.execute(stmt)
+
+    def _remember(self, rendition: AvatarRendition) -> None:
+        if self._cache is not None:
+            key = (rendition.image_hash, rendition.size, rendition.mime_type)
+            self._cache.put(key, rendition, len(rendition.content))
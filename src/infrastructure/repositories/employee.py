@@ -1,20 +1,43 @@
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
 from uuid import UUID
 from typing import Any, Optional, Sequence
 
-from sqlalchemy import select, update, insert, delete
+from sqlalchemy import (
+    RowMapping,
+    String,
+    any_,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    select,
+    true,
+    union,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, array
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
 from src.domain.models import Employee, Team, StatusHistory, Position, EmployeeStatus
 from src.infrastructure.db.models import EmployeeOrm, TeamOrm, PositionOrm, StatusHistoryOrm
 
+# Защита рекурсивных запросов от циклов в иерархии команд
+MAX_HIERARCHY_DEPTH = 64
+
 
 class EmployeeRepository:
     def __init__(self, session: AsyncSession):
         self._session = session
 
-    async def get_by_id(self, id: UUID) -> Optional[Employee]:
+    async def get_by_id(self, id: UUID, *, include_archived: bool = False) -> Optional[Employee]:
         # Используем selectinload для эффективной загрузки связанных данных
         stmt = (
             select(EmployeeOrm)
@@ -25,6 +48,8 @@ class EmployeeRepository:
                 selectinload(EmployeeOrm.status_history),
             )
         )
+        if not include_archived:
+            stmt = stmt.where(EmployeeOrm.archived_at.is_(None))
 
         result = await self._session.execute(stmt)
         employee_orm: EmployeeOrm | None = result.scalar_one_or_none()
@@ -34,7 +59,7 @@ class EmployeeRepository:
 
         return self._to_domain(employee_orm)
 
-    async def get_by_email(self, email: str) -> Optional[Employee]:
+    async def get_by_email(self, email: str, *, include_archived: bool = False) -> Optional[Employee]:
         stmt = (
             select(EmployeeOrm)
             .where(EmployeeOrm.email == email)
@@ -44,6 +69,8 @@ class EmployeeRepository:
                 selectinload(EmployeeOrm.status_history),
             )
         )
+        if not include_archived:
+            stmt = stmt.where(EmployeeOrm.archived_at.is_(None))
 
         result = await self._session.execute(stmt)
         employee_orm: EmployeeOrm | None = result.scalar_one_or_none()
@@ -53,10 +80,15 @@ class EmployeeRepository:
 
         return self._to_domain(employee_orm)
 
+    async def is_archived(self, email: str) -> bool:
+        """Сотрудник с этим email архивирован (уволен или отключён в AD) и не должен иметь доступа."""
+        stmt = select(EmployeeOrm.archived_at.is_not(None)).where(EmployeeOrm.email == email)
+        return bool((await self._session.execute(stmt)).scalar_one_or_none())
+
     async def get_by_team_id(self, team_id: UUID) -> list[Employee]:
         stmt = (
             select(EmployeeOrm)
-            .where(EmployeeOrm.team_id == team_id)
+            .where(EmployeeOrm.team_id == team_id, EmployeeOrm.archived_at.is_(None))
             .options(
                 selectinload(EmployeeOrm.team),
                 selectinload(EmployeeOrm.position),
@@ -88,16 +120,240 @@ class EmployeeRepository:
 
         return self._to_domain(employee_orm)
 
+    async def get_direct_reports(self, id: UUID) -> list[Employee]:
+        """
+        Сотрудники, для которых id — руководитель в смысле resolve_boss_id:
+        явный manager_id либо первый лидер команды вверх по иерархии, отличный от самого сотрудника.
+        """
+        # Команды, где руководителем участника окажется id. only_member — лидер промежуточной
+        # команды: для её участников руководитель — он сам, поэтому выше к id поднимается только он
+        led = (
+            select(
+                TeamOrm.id.label("team_id"),
+                cast(null(), PG_UUID(as_uuid=True)).label("only_member"),
+                literal(0).label("depth"),
+            )
+            .where(TeamOrm.leader_employee_id == id)
+            .cte("led", recursive=True)
+        )
+        child = aliased(TeamOrm)
+        led = led.union_all(
+            select(child.id, child.leader_employee_id, led.c.depth + 1)
+            .join(child, child.parent_id == led.c.team_id)
+            .where(
+                # Команды, которые id тоже возглавляет, уже есть в начальной выборке
+                child.leader_employee_id != id,
+                or_(led.c.only_member.is_(None), led.c.only_member == child.leader_employee_id),
+                led.c.depth < MAX_HIERARCHY_DEPTH,
+            )
+        )
+
+        without_manager = or_(EmployeeOrm.manager_id.is_(None), EmployeeOrm.manager_id == EmployeeOrm.id)
+        report_ids = union(
+            select(EmployeeOrm.id).where(EmployeeOrm.manager_id == id),
+            select(EmployeeOrm.id)
+            .join(led, led.c.team_id == EmployeeOrm.team_id)
+            .where(without_manager, or_(led.c.only_member.is_(None), led.c.only_member == EmployeeOrm.id)),
+        ).subquery()
+
+        stmt = (
+            select(EmployeeOrm)
+            .where(
+                EmployeeOrm.id.in_(select(report_ids.c.id)),
+                EmployeeOrm.id != id,
+                EmployeeOrm.archived_at.is_(None),
+            )
+            .order_by(EmployeeOrm.last_name, EmployeeOrm.first_name)
+            .options(
+                selectinload(EmployeeOrm.team),
+                selectinload(EmployeeOrm.position),
+                selectinload(EmployeeOrm.status_history),
+            )
+        )
+        result = await self._session.execute(stmt)
+        return [self._to_domain(employee_orm) for employee_orm in result.scalars().all()]
+
+    async def get_reporting_chain(self, id: UUID) -> list[Employee]:
+        """Цепочка руководителей от непосредственного до верхнего, одним рекурсивным запросом."""
+        # Путь каждой команды к корню: лидер на каждом уровне и глубина
+        team_path = (
+            select(
+                TeamOrm.id.label("team_id"),
+                TeamOrm.parent_id.label("parent_id"),
+                TeamOrm.leader_employee_id.label("leader_id"),
+                literal(0).label("depth"),
+            )
+            .cte("team_path", recursive=True)
+        )
+        parent = aliased(TeamOrm)
+        team_path = team_path.union_all(
+            select(team_path.c.team_id, parent.parent_id, parent.leader_employee_id, team_path.c.depth + 1)
+            .join(parent, parent.id == team_path.c.parent_id)
+            .where(team_path.c.depth < MAX_HIERARCHY_DEPTH)
+        )
+
+        chain = (
+            select(
+                EmployeeOrm.id.label("employee_id"),
+                literal(0).label("depth"),
+                array([EmployeeOrm.id]).label("path"),
+            )
+            .where(EmployeeOrm.id == id)
+            .cte("chain", recursive=True)
+        )
+        current = aliased(EmployeeOrm)
+        # То же правило, что в resolve_boss_id
+        team_leader = (
+            select(team_path.c.leader_id)
+            .where(team_path.c.team_id == current.team_id, team_path.c.leader_id != current.id)
+            .order_by(team_path.c.depth)
+            .limit(1)
+            .correlate(current)
+            .scalar_subquery()
+        )
+        boss = select(
+            func.coalesce(
+                case((current.manager_id != current.id, current.manager_id)),
+                team_leader,
+            ).label("boss_id")
+        ).correlate(current).lateral("boss")
+        chain = chain.union_all(
+            select(
+                boss.c.boss_id,
+                chain.c.depth + 1,
+                func.array_append(chain.c.path, boss.c.boss_id),
+            )
+            .select_from(chain.join(current, current.id == chain.c.employee_id).join(boss, true()))
+            .where(
+                boss.c.boss_id.is_not(None),
+                ~(boss.c.boss_id == any_(chain.c.path)),
+                chain.c.depth < MAX_HIERARCHY_DEPTH,
+            )
+        )
+
+        rows = (await self._session.execute(
+            select(chain.c.employee_id).where(chain.c.depth > 0).order_by(chain.c.depth)
+        )).scalars().all()
+        if not rows:
+            return []
+
+        stmt = (
+            select(EmployeeOrm)
+            .where(EmployeeOrm.id.in_(rows))
+            .options(
+                selectinload(EmployeeOrm.team),
+                selectinload(EmployeeOrm.position),
+                selectinload(EmployeeOrm.status_history),
+            )
+        )
+        by_id = {
+            employee_orm.id: self._to_domain(employee_orm)
+            for employee_orm in (await self._session.execute(stmt)).scalars().all()
+        }
+        return [by_id[employee_id] for employee_id in rows]
+
+    async def find_existing_emails(self, emails: list[str]) -> set[str]:
+        """Адреса из списка, уже занятые сотрудниками, в нижнем регистре."""
+        stmt = select(func.lower(EmployeeOrm.email)).where(
+            func.lower(EmployeeOrm.email).in_([email.lower() for email in emails])
+        )
+        return set((await self._session.execute(stmt)).scalars().all())
+
+    async def iter_export_rows(self, batch_size: int) -> AsyncIterator[list[RowMapping]]:
+        """
+        Активные сотрудники для выгрузки справочника, пачками по batch_size.
+        Строки читаются серверным курсором, поэтому выборка целиком в памяти не держится.
+        """
+        # Текущий статус — незакрытая запись истории, иначе самая поздняя (как resolve_status)
+        current_status = (
+            select(StatusHistoryOrm.status)
+            .where(StatusHistoryOrm.employee_id == EmployeeOrm.id)
+            .order_by(StatusHistoryOrm.ended_at.is_(None).desc(), StatusHistoryOrm.started_at.desc())
+            .limit(1)
+            .correlate(EmployeeOrm)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(
+                EmployeeOrm.id,
+                EmployeeOrm.last_name,
+                EmployeeOrm.first_name,
+                EmployeeOrm.middle_name,
+                EmployeeOrm.email,
+                EmployeeOrm.phone,
+                EmployeeOrm.city,
+                EmployeeOrm.team_id,
+                PositionOrm.title.label("position"),
+                current_status.label("status"),
+                EmployeeOrm.hire_date,
+                EmployeeOrm.birth_date,
+                EmployeeOrm.legal_entity,
+                EmployeeOrm.department,
+            )
+            .join(PositionOrm, PositionOrm.id == EmployeeOrm.position_id)
+            .where(EmployeeOrm.archived_at.is_(None))
+            .order_by(EmployeeOrm.last_name, EmployeeOrm.first_name, EmployeeOrm.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        result = await self._session.stream(stmt)
+        async for partition in result.mappings().partitions():
+            yield list(partition)
+
     async def get_object_ids(self) -> set[str]:
         stmt = select(EmployeeOrm.object_id).where(EmployeeOrm.object_id.is_not(None))
         result = await self._session.execute(stmt)
         return {row[0] for row in result.all() if row[0] is not None}
 
+    async def get_ad_fingerprints(self) -> dict[str, tuple[UUID, str | None]]:
+        stmt = select(EmployeeOrm.object_id, EmployeeOrm.id, EmployeeOrm.ad_fingerprint).where(
+            EmployeeOrm.object_id.is_not(None)
+        )
+        result = await self._session.execute(stmt)
+        return {object_id: (id, fingerprint) for object_id, id, fingerprint in result.all()}
+
+    async def get_archived_object_ids(self) -> set[str]:
+        stmt = select(EmployeeOrm.object_id).where(
+            EmployeeOrm.object_id.is_not(None), EmployeeOrm.archived_at.is_not(None)
+        )
+        result = await self._session.execute(stmt)
+        return set(result.scalars().all())
+
+    async def archive_by_object_ids(self, object_ids: list[str]) -> int:
+        if not object_ids:
+            return 0
+
+        stmt = (
+            update(EmployeeOrm)
+            .where(EmployeeOrm.object_id.in_(object_ids), EmployeeOrm.archived_at.is_(None))
+            .values(archived_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        result = await self._session.execute(stmt)
+        return result.rowcount
+
+    async def restore_by_object_ids(self, object_ids: list[str]) -> int:
+        if not object_ids:
+            return 0
+
+        stmt = (
+            update(EmployeeOrm)
+            .where(EmployeeOrm.object_id.in_(object_ids), EmployeeOrm.archived_at.is_not(None))
+            .values(archived_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self._session.execute(stmt)
+        return result.rowcount
+
     async def get_all(self) -> list[Employee]:
-        stmt = select(EmployeeOrm).options(
-            selectinload(EmployeeOrm.team),
-            selectinload(EmployeeOrm.position),
-            selectinload(EmployeeOrm.status_history),
+        stmt = (
+            select(EmployeeOrm)
+            .where(EmployeeOrm.archived_at.is_(None))
+            .options(
+                selectinload(EmployeeOrm.team),
+                selectinload(EmployeeOrm.position),
+                selectinload(EmployeeOrm.status_history),
+            )
         )
         result = await self._session.execute(stmt)
         employee_orms: Sequence[EmployeeOrm] = result.scalars().all()
@@ -119,9 +375,63 @@ class EmployeeRepository:
 
         return employee
 
+    async def create_many(self, rows: list[dict[str, Any]]) -> list[UUID]:
+        """
+        Массовая вставка без перечитывания записей.
+        SQLAlchemy склеивает параметры в многострочный INSERT ... RETURNING.
+        """
+        if not rows:
+            return []
+
+        stmt = insert(EmployeeOrm).returning(EmployeeOrm.id)
+        result = await self._session.execute(stmt, rows)
+        return list(result.scalars().all())
+
+    async def update_many(self, rows: list[dict[str, Any]]) -> None:
+        """
+        Пакетное обновление по первичному ключу: каждая строка должна содержать id.
+        Выполняется одним executemany без загрузки объектов в сессию.
+        """
+        if not rows:
+            return
+
+        await self._session.execute(update(EmployeeOrm), rows)
+
+    async def set_managers_by_object_id(self, links: list[tuple[str, str | None]]) -> int:
+        """
+        Проставляет manager_id по парам (object_id сотрудника, object_id руководителя)
+        одним UPDATE ... FROM (VALUES ...). Руководитель, которого нет в базе, сбрасывает ссылку.
+        """
+        if not links:
+            return 0
+
+        link_values = values(
+            column("object_id", String),
+            column("manager_object_id", String),
+            name="links",
+        ).data(links)
+        manager = aliased(EmployeeOrm)
+        resolved = (
+            select(link_values.c.object_id, manager.id.label("manager_id"))
+            .select_from(link_values.outerjoin(manager, manager.object_id == link_values.c.manager_object_id))
+            .subquery()
+        )
+
+        stmt = (
+            update(EmployeeOrm)
+            .where(
+                EmployeeOrm.object_id == resolved.c.object_id,
+                EmployeeOrm.manager_id.is_distinct_from(resolved.c.manager_id),
+            )
+            .values(manager_id=resolved.c.manager_id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self._session.execute(stmt)
+        return result.rowcount
+
     async def update_partial(self, id: UUID, data: dict[str, Any]) -> Employee:
         if not data:
-            employee = await self.get_by_id(id)
+            employee = await self.get_by_id(id, include_archived=True)
             if not employee:
                 raise ValueError(f"Employee with id '{id}' not found")
             return employee
@@ -135,7 +445,7 @@ class EmployeeRepository:
         await self._session.execute(stmt)
         await self._session.flush()
 
-        employee = await self.get_by_id(id)
+        employee = await self.get_by_id(id, include_archived=True)
         if not employee:
             raise ValueError(f"Employee with id '{id}' not found")
         return employee
@@ -206,6 +516,8 @@ class EmployeeRepository:
             legal_entity=getattr(employee_orm, "legal_entity", None),
             department=getattr(employee_orm, "department", None),
             object_id=getattr(employee_orm, "object_id", None),
+            archived_at=getattr(employee_orm, "archived_at", None),
+            manager_id=getattr(employee_orm, "manager_id", None),
             position=position,
             team=team,
             status_history=status_history,
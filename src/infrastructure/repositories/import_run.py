@@ -0,0 +1,99 @@
+from datetime import timedelta
+from uuid import UUID
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.domain.models import ImportRun
+from src.infrastructure.db.models import ImportRunOrm
+from src.infrastructure.db.models.import_run import ACTIVE_IMPORT_STATUSES
+
+
+class ImportRunRepository:
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def create(self, *, mode: str) -> ImportRun | None:
+        """Создаёт прогон в очереди. Возвращает None, если другой импорт ещё не завершён."""
+        stmt = (
+            insert(ImportRunOrm)
+            .values(mode=mode, status="queued")
+            .on_conflict_do_nothing()
+            .returning(ImportRunOrm)
+        )
+        run_orm: ImportRunOrm | None = (await self._session.execute(stmt)).scalar_one_or_none()
+        if not run_orm:
+            return None
+
+        return ImportRun.model_validate(run_orm)
+
+    async def get_by_id(self, id: UUID) -> ImportRun | None:
+        run_orm = await self._session.get(ImportRunOrm, id)
+        if not run_orm:
+            return None
+
+        return ImportRun.model_validate(run_orm)
+
+    async def get_recent(self, limit: int) -> list[ImportRun]:
+        stmt = select(ImportRunOrm).order_by(ImportRunOrm.created_at.desc()).limit(limit)
+        result = await self._session.execute(stmt)
+        return [ImportRun.model_validate(run_orm) for run_orm in result.scalars().all()]
+
+    async def mark_running(self, id: UUID) -> None:
+        await self._update(id, status="running", started_at=func.now(), heartbeat_at=func.now())
+
+    async def set_progress(self, id: UUID, processed: int) -> None:
+        await self._update(id, processed=processed, heartbeat_at=func.now())
+
+    async def heartbeat(self, id: UUID) -> None:
+        await self._update(id, heartbeat_at=func.now())
+
+    async def finish(
+            self,
+            id: UUID,
+            *,
+            mode: str,
+            imported: int,
+            updated: int,
+            archived: int,
+            warning: str | None = None,
+    ) -> None:
+        # mode перезаписывается фактическим: инкрементальный запуск мог откатиться к полному
+        await self._update(
+            id,
+            status="succeeded",
+            mode=mode,
+            imported=imported,
+            updated=updated,
+            archived=archived,
+            warning=warning,
+            finished_at=func.now(),
+        )
+
+    async def fail(self, id: UUID, error: str) -> None:
+        await self._update(id, status="failed", error=error, finished_at=func.now())
+
+    async def fail_stale(self, error: str, stale_after: timedelta) -> int:
+        """Завершает ошибкой незавершённые прогоны, от которых дольше stale_after не было пульса."""
+        stmt = (
+            update(ImportRunOrm)
+            .where(
+                ImportRunOrm.status.in_(ACTIVE_IMPORT_STATUSES),
+                # Время базы, а не процесса: часы на разных машинах могут расходиться
+                ImportRunOrm.heartbeat_at < func.now() - stale_after,
+            )
+            .values(status="failed", error=error, finished_at=func.now())
+            .returning(ImportRunOrm.id)
+        )
+        result = await self._session.execute(stmt)
+        return len(result.all())
+
+    async def _update(self, id: UUID, **values) -> None:
+        stmt = (
+            update(ImportRunOrm)
+            .where(ImportRunOrm.id == id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await self._session.execute(stmt)
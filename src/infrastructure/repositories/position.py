@@ -1,15 +1,50 @@
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.domain.models import Position
+from src.infrastructure.cache import PositionCache
 from src.infrastructure.db.models import PositionOrm
 
 
 class PositionRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, cache: PositionCache | None = None):
         self._session = session
+        self._cache = cache
+        # Должности, найденные или созданные в текущей транзакции: в общий кэш
+        # попадают только после коммита, чтобы откат не оставил в нём чужой id
+        self._pending: list[Position] = []
+        if cache is not None:
+            event.listen(session.sync_session, "after_commit", self._promote_pending)
+            event.listen(session.sync_session, "after_soft_rollback", self._drop_pending)
+
+    async def get_all(self) -> list[Position]:
+        result = await self._session.execute(select(PositionOrm))
+        return [Position.model_validate(position) for position in result.scalars().all()]
+
+    async def get_by_titles(self, titles: list[str]) -> list[Position]:
+        stmt = select(PositionOrm).where(PositionOrm.title.in_(titles))
+        result = await self._session.execute(stmt)
+        return [Position.model_validate(position) for position in result.scalars().all()]
+
+    async def create_many(self, titles: list[str]) -> list[Position]:
+        """
+        Одна многострочная вставка. Уже существующие должности пропускаются
+        и в результат не попадают.
+        """
+        if not titles:
+            return []
+
+        stmt = (
+            insert(PositionOrm)
+            .values([{"title": title} for title in titles])
+            .on_conflict_do_nothing()
+            .returning(PositionOrm)
+        )
+        result = await self._session.execute(stmt)
+        return [Position.model_validate(position) for position in result.scalars().all()]
 
     async def get_by_title(self, title: str) -> Optional[Position]:
         stmt = select(PositionOrm).where(PositionOrm.title == title)
@@ -28,8 +63,34 @@ class PositionRepository:
         return Position.model_validate(position)
 
     async def get_or_create(self, *, title: str) -> Position:
-        existing = await self.get_by_title(title)
-        if existing:
-            return existing
+        """
+        Атомарный get_or_create: конкурентная вставка той же должности упирается
+        в уникальный индекс по title и возвращает уже существующую запись.
+        """
+        if self._cache is not None:
+            cached = self._cache.get(title)
+            if cached:
+                return cached
+
+        stmt = (
+            insert(PositionOrm)
+            .values(title=title)
+            .on_conflict_do_nothing(index_elements=[PositionOrm.title])
+            .returning(PositionOrm)
+        )
+        orm_obj: PositionOrm | None = (await self._session.execute(stmt)).scalar_one_or_none()
+        position = Position.model_validate(orm_obj) if orm_obj else await self.get_by_title(title)
+        if not position:
+            raise ValueError(f"Position '{title}' could not be created")
+
+        if self._cache is not None:
+            self._pending.append(position)
+        return position
+
+    def _promote_pending(self, _session) -> None:
+        for position in self._pending:
+            self._cache.put(position)
+        self._pending.clear()
 
-        return await self.create(title=title)
\ No newline at end of file
+    def _drop_pending(self, _session, _previous_transaction) -> None:
+        self._pending.clear()
@@ -1,7 +1,8 @@
-from typing import Sequence, Optional
+from typing import Any, Iterable, Sequence, Optional
 from uuid import UUID
 
-from sqlalchemy import select, insert, update, func, delete
+from sqlalchemy import String, bindparam, select, insert, update, func, delete
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.domain.models import Team
@@ -23,20 +24,14 @@ class TeamRepository:
     async def find_by_name(
             self, name: str, *, parent_id: UUID | None = None
     ) -> Optional[Team]:
-        normalized_name = " ".join(name.split()).lower()
-
-        stmt = select(TeamOrm).where(
-            func.lower(
-                func.regexp_replace(func.trim(TeamOrm.name), r"\\s+", " ", "g")
-            )
-            == normalized_name
-        )
+        # normalized_name — вычисляемая колонка под уникальным индексом (normalized_name, parent_id)
+        stmt = select(TeamOrm).where(TeamOrm.normalized_name == self._normalize(name))
         if parent_id is None:
             stmt = stmt.where(TeamOrm.parent_id.is_(None))
         else:
             stmt = stmt.where(TeamOrm.parent_id == parent_id)
 
-        team = (await self._session.execute(stmt)).scalars().first()
+        team = (await self._session.execute(stmt)).scalar_one_or_none()
 
         if not team:
             return None
@@ -52,17 +47,28 @@ class TeamRepository:
     async def get_or_create(
             self, *, name: str, leader_employee_id: UUID, parent_id: UUID | None
     ) -> Team:
-        normalized_name = " ".join(name.split())
-
-        existing = await self.find_by_name(normalized_name, parent_id=parent_id)
-        if existing:
-            return existing
-
-        return await self.create(
-            name=normalized_name,
-            leader_employee_id=leader_employee_id,
-            parent_id=parent_id,
+        """
+        Атомарный get_or_create: при одновременной вставке той же команды
+        ON CONFLICT по уникальному индексу отдаёт победителя, а не создаёт дубликат.
+        """
+        stmt = (
+            pg_insert(TeamOrm)
+            .values(
+                name=" ".join(name.split()),
+                leader_employee_id=leader_employee_id,
+                parent_id=parent_id,
+            )
+            .on_conflict_do_nothing(index_elements=[TeamOrm.normalized_name, TeamOrm.parent_id])
+            .returning(TeamOrm)
         )
+        team = (await self._session.execute(stmt)).scalar_one_or_none()
+        if team:
+            return Team.model_validate(team)
+
+        existing = await self.find_by_name(name, parent_id=parent_id)
+        if not existing:
+            raise ValueError(f"Team '{name}' could not be created")
+        return existing
 
     async def create(
             self, *, name: str, leader_employee_id: UUID, parent_id: UUID | None
@@ -84,6 +90,36 @@ class TeamRepository:
 
         return Team.model_validate(team)
 
+    async def create_many(self, rows: list[dict[str, Any]]) -> list[Team]:
+        """
+        Одна многострочная вставка команд (name, parent_id, leader_employee_id).
+        Уже существующие команды пропускаются и в результат не попадают.
+        """
+        if not rows:
+            return []
+
+        values = [{**row, "name": " ".join(row["name"].split())} for row in rows]
+        stmt = pg_insert(TeamOrm).values(values).on_conflict_do_nothing().returning(TeamOrm)
+        result = await self._session.execute(stmt)
+        return [Team.model_validate(team) for team in result.scalars().all()]
+
+    async def normalize_names(self, names: Iterable[str]) -> dict[str, str]:
+        """
+        Имя -> ключ уникальности, посчитанный той же формулой, что и teams.normalized_name.
+        Пробельные символы и lower() в PostgreSQL зависят от локали базы, поэтому ключ считает БД.
+        """
+        unique_names = sorted(set(names))
+        if not unique_names:
+            return {}
+
+        source = func.unnest(bindparam("names", unique_names, type_=ARRAY(String))).table_valued("name")
+        stmt = select(source.c.name, self._normalize(source.c.name))
+        return {name: normalized for name, normalized in await self._session.execute(stmt)}
+
+    def _normalize(self, name: Any):
+        # Та же формула, что и у вычисляемой колонки, чтобы сравнение шло по индексу
+        return func.lower(func.regexp_replace(func.btrim(name), r"\s+", " ", "g"))
+
     async def update_parent(self, team_id: UUID, parent_id: UUID | None) -> Team:
         stmt = (
             update(TeamOrm)
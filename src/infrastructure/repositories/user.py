@@ -1,6 +1,6 @@
 from uuid import UUID
 
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import select, insert, update, delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.domain.models.user import User
@@ -22,11 +22,26 @@ class UserRepository:
             return None
         return User.model_validate(user_orm)
 
+    async def find_admin_emails(self, emails: list[str]) -> set[str]:
+        stmt = select(UserOrm.email).where(UserOrm.email.in_(emails), UserOrm.role == "admin")
+        return set((await self._session.execute(stmt)).scalars().all())
+
+    async def find_existing_emails(self, emails: list[str]) -> set[str]:
+        """Адреса из списка, у которых уже есть учётная запись, в нижнем регистре."""
+        stmt = select(func.lower(UserOrm.email)).where(func.lower(UserOrm.email).in_([email.lower() for email in emails]))
+        return set((await self._session.execute(stmt)).scalars().all())
+
     async def create(self, user: User) -> User:
         insert_user_stmt = insert(UserOrm).values(**user.model_dump()).returning(UserOrm)
         user_orm: UserOrm = (await self._session.execute(insert_user_stmt)).scalar_one()
         return User.model_validate(user_orm)
 
+    async def create_many(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+
+        await self._session.execute(insert(UserOrm), rows)
+
     async def update_by_email(self, email: str, data: dict) -> User | None:
         if not data:
             return await self.find_by_email(email)
@@ -1,26 +1,47 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from src.api.auth import router as auth_router
+from src.api.dependencies import ad_import_runner, close_ad_auth_service
+from src.api.limits import MULTIPART_OVERHEAD, MultipartSizeLimitMiddleware
+from src.api.metrics import router as metrics_router
 from src.api.ping import router as ping_router
 from src.api.users import router as users_router
 from src.api.teams import router as teams_router
 from src.api.update import router as update_router
+from src.config import settings
+from src.infrastructure.ldap_pool import close_ldap_pool
 
 CSV_PATH = "src/res/test_users.csv"
 
-app = FastAPI(title="UDV Team Map API")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await ad_import_runner.recover()
+    yield
+    await ad_import_runner.shutdown()
+    # Сервис входа берёт соединения из пула, поэтому закрывается раньше него
+    await close_ad_auth_service()
+    close_ldap_pool()
+
+
+app = FastAPI(title="UDV Team Map API", lifespan=lifespan)
 app.include_router(ping_router, prefix="/api", tags=["ping"])
 app.include_router(users_router, prefix="/api", tags=["users"])
 app.include_router(teams_router, prefix="/api", tags=["teams"])
 app.include_router(auth_router, prefix="/api", tags=["auth"])
 app.include_router(update_router, prefix="/api", tags=["ad"])
+app.include_router(metrics_router, prefix="/api", tags=["metrics"])
 
 origins = [
     "http://localhost:3000",  # ваш фронтенд dev URL
     "https://udv-pi.vercel.app"  # production origin, если нужно
 ]
 
+# Добавлен раньше CORS, чтобы отказ 413 тоже получал CORS-заголовки
+app.add_middleware(MultipartSizeLimitMiddleware, max_bytes=settings.avatar.max_upload_bytes + MULTIPART_OVERHEAD)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -97,6 +97,11 @@ def resolve_status(employee) -> EmployeeStatus:
 
 
 def resolve_boss_id(employee, lookup: Dict[UUID, Team]) -> Optional[UUID]:
+    # Явно заданный руководитель важнее руководителей команд
+    manager_id = getattr(employee, "manager_id", None)
+    if manager_id and manager_id != employee.id:
+        return manager_id
+
     team = getattr(employee, "team", None)
     if not team:
         return None
@@ -52,11 +52,15 @@ async def engine():
     async with engine.begin() as conn:
         # Drop tables manually with CASCADE to handle circular dependencies
         await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS status_history CASCADE"))
+        await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS avatar_renditions CASCADE"))
         await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS avatars CASCADE"))
+        await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS avatar_images CASCADE"))
         await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS employees CASCADE"))
         await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS teams CASCADE"))
         await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS positions CASCADE"))
         await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS users CASCADE"))
+        await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS ad_sync_state CASCADE"))
+        await conn.execute(sqlalchemy.text("DROP TABLE IF EXISTS import_runs CASCADE"))
     
     await engine.dispose()
 
@@ -1,12 +1,66 @@
 """Tests for AD import service."""
+import asyncio
+import threading
 import pytest
-from datetime import date
-from unittest.mock import Mock, patch, MagicMock
-from uuid import UUID
+from contextlib import aclosing, nullcontext
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
+from uuid import UUID, uuid4
+
+from ldap3.utils.ciDict import CaseInsensitiveDict
+
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from src.application.services.ad_import import AdImportService
-from src.infrastructure.repositories import EmployeeRepository, PositionRepository, TeamRepository
+from src.application.services.avatar import AvatarService
+from src.application.services.ad_import_runner import INTERRUPTED_ERROR, AdImportRunner
+from src.infrastructure.repositories import (
+    AdSyncStateRepository,
+    EmployeeRepository,
+    ImportRunRepository,
+    PositionRepository,
+    TeamRepository,
+)
 from src.domain.models import Team, Position
+from src.infrastructure.db.models import ImportRunOrm
+
+
+def fake_pages(pages: list[list[dict]], *, server_id: str | None, highest_usn: int | None):
+    """Replacement for AdImportService._stream_user_pages that records requested watermarks."""
+
+    async def stream(watermarks: dict, snapshot: dict):
+        stream.watermarks.append(watermarks)
+        snapshot.update(server_id=server_id, highest_usn=highest_usn, mode="full")
+        for page in pages:
+            yield page
+
+    stream.watermarks = []
+    return stream
+
+
+def normalize_team_name(name: str) -> str:
+    """Stand-in for teams.normalized_name when TeamRepository is mocked."""
+    return " ".join(name.split()).lower()
+
+
+def make_team(*, name: str, parent_id=None, leader_employee_id=None, id=None) -> Team:
+    """Team as TeamRepository returns it, with the database-computed key."""
+    return Team(
+        id=id or uuid4(),
+        name=name,
+        parent_id=parent_id,
+        leader_employee_id=leader_employee_id or uuid4(),
+        normalized_name=normalize_team_name(name),
+    )
+
+
+def mock_team_repo(teams: list[Team]) -> AsyncMock:
+    team_repo = AsyncMock(spec=TeamRepository)
+    team_repo.get_all.return_value = teams
+    team_repo.create_many.side_effect = lambda rows: [make_team(**row) for row in rows]
+    team_repo.normalize_names.side_effect = lambda names: {name: normalize_team_name(name) for name in names}
+    return team_repo
 
 
 @pytest.mark.asyncio
@@ -19,6 +73,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._parse_date("2020-01-15")
@@ -30,6 +85,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._parse_date(None)
@@ -41,6 +97,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         test_date = date(2020, 1, 15)
@@ -53,6 +110,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._first_attr({"key": ["value1", "value2"]}, "key")
@@ -64,6 +122,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._first_attr({"key": "value"}, "key")
@@ -75,6 +134,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._first_attr({"other": "value"}, "key")
@@ -86,6 +146,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._normalize_city("  Moscow  ")
@@ -97,6 +158,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._normalize_city(None)
@@ -108,6 +170,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         result = service._normalize_city("   ")
@@ -119,6 +182,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         entry = {
@@ -135,6 +199,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         entry = {
@@ -151,6 +216,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         entries = [
@@ -174,6 +240,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         entry = {
@@ -191,7 +258,7 @@ class TestAdImportService:
             }
         }
         
-        result = service._map_entry(entry, {})
+        result = service._map_entry(entry)
         
         assert result is not None
         assert result["object_id"] == "guid-123"
@@ -210,6 +277,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         entry = {
@@ -217,7 +285,7 @@ class TestAdImportService:
             "attributes": {}
         }
         
-        result = service._map_entry(entry, {})
+        result = service._map_entry(entry)
         assert result is None
     
     async def test_map_entry_with_service_account(self):
@@ -226,6 +294,7 @@ class TestAdImportService:
             Mock(spec=EmployeeRepository),
             Mock(spec=PositionRepository),
             Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
         )
         
         entry = {
@@ -236,5 +305,885 @@ class TestAdImportService:
             }
         }
         
-        result = service._map_entry(entry, {})
+        result = service._map_entry(entry)
         assert result is None
+
+    async def test_update_from_ad_writes_each_page_in_batches(self):
+        """Test pages are written as they arrive and managers resolve across pages."""
+        employee_repo = AsyncMock(spec=EmployeeRepository)
+        position_repo = AsyncMock(spec=PositionRepository)
+        sync_state_repo = AsyncMock(spec=AdSyncStateRepository)
+
+        root_team = make_team(name="Root")
+        unchanged_id, stale_id = uuid4(), uuid4()
+        team_repo = mock_team_repo([root_team])
+        team_repo.update_leader.side_effect = lambda team_id, leader_id: make_team(
+            id=team_id, name="Example Corp", parent_id=root_team.id, leader_employee_id=leader_id
+        )
+        position_repo.get_all.return_value = [Position(id=uuid4(), title="Engineer")]
+        position_repo.create_many.side_effect = lambda titles: [
+            Position(id=uuid4(), title=title) for title in titles
+        ]
+
+        def make_entry(index: int) -> dict:
+            attributes = {
+                "objectGUID": f"guid-{index}",
+                "mail": f"user{index}@example.com",
+                "givenName": "User",
+                "sn": str(index),
+                "title": "Engineer",
+                "company": "Example Corp",
+            }
+            if index != 4:
+                attributes["manager"] = "CN=User 4,OU=Users,DC=example,DC=com"
+            return {"dn": f"CN=User {index},OU=Users,DC=example,DC=com", "attributes": attributes}
+
+        unchanged = {"dn": "CN=Unchanged,OU=Users,DC=example,DC=com", "attributes": {
+            "objectGUID": "guid-unchanged", "mail": "unchanged@example.com", "givenName": "Unchanged",
+        }}
+        stale = {"dn": "CN=Stale,OU=Users,DC=example,DC=com", "attributes": {
+            "objectGUID": "guid-stale", "mail": "stale@example.com", "givenName": "Stale", "title": "Lead",
+        }}
+        pages = [
+            [make_entry(0), make_entry(1), make_entry(2), stale],
+            [make_entry(3), make_entry(4), make_entry(0), unchanged],
+        ]
+
+        sync_state_repo.get_watermarks.return_value = {}
+        service = AdImportService(employee_repo, position_repo, team_repo, sync_state_repo)
+        employee_repo.get_ad_fingerprints.return_value = {
+            "guid-unchanged": (unchanged_id, service._fingerprint(service._map_entry(unchanged))),
+            "guid-stale": (stale_id, "outdated"),
+        }
+        employee_repo.get_archived_object_ids.return_value = set()
+
+        with (
+            patch.object(service, "_stream_user_pages", fake_pages(pages, server_id="CN=DC1", highest_usn=100)),
+            patch("src.application.services.ad_import.settings.ad.import_batch_size", 2),
+        ):
+            result = await service.update_from_ad()
+
+        assert result == {"imported": 5, "updated": 1, "archived": 0, "warning": None, "mode": "full"}
+        employee_repo.create.assert_not_called()
+        batch_sizes = [len(call.args[0]) for call in employee_repo.create_many.await_args_list]
+        assert batch_sizes == [2, 1, 2]
+
+        rows = [row for call in employee_repo.create_many.await_args_list for row in call.args[0]]
+        assert len({row["id"] for row in rows}) == 5
+        manager_id = next(row["id"] for row in rows if row["object_id"] == "guid-4")
+        team_repo.update_leader.assert_awaited_once()
+        assert team_repo.update_leader.await_args.args[1] == manager_id
+
+        # Должности и команды создаются пачками и только один раз
+        position_repo.get_or_create.assert_not_called()
+        assert [call.args[0] for call in position_repo.create_many.await_args_list] == [["Lead"]]
+        assert [
+            [row["name"] for row in call.args[0]] for call in team_repo.create_many.await_args_list
+        ] == [["Example Corp", "Root"]]
+        team_repo.find_by_name.assert_not_called()
+        sync_state_repo.save.assert_awaited_once_with("CN=DC1", 100)
+
+        employee_repo.update_many.assert_awaited_once()
+        [update_row] = employee_repo.update_many.await_args.args[0]
+        assert update_row["id"] == stale_id
+        assert update_row["ad_fingerprint"] == service._fingerprint(service._map_entry(stale))
+        assert "birth_date" not in update_row
+        assert "hire_date" not in update_row
+        assert all(row["ad_fingerprint"] for row in rows)
+
+        # Ссылки на руководителя пишутся после всех страниц, теми же пачками
+        links = [link for call in employee_repo.set_managers_by_object_id.await_args_list for link in call.args[0]]
+        assert len(employee_repo.set_managers_by_object_id.await_args_list) == 3
+        assert dict(links) == {
+            "guid-0": "guid-4", "guid-1": "guid-4", "guid-2": "guid-4", "guid-3": "guid-4",
+            "guid-4": None, "guid-stale": None,
+        }
+
+    async def test_link_managers_reads_unseen_managers_from_ad(self):
+        """Test a manager missing from an incremental export is looked up by DN."""
+        employee_repo = AsyncMock(spec=EmployeeRepository)
+        service = AdImportService(
+            employee_repo,
+            AsyncMock(spec=PositionRepository),
+            AsyncMock(spec=TeamRepository),
+            AsyncMock(spec=AdSyncStateRepository),
+        )
+        conn = MagicMock()
+        found = MagicMock()
+        found.entry_attributes_as_dict = {"objectGUID": ["guid-boss"]}
+        conn.entries = [found]
+
+        with patch.object(service, "_connection", return_value=nullcontext(conn)):
+            resolved = await service._link_managers(
+                {"guid-1": "cn=boss,dc=example,dc=com", "guid-2": "cn=user 1,dc=example,dc=com"},
+                {"cn=user 1,dc=example,dc=com": "guid-1"},
+            )
+
+        conn.search.assert_called_once()
+        assert conn.search.call_args.kwargs["search_base"] == "cn=boss,dc=example,dc=com"
+        employee_repo.set_managers_by_object_id.assert_awaited_once_with(
+            [("guid-1", "guid-boss"), ("guid-2", "guid-1")]
+        )
+        assert resolved == {"cn=user 1,dc=example,dc=com": "guid-1", "cn=boss,dc=example,dc=com": "guid-boss"}
+
+    async def test_team_leaders_use_managers_read_from_ad(self):
+        """Test new employees get the manager object id resolved by DN lookup, not only from the export."""
+        employee_repo = AsyncMock(spec=EmployeeRepository)
+        position_repo = AsyncMock(spec=PositionRepository)
+        position_repo.get_all.return_value = [Position(id=uuid4(), title="Engineer")]
+        employee_repo.get_ad_fingerprints.return_value = {}
+        employee_repo.get_archived_object_ids.return_value = set()
+        service = AdImportService(
+            employee_repo, position_repo, mock_team_repo([make_team(name="Example Corp")]), AsyncMock(spec=AdSyncStateRepository)
+        )
+        entry = {"dn": "CN=New,DC=example,DC=com", "attributes": {
+            "objectGUID": "guid-new", "mail": "new@example.com", "title": "Engineer",
+            "manager": "CN=Boss,DC=example,DC=com",
+        }}
+
+        with (
+            patch.object(service, "_stream_user_pages", fake_pages([[entry]], server_id=None, highest_usn=None)),
+            patch.object(service, "_lookup_object_ids_sync", return_value={"cn=boss,dc=example,dc=com": "guid-boss"}),
+            patch.object(service, "_assign_team_leaders") as assign_team_leaders,
+        ):
+            await service.update_from_ad("incremental")
+
+        [created_employees] = [call.args[1] for call in assign_team_leaders.await_args_list]
+        assert created_employees["guid-new"]["manager_object_id"] == "guid-boss"
+        employee_repo.set_managers_by_object_id.assert_awaited_once_with([("guid-new", "guid-boss")])
+
+    async def test_update_from_ad_imports_photos_of_new_and_unchanged_employees(self):
+        """Test photos reach the avatar service keyed by employee id, even for unchanged employees."""
+        employee_repo = AsyncMock(spec=EmployeeRepository)
+        position_repo = AsyncMock(spec=PositionRepository)
+        avatar_service = AsyncMock(spec=AvatarService)
+
+        root_team = make_team(name="Example Corp")
+        team_repo = mock_team_repo([root_team])
+        team_repo.update_leader.side_effect = lambda team_id, leader_id: make_team(
+            id=team_id, name="Example Corp", parent_id=root_team.id, leader_employee_id=leader_id
+        )
+        position_repo.get_all.return_value = [Position(id=uuid4(), title="Engineer")]
+        employee_repo.get_archived_object_ids.return_value = set()
+
+        new_entry = {"dn": "CN=New,DC=example,DC=com", "attributes": {
+            "objectGUID": "guid-new", "mail": "new@example.com", "title": "Engineer", "thumbnailPhoto": [b"new-photo"],
+        }}
+        unchanged = {"dn": "CN=Same,DC=example,DC=com", "attributes": {
+            "objectGUID": "guid-same", "mail": "same@example.com", "title": "Engineer", "thumbnailPhoto": [b"same-photo"],
+        }}
+        no_photo = {"dn": "CN=Plain,DC=example,DC=com", "attributes": {
+            "objectGUID": "guid-plain", "mail": "plain@example.com", "title": "Engineer",
+        }}
+
+        service = AdImportService(
+            employee_repo, position_repo, team_repo, AsyncMock(spec=AdSyncStateRepository), avatar_service
+        )
+        unchanged_id = uuid4()
+        employee_repo.get_ad_fingerprints.return_value = {
+            "guid-same": (unchanged_id, service._fingerprint(service._map_entry(unchanged))),
+        }
+        executor = Mock()
+
+        with (
+            patch.object(service, "_stream_user_pages", fake_pages([[new_entry, unchanged, no_photo]], server_id=None, highest_usn=None)),
+            patch.object(service, "_photo_executor", return_value=nullcontext(executor)),
+        ):
+            await service.update_from_ad("full")
+
+        [created_row, _] = [row for call in employee_repo.create_many.await_args_list for row in call.args[0]]
+        avatar_service.import_photos.assert_awaited_once_with(
+            {created_row["id"]: b"new-photo", unchanged_id: b"same-photo"}, executor
+        )
+
+    async def test_update_from_ad_without_ad_settings_reports_missing_configuration(self):
+        """Test a missing AD section fails with a configuration error instead of an attribute error."""
+        service = AdImportService(
+            AsyncMock(spec=EmployeeRepository),
+            AsyncMock(spec=PositionRepository),
+            mock_team_repo([]),
+            AsyncMock(spec=AdSyncStateRepository),
+            AsyncMock(spec=AvatarService),
+        )
+
+        with patch("src.application.services.ad_import.settings.ad", None):
+            assert isinstance(service._photo_executor(), nullcontext)
+            with pytest.raises(ValueError, match="Active Directory is not configured"):
+                await service.update_from_ad("full")
+
+    async def test_fingerprint_ignores_dates(self):
+        """Test fingerprint changes with synced fields but not with defaulted dates."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        entry = {
+            "dn": "CN=John Doe,OU=Users,DC=example,DC=com",
+            "attributes": {"objectGUID": "guid-1", "mail": "john@example.com", "title": "Engineer"},
+        }
+        mapped = service._map_entry(entry)
+        fingerprint = service._fingerprint(mapped)
+
+        assert service._fingerprint({**mapped, "birth_date": date(2000, 1, 1)}) == fingerprint
+        assert service._fingerprint({**mapped, "hire_date": date(2000, 1, 1)}) == fingerprint
+        assert service._fingerprint({**mapped, "position": "Lead"}) != fingerprint
+        assert service._fingerprint({**mapped, "phone": "+7900"}) != fingerprint
+
+    def make_archive_service(self, mode: str) -> tuple[AdImportService, AsyncMock]:
+        employee_repo = AsyncMock(spec=EmployeeRepository)
+        service = AdImportService(
+            employee_repo,
+            AsyncMock(spec=PositionRepository),
+            mock_team_repo([make_team(name="Root")]),
+            AsyncMock(spec=AdSyncStateRepository),
+        )
+
+        def user_entry(guid: str, disabled: bool = False) -> dict:
+            return {"dn": f"CN={guid},OU=Users,DC=example,DC=com", "attributes": {
+                "objectGUID": guid,
+                "mail": f"{guid}@example.com",
+                "userAccountControl": 514 if disabled else 512,
+            }}
+
+        page = [user_entry(f"guid-{index}", disabled=index == 17) for index in range(18)]
+        page.append(user_entry("guid-back"))
+
+        employee_repo.get_ad_fingerprints.return_value = {
+            entry["attributes"]["objectGUID"]: (uuid4(), service._fingerprint(service._map_entry(entry)))
+            for entry in page + [user_entry("guid-18"), user_entry("guid-19")]
+        }
+        employee_repo.get_archived_object_ids.return_value = {"guid-back"}
+        employee_repo.archive_by_object_ids.side_effect = lambda object_ids: len(object_ids)
+        async def stream(watermarks, snapshot):
+            snapshot.update(server_id=None, highest_usn=None, mode=mode)
+            yield page
+
+        service._stream_user_pages = stream
+        return service, employee_repo
+
+    async def test_full_sync_archives_missing_and_disabled_employees(self):
+        """Test employees absent or disabled in AD are archived and returning ones restored."""
+        service, employee_repo = self.make_archive_service("full")
+
+        with patch("src.application.services.ad_import.settings.ad.archive_max_fraction", 0.2):
+            result = await service.update_from_ad("full")
+
+        assert result == {"imported": 0, "updated": 0, "archived": 3, "warning": None, "mode": "full"}
+        employee_repo.archive_by_object_ids.assert_awaited_once_with(["guid-17", "guid-18", "guid-19"])
+        employee_repo.restore_by_object_ids.assert_awaited_once_with(["guid-back"])
+        employee_repo.create_many.assert_not_called()
+        employee_repo.update_many.assert_not_called()
+
+    async def test_full_sync_does_not_archive_after_failed_page(self):
+        """Test nothing is archived when the AD listing breaks off before the last page."""
+        service, employee_repo = self.make_archive_service("full")
+        complete_stream = service._stream_user_pages
+
+        async def stream(watermarks, snapshot):
+            async for page in complete_stream(watermarks, snapshot):
+                yield page
+            raise RuntimeError("Search error in 'OU=Users,DC=example,DC=com'")
+
+        service._stream_user_pages = stream
+
+        with pytest.raises(RuntimeError, match="Search error"):
+            await service.update_from_ad("full")
+
+        employee_repo.archive_by_object_ids.assert_not_called()
+
+    async def test_full_sync_skips_archiving_above_threshold(self):
+        """Test archiving is skipped with a warning when too many employees would disappear."""
+        service, employee_repo = self.make_archive_service("full")
+
+        with (
+            patch("src.application.services.ad_import.settings.ad.archive_max_fraction", 0.1),
+            patch("src.application.services.ad_import.settings.ad.archive_min_count", 2),
+        ):
+            result = await service.update_from_ad("full")
+
+        assert result["archived"] == 0
+        assert result["warning"] == (
+            "Skipped archiving 3 of 20 employees: more than 10% are missing from Active Directory"
+        )
+        employee_repo.archive_by_object_ids.assert_not_called()
+        # Остальная часть прогона не откатывается
+        employee_repo.restore_by_object_ids.assert_awaited_once_with(["guid-back"])
+
+    async def test_full_sync_archives_below_min_count_regardless_of_fraction(self):
+        """Test the fraction limit does not apply while the missing count is below the minimum."""
+        service, employee_repo = self.make_archive_service("full")
+
+        with (
+            patch("src.application.services.ad_import.settings.ad.archive_max_fraction", 0.1),
+            patch("src.application.services.ad_import.settings.ad.archive_min_count", 3),
+        ):
+            result = await service.update_from_ad("full")
+
+        assert (result["archived"], result["warning"]) == (3, None)
+
+    async def test_full_sync_force_archive_ignores_threshold(self):
+        """Test an explicitly forced run archives above the fraction limit."""
+        service, employee_repo = self.make_archive_service("full")
+
+        with (
+            patch("src.application.services.ad_import.settings.ad.archive_max_fraction", 0.1),
+            patch("src.application.services.ad_import.settings.ad.archive_min_count", 0),
+        ):
+            result = await service.update_from_ad("full", force_archive=True)
+
+        assert (result["archived"], result["warning"]) == (3, None)
+        employee_repo.archive_by_object_ids.assert_awaited_once_with(["guid-17", "guid-18", "guid-19"])
+
+    async def test_incremental_sync_archives_only_disabled_employees(self):
+        """Test incremental runs cannot see deletions and archive only disabled accounts."""
+        service, employee_repo = self.make_archive_service("incremental")
+
+        result = await service.update_from_ad()
+
+        assert result["archived"] == 1
+        employee_repo.archive_by_object_ids.assert_awaited_once_with(["guid-17"])
+
+    async def test_update_from_ad_full_mode_ignores_watermarks(self):
+        """Test full mode does not read stored watermarks but still refreshes them."""
+        sync_state_repo = AsyncMock(spec=AdSyncStateRepository)
+        service = AdImportService(
+            AsyncMock(spec=EmployeeRepository),
+            AsyncMock(spec=PositionRepository),
+            AsyncMock(spec=TeamRepository),
+            sync_state_repo,
+        )
+        stream = fake_pages([], server_id="CN=DC1", highest_usn=42)
+
+        with patch.object(service, "_stream_user_pages", stream):
+            result = await service.update_from_ad("full")
+
+        assert result == {"imported": 0, "updated": 0, "archived": 0, "warning": None, "mode": "full"}
+        assert stream.watermarks == [{}]
+        sync_state_repo.get_watermarks.assert_not_called()
+        sync_state_repo.save.assert_awaited_once_with("CN=DC1", 42)
+
+    async def test_update_from_ad_without_server_state_keeps_watermarks(self):
+        """Test a directory without USN information does not store a watermark."""
+        sync_state_repo = AsyncMock(spec=AdSyncStateRepository)
+        sync_state_repo.get_watermarks.return_value = {"CN=DC1": 10}
+        service = AdImportService(
+            AsyncMock(spec=EmployeeRepository),
+            AsyncMock(spec=PositionRepository),
+            AsyncMock(spec=TeamRepository),
+            sync_state_repo,
+        )
+
+        with patch.object(service, "_stream_user_pages", fake_pages([], server_id=None, highest_usn=None)):
+            result = await service.update_from_ad()
+
+        assert result == {"imported": 0, "updated": 0, "archived": 0, "warning": None, "mode": "full"}
+        sync_state_repo.save.assert_not_called()
+
+    async def test_stream_user_pages_yields_pages_from_ldap_thread(self):
+        """Test pages produced in the LDAP thread reach the consumer in order."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+
+        def fetch(watermarks, snapshot, emit, stop):
+            snapshot.update(server_id="CN=DC1", highest_usn=7, mode="full")
+            for index in range(5):
+                emit([{"dn": f"page-{index}"}])
+
+        snapshot: dict = {}
+        with patch.object(service, "_fetch_user_pages_sync", fetch):
+            pages = [page async for page in service._stream_user_pages({}, snapshot)]
+
+        assert pages == [[{"dn": f"page-{index}"}] for index in range(5)]
+        assert snapshot["highest_usn"] == 7
+
+    async def test_stream_user_pages_stops_ldap_thread_when_consumer_leaves(self):
+        """Test closing the stream early does not leave the LDAP thread blocked."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        emitted: list[int] = []
+
+        def fetch(watermarks, snapshot, emit, stop):
+            for index in range(100):
+                if stop.is_set():
+                    break
+                emit([{"dn": f"page-{index}"}])
+                emitted.append(index)
+
+        with patch.object(service, "_fetch_user_pages_sync", fetch):
+            async with aclosing(service._stream_user_pages({}, {})) as pages:
+                async for _ in pages:
+                    break
+
+        assert len(emitted) < 100
+
+    async def test_stream_user_pages_propagates_ldap_errors(self):
+        """Test errors raised in the LDAP thread surface in the consumer."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+
+        def fetch(watermarks, snapshot, emit, stop):
+            emit([{"dn": "page-0"}])
+            raise ValueError("Active Directory credentials are not configured")
+
+        with patch.object(service, "_fetch_user_pages_sync", fetch):
+            with pytest.raises(ValueError, match="credentials"):
+                async for _ in service._stream_user_pages({}, {}):
+                    pass
+
+    @pytest.mark.parametrize(
+        ("watermarks", "server_id", "highest_usn", "expected"),
+        [
+            ({"CN=DC1": 50}, "CN=DC1", 100, 50),
+            ({"CN=DC1": 100}, "CN=DC1", 100, 100),
+            ({}, "CN=DC1", 100, None),
+            ({"CN=DC2": 50}, "CN=DC1", 100, None),
+            ({"CN=DC1": 150}, "CN=DC1", 100, None),
+            ({"CN=DC1": 50}, None, 100, None),
+            ({"CN=DC1": 50}, "CN=DC1", None, None),
+        ],
+    )
+    async def test_resolve_watermark(self, watermarks, server_id, highest_usn, expected):
+        """Test invalid or foreign watermarks fall back to full sync."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+
+        assert service._resolve_watermark(watermarks, server_id, highest_usn) == expected
+
+    async def test_build_search_filter(self):
+        """Test incremental filter only requests entries changed after the watermark."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+
+        assert service._build_search_filter(None) == "(&(objectCategory=person)(objectClass=user))"
+        assert service._build_search_filter(41) == (
+            "(&(&(objectCategory=person)(objectClass=user))(uSNChanged>=42))"
+        )
+
+    async def test_read_server_state(self):
+        """Test rootDSE attributes are parsed into server id and USN."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        root_dse = MagicMock()
+        root_dse.entry_attributes_as_dict = {
+            "dsServiceName": ["CN=NTDS Settings,CN=DC1"],
+            "highestCommittedUSN": ["12345"],
+        }
+        conn = MagicMock()
+        conn.entries = [root_dse]
+
+        assert service._read_server_state(conn) == ("CN=NTDS Settings,CN=DC1", 12345)
+
+        conn.entries = []
+        assert service._read_server_state(conn) == (None, None)
+
+    async def test_iter_user_pages_follows_paged_cookie(self):
+        """Test paged search yields one list per LDAP page."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+
+        def make_ldap_entry(dn: str) -> MagicMock:
+            entry = MagicMock()
+            entry.entry_dn = dn
+            entry.entry_attributes_as_dict = {"objectGUID": [dn]}
+            return entry
+
+        responses = iter([
+            ([make_ldap_entry("a"), make_ldap_entry("b")], b"next"),
+            ([make_ldap_entry("c")], b""),
+        ])
+        conn = MagicMock()
+
+        def search(**kwargs):
+            conn.entries, cookie = next(responses)
+            conn.result = {"result": 0, "controls": {"1.2.840.113556.1.4.319": {"value": {"cookie": cookie}}}}
+
+        conn.search.side_effect = search
+
+        pages = list(service._iter_user_pages(
+            conn, base_dn="DC=example,DC=com", page_size=2, attributes=["objectGUID"]
+        ))
+
+        assert [[entry["dn"] for entry in page] for page in pages] == [["a", "b"], ["c"]]
+        assert conn.search.call_args_list[1].kwargs["paged_cookie"] == b"next"
+        assert conn.search.call_args_list[0].kwargs["attributes"] == ["objectGUID"]
+
+    @pytest.mark.parametrize("result", [
+        {"result": 32, "description": "noSuchObject"},
+        {"result": 4, "description": "sizeLimitExceeded"},
+    ])
+    async def test_iter_user_pages_raises_on_search_error(self, result):
+        """Test a failed or truncated page aborts the base instead of ending it early."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        conn = MagicMock()
+        conn.entries = []
+
+        def search(**kwargs):
+            conn.result = result
+            return result["result"] == 4
+
+        conn.search.side_effect = search
+
+        with pytest.raises(RuntimeError, match=result["description"]):
+            list(service._iter_user_pages(
+                conn, base_dn="DC=example,DC=com", page_size=2, attributes=["objectGUID"]
+            ))
+
+    async def test_iter_user_pages_accepts_empty_base(self):
+        """Test an empty search result is a normal end of the base, not an error."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        conn = MagicMock()
+        conn.entries = []
+        conn.result = {"result": 0, "controls": {}}
+        conn.search.return_value = False
+
+        pages = list(service._iter_user_pages(
+            conn, base_dn="DC=example,DC=com", page_size=2, attributes=["objectGUID"]
+        ))
+
+        assert pages == [[]]
+
+    async def test_requested_attributes_skip_names_missing_from_schema(self):
+        """Test configured attributes unknown to the server schema are not requested."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        conn = MagicMock()
+        conn.server.schema.attribute_types = CaseInsensitiveDict({"objectGUID": None, "mail": None})
+
+        assert service._requested_attributes(conn, ["objectguid", "mail", "birthDate"]) == ["objectguid", "mail"]
+
+        conn.server.schema = None
+        assert service._requested_attributes(conn, ["mail", "birthDate"]) == ["mail", "birthDate"]
+
+    async def test_fetch_user_pages_merges_search_bases(self):
+        """Test every search base is fetched on its own connection and duplicates are dropped."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        pages_by_base = {
+            "OU=Staff,DC=example,DC=com": [[{"attributes": {"objectGUID": ["a"]}}, {"attributes": {"objectGUID": ["b"]}}]],
+            "OU=Contractors,DC=example,DC=com": [[{"attributes": {"objectGUID": ["b"]}}], [{"attributes": {"objectGUID": ["c"]}}]],
+        }
+
+        def iter_pages(conn, *, base_dn, **kwargs):
+            yield from pages_by_base[base_dn]
+
+        emitted: list[list[dict]] = []
+        snapshot: dict = {}
+        with (
+            patch("src.application.services.ad_import.settings.ad.base_dns", list(pages_by_base)),
+            patch.object(service, "_connection", side_effect=lambda server=None: nullcontext(MagicMock())) as open_connection,
+            patch.object(service, "_read_server_state", return_value=("CN=DC1", 10)),
+            patch.object(service, "_requested_attributes", return_value=["objectGUID"]),
+            patch.object(service, "_iter_user_pages", side_effect=iter_pages),
+        ):
+            service._fetch_user_pages_sync({}, snapshot, emitted.append, threading.Event())
+
+        object_ids = [entry["attributes"]["objectGUID"][0] for page in emitted for entry in page]
+        assert sorted(object_ids) == ["a", "b", "c"]
+        assert open_connection.call_count == 3
+        assert snapshot == {"server_id": "CN=DC1", "highest_usn": 10, "mode": "full"}
+
+    async def test_fetch_user_pages_pins_searches_to_state_server(self):
+        """Test searches run on the DC that served the USN, and a base read elsewhere is fetched in full."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+        state_conn = MagicMock()
+        base_conns = {
+            "OU=Staff,DC=example,DC=com": MagicMock(),
+            "OU=Contractors,DC=example,DC=com": MagicMock(),
+        }
+        conns = iter([state_conn, *base_conns.values()])
+        servers = {
+            id(state_conn): "CN=DC1",
+            id(base_conns["OU=Staff,DC=example,DC=com"]): "CN=DC1",
+            # Имя хоста в DNS привело второй поиск на другой DC
+            id(base_conns["OU=Contractors,DC=example,DC=com"]): "CN=DC2",
+        }
+        since_by_base: dict[str, int | None] = {}
+
+        def iter_pages(conn, *, base_dn, since_usn, **kwargs):
+            assert conn is base_conns[base_dn]
+            since_by_base[base_dn] = since_usn
+            yield [{"attributes": {"objectGUID": [base_dn]}}]
+
+        snapshot: dict = {}
+        with (
+            patch("src.application.services.ad_import.settings.ad.base_dns", list(base_conns)),
+            patch("src.application.services.ad_import.settings.ad.fetch_concurrency", 1),
+            patch.object(service, "_connection", side_effect=lambda server=None: nullcontext(next(conns))) as open_connection,
+            patch.object(service, "_read_server_state", side_effect=lambda conn: (servers[id(conn)], 20)),
+            patch.object(service, "_requested_attributes", return_value=["objectGUID"]),
+            patch.object(service, "_iter_user_pages", side_effect=iter_pages),
+        ):
+            service._fetch_user_pages_sync({"CN=DC1": 5}, snapshot, lambda page: None, threading.Event())
+
+        assert [call.args for call in open_connection.call_args_list] == [(), (state_conn.server,), (state_conn.server,)]
+        assert since_by_base == {"OU=Staff,DC=example,DC=com": 5, "OU=Contractors,DC=example,DC=com": None}
+        # Отметка DC1 не сохраняется: часть каталога прочитана с DC2
+        assert snapshot == {"server_id": "CN=DC1", "highest_usn": None, "mode": "incremental"}
+
+    async def test_fetch_user_pages_fails_when_any_base_fails(self):
+        """Test an error in one search base aborts the whole fetch."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+
+        def iter_pages(conn, *, base_dn, **kwargs):
+            if base_dn.startswith("OU=Broken"):
+                raise RuntimeError("search failed")
+            yield [{"attributes": {"objectGUID": ["a"]}}]
+
+        stop = threading.Event()
+        with (
+            patch("src.application.services.ad_import.settings.ad.base_dns", ["OU=Broken,DC=example,DC=com", "OU=Staff,DC=example,DC=com"]),
+            patch.object(service, "_connection", side_effect=lambda server=None: nullcontext(MagicMock())),
+            patch.object(service, "_read_server_state", return_value=(None, None)),
+            patch.object(service, "_requested_attributes", return_value=["objectGUID"]),
+            patch.object(service, "_iter_user_pages", side_effect=iter_pages),
+        ):
+            with pytest.raises(RuntimeError, match="search failed"):
+                service._fetch_user_pages_sync({}, {}, lambda page: None, stop)
+
+        assert stop.is_set()
+
+    async def test_collapse_search_bases_drops_nested_bases(self):
+        """Test a base inside another configured base is not searched twice."""
+        service = AdImportService(
+            Mock(spec=EmployeeRepository),
+            Mock(spec=PositionRepository),
+            Mock(spec=TeamRepository),
+            Mock(spec=AdSyncStateRepository),
+        )
+
+        assert service._collapse_search_bases([
+            "OU=Staff,DC=example,DC=com",
+            "OU=Moscow, OU=Staff, DC=example, DC=com",
+            "ou=staff,dc=example,dc=com",
+            "OU=Partners,DC=example,DC=com",
+        ]) == ["OU=Staff,DC=example,DC=com", "OU=Partners,DC=example,DC=com"]
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestAdImportRunner:
+    """Tests for background AD import runs."""
+
+    @pytest.fixture
+    def runner(self, engine) -> AdImportRunner:
+        return AdImportRunner(async_sessionmaker(engine, expire_on_commit=False))
+
+    async def wait_for_jobs(self, runner: AdImportRunner) -> None:
+        await asyncio.gather(*runner._tasks)
+
+    async def test_run_succeeds_and_records_progress(self, runner: AdImportRunner):
+        """Test a run is queued immediately and stores progress and result."""
+
+        async def update_from_ad(self, mode, on_progress=None, force_archive=False):
+            await on_progress(3)
+            return {"imported": 2, "updated": 1, "archived": 4, "warning": None, "mode": "full"}
+
+        with patch.object(AdImportService, "update_from_ad", update_from_ad):
+            run = await runner.start("incremental")
+            assert run.status == "queued"
+            await self.wait_for_jobs(runner)
+
+        finished = await runner.get_run(run.id)
+        assert finished.status == "succeeded"
+        assert finished.mode == "full"
+        assert (finished.processed, finished.imported, finished.updated, finished.archived) == (3, 2, 1, 4)
+        assert finished.started_at is not None
+        assert finished.finished_at is not None
+
+    async def test_run_stores_warning_and_passes_force_flag(self, runner: AdImportRunner):
+        """Test a run that skipped archiving succeeds with the warning recorded."""
+        calls = []
+
+        async def update_from_ad(self, mode, on_progress=None, force_archive=False):
+            calls.append(force_archive)
+            return {"imported": 0, "updated": 0, "archived": 0, "warning": "Skipped archiving", "mode": mode}
+
+        with patch.object(AdImportService, "update_from_ad", update_from_ad):
+            run = await runner.start("full", force_archive=True)
+            await self.wait_for_jobs(runner)
+
+        finished = await runner.get_run(run.id)
+        assert calls == [True]
+        assert finished.status == "succeeded"
+        assert finished.warning == "Skipped archiving"
+
+    async def test_second_run_is_rejected_while_first_is_active(self, runner: AdImportRunner):
+        """Test only one import can be queued or running at a time."""
+        release = asyncio.Event()
+
+        async def update_from_ad(self, mode, on_progress=None, force_archive=False):
+            await release.wait()
+            return {"imported": 0, "updated": 0, "archived": 0, "warning": None, "mode": mode}
+
+        with patch.object(AdImportService, "update_from_ad", update_from_ad):
+            first = await runner.start("full")
+            assert await runner.start("full") is None
+
+            release.set()
+            await self.wait_for_jobs(runner)
+
+            second = await runner.start("full")
+            await self.wait_for_jobs(runner)
+
+        assert second is not None
+        assert [run.id for run in await runner.get_recent_runs(10)] == [second.id, first.id]
+
+    async def test_failed_run_stores_error(self, runner: AdImportRunner):
+        """Test an import error marks the run failed and frees the slot."""
+
+        async def update_from_ad(self, mode, on_progress=None, force_archive=False):
+            raise ValueError("Active Directory credentials are not configured")
+
+        with patch.object(AdImportService, "update_from_ad", update_from_ad):
+            run = await runner.start("full")
+            await self.wait_for_jobs(runner)
+
+        failed = await runner.get_run(run.id)
+        assert failed.status == "failed"
+        assert failed.error == "Active Directory credentials are not configured"
+
+    async def test_recover_fails_only_stale_runs(self, runner: AdImportRunner, engine):
+        """Test runs without a recent heartbeat are marked failed on startup, fresh ones are kept."""
+        async with async_sessionmaker(engine)() as session:
+            repository = ImportRunRepository(session)
+            stale = await repository.create(mode="full")
+            await session.execute(
+                update(ImportRunOrm).values(heartbeat_at=func.now() - timedelta(hours=1))
+            )
+            await session.commit()
+
+        assert await runner.recover() == 1
+
+        recovered = await runner.get_run(stale.id)
+        assert recovered.status == "failed"
+        assert recovered.error == INTERRUPTED_ERROR
+
+        async with async_sessionmaker(engine)() as session:
+            fresh = await ImportRunRepository(session).create(mode="full")
+            await session.commit()
+
+        assert await runner.recover() == 0
+        assert (await runner.get_run(fresh.id)).status == "queued"
+
+    async def test_start_replaces_stale_run(self, runner: AdImportRunner, engine):
+        """Test a run abandoned by a crashed process does not block the next import."""
+        async with async_sessionmaker(engine)() as session:
+            stale = await ImportRunRepository(session).create(mode="full")
+            await session.execute(
+                update(ImportRunOrm).values(heartbeat_at=func.now() - timedelta(hours=1))
+            )
+            await session.commit()
+
+        async def update_from_ad(self, mode, on_progress=None, force_archive=False):
+            return {"imported": 0, "updated": 0, "archived": 0, "warning": None, "mode": mode}
+
+        with patch.object(AdImportService, "update_from_ad", update_from_ad):
+            run = await runner.start("full")
+            await self.wait_for_jobs(runner)
+
+        assert run is not None
+        assert (await runner.get_run(stale.id)).error == INTERRUPTED_ERROR
+        assert (await runner.get_run(run.id)).status == "succeeded"
+
+    async def test_second_runner_keeps_run_of_live_runner(self, engine):
+        """Test a runner starting against the same database leaves another runner's active run alone."""
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        first = AdImportRunner(session_factory, heartbeat_interval=timedelta(milliseconds=20))
+        second = AdImportRunner(session_factory, stale_after=timedelta(milliseconds=200))
+        release = asyncio.Event()
+
+        async def update_from_ad(self, mode, on_progress=None, force_archive=False):
+            await release.wait()
+            return {"imported": 1, "updated": 0, "archived": 0, "warning": None, "mode": mode}
+
+        with patch.object(AdImportService, "update_from_ad", update_from_ad):
+            run = await first.start("full")
+            # Дольше stale_after второго процесса: живой прогон держится только на пульсе
+            await asyncio.sleep(0.5)
+
+            assert await second.recover() == 0
+            assert await second.start("full") is None
+            active = await second.get_run(run.id)
+            assert active.status == "running"
+            assert active.heartbeat_at > active.started_at
+
+            release.set()
+            await self.wait_for_jobs(first)
+
+        assert (await second.get_run(run.id)).status == "succeeded"
+
+    async def test_shutdown_fails_cancelled_run(self, runner: AdImportRunner):
+        """Test a run cancelled on shutdown is marked failed instead of staying running."""
+        started = asyncio.Event()
+
+        async def update_from_ad(self, mode, on_progress=None, force_archive=False):
+            started.set()
+            await asyncio.Event().wait()
+
+        with patch.object(AdImportService, "update_from_ad", update_from_ad):
+            run = await runner.start("full")
+            await started.wait()
+            await runner.shutdown()
+
+        cancelled = await runner.get_run(run.id)
+        assert cancelled.status == "failed"
+        assert cancelled.error == INTERRUPTED_ERROR
+        assert cancelled.finished_at is not None
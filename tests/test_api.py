@@ -1,7 +1,16 @@
 """API endpoint tests."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest.mock import Mock, patch
+
 import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.testclient import TestClient
 
+from src.api import dependencies
+from src.api.limits import MultipartSizeLimitMiddleware
+from src.api.users import read_upload_limited
 from src.main import app
 
 
@@ -19,3 +28,104 @@ class TestPingEndpoint:
         response = client.get("/api/ping")
         assert response.status_code == 200
         assert response.json() == {"ping": "pong"}
+
+
+@pytest.mark.asyncio
+class TestReadUploadLimited:
+    """Tests for the size-capped upload reader."""
+
+    async def test_reads_content_within_limit(self):
+        """Test that content under the limit is returned unchanged."""
+        upload = UploadFile(BytesIO(b"x" * 100))
+
+        assert await read_upload_limited(upload, max_bytes=100) == b"x" * 100
+
+    async def test_rejects_content_over_limit(self):
+        """Test that exceeding the limit raises 413."""
+        upload = UploadFile(BytesIO(b"x" * 200_000))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await read_upload_limited(upload, max_bytes=100_000)
+
+        assert exc_info.value.status_code == 413
+
+
+class TestMultipartSizeLimit:
+    """Tests for rejecting oversized multipart bodies before they are parsed."""
+
+    @pytest.fixture
+    def limited_client(self):
+        """Client for an app with a single upload endpoint behind the limit."""
+        parsed: list[int] = []
+        limited_app = FastAPI()
+        limited_app.add_middleware(MultipartSizeLimitMiddleware, max_bytes=1000)
+
+        @limited_app.post("/upload")
+        async def upload(file: UploadFile = File(...)):
+            parsed.append(file.size)
+            return {"size": file.size}
+
+        client = TestClient(limited_app)
+        client.parsed = parsed
+        return client
+
+    def test_accepts_body_within_limit(self, limited_client):
+        """Test that a small upload reaches the endpoint."""
+        response = limited_client.post("/upload", files={"file": ("a.png", b"x" * 100)})
+
+        assert response.status_code == 200
+        assert response.json() == {"size": 100}
+
+    def test_rejects_by_content_length(self, limited_client):
+        """Test that a declared oversized body is refused without parsing it."""
+        response = limited_client.post("/upload", files={"file": ("a.png", b"x" * 5000)})
+
+        assert response.status_code == 413
+        assert limited_client.parsed == []
+
+    def test_rejects_streamed_body_over_limit(self, limited_client):
+        """Test that a chunked body without Content-Length is cut off once it exceeds the limit."""
+        boundary = "limit-test"
+
+        def body():
+            yield f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\n\r\n'.encode()
+            for _ in range(10):
+                yield b"x" * 500
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        response = limited_client.post(
+            "/upload",
+            content=body(),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+
+        assert response.status_code == 413
+        assert limited_client.parsed == []
+
+
+@pytest.mark.asyncio
+class TestAdAuthServiceDependency:
+    """Tests for the process-wide AD login service."""
+
+    async def test_concurrent_first_calls_share_one_service(self):
+        """Test parallel first logins create a single service, which is closed on shutdown."""
+
+        def slow_client(*args, **kwargs):
+            time.sleep(0.05)
+            return Mock()
+
+        with (
+            patch("src.api.dependencies.settings.ad.login_enabled", True),
+            patch("src.api.dependencies.get_ldap_pool", return_value=Mock()),
+            patch("src.api.dependencies.LdapClient", side_effect=slow_client) as client_factory,
+        ):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                services = list(executor.map(lambda _: dependencies.get_ad_auth_service(), range(8)))
+
+            assert client_factory.call_count == 1
+            assert all(service is services[0] for service in services)
+
+            await dependencies.close_ad_auth_service()
+
+        services[0].client.client.close.assert_called_once()
+        assert dependencies._ad_auth_service is None
@@ -1,7 +1,12 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
 import pytest
 from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
 
-from src.api.auth import UserIn, register
+from src.api.auth import UserIn, create_access_token, get_current_user, login, register
+from src.application.services import AdAuthService
 
 
 @pytest.mark.asyncio
@@ -26,4 +31,66 @@ async def test_register_rejects_unknown_email(user_repo, employee_repo):
         await register(payload, user_repo, employee_repo)
 
     assert exc_info.value.status_code == 400
-    assert exc_info.value.detail == "Employee not found"
\ No newline at end of file
+    assert exc_info.value.detail == "Employee not found"
+
+
+async def archive(employee_repo, employee) -> None:
+    await employee_repo.update_partial(employee.id, {"archived_at": datetime.now(timezone.utc)})
+
+
+@pytest.mark.asyncio
+async def test_register_rejects_archived_employee(sample_employee, user_repo, employee_repo):
+    await archive(employee_repo, sample_employee)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await register(UserIn(email=sample_employee.email, password="password123"), user_repo, employee_repo)
+
+    assert exc_info.value.detail == "Employee not found"
+
+
+@pytest.mark.asyncio
+async def test_login_rejects_archived_employee(sample_employee, user_repo, employee_repo):
+    payload = UserIn(email=sample_employee.email, password="password123")
+    await register(payload, user_repo, employee_repo)
+    assert (await login(payload, user_repo, employee_repo, None)).access_token
+
+    await archive(employee_repo, sample_employee)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await login(payload, user_repo, employee_repo, None)
+
+    assert exc_info.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_current_user_rejects_token_of_archived_employee(sample_employee, user_repo, employee_repo):
+    user_out = await register(UserIn(email=sample_employee.email, password="password123"), user_repo, employee_repo)
+    token = create_access_token(str(user_out.id), int(datetime.now(timezone.utc).timestamp()), 3600)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    assert (await get_current_user(credentials, user_repo, employee_repo)).id == user_out.id
+
+    await archive(employee_repo, sample_employee)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user(credentials, user_repo, employee_repo)
+
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.detail == "Account is archived"
+
+
+@pytest.mark.asyncio
+async def test_login_falls_back_to_local_password_only_outside_ad(sample_employee, user_repo, employee_repo):
+    payload = UserIn(email=sample_employee.email, password="password123")
+    await register(payload, user_repo, employee_repo)
+    ad_auth_service = AsyncMock(spec=AdAuthService)
+    ad_auth_service.authenticate.return_value = None
+
+    assert (await login(payload, user_repo, employee_repo, ad_auth_service)).access_token
+
+    # Сотрудник пришёл из AD, но AD его больше не находит
+    await employee_repo.update_partial(sample_employee.id, {"object_id": "guid-gone"})
+
+    with pytest.raises(HTTPException) as exc_info:
+        await login(payload, user_repo, employee_repo, ad_auth_service)
+
+    assert exc_info.value.status_code == 401
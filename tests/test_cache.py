@@ -0,0 +1,100 @@
+"""Tests for the byte-size bounded LRU cache."""
+from unittest.mock import patch
+
+from src.infrastructure.cache import ByteSizeLRUCache, TTLCache
+
+
+class TestByteSizeLRUCache:
+    """Tests for ByteSizeLRUCache."""
+
+    def test_get_missing_counts_miss(self):
+        """Test that looking up an unknown key is a miss."""
+        cache = ByteSizeLRUCache(max_bytes=100)
+
+        assert cache.get("missing") is None
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits"] == 0
+
+    def test_put_and_get_counts_hit(self):
+        """Test that a stored value is returned and counted as a hit."""
+        cache = ByteSizeLRUCache(max_bytes=100)
+        cache.put("a", b"abc", 3)
+
+        assert cache.get("a") == b"abc"
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["size_bytes"] == 3
+        assert stats["entries"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted when over budget."""
+        cache = ByteSizeLRUCache(max_bytes=10)
+        cache.put("a", b"a", 4)
+        cache.put("b", b"b", 4)
+        cache.get("a")
+        cache.put("c", b"c", 4)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"a"
+        assert cache.get("c") == b"c"
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["size_bytes"] == 8
+
+    def test_oversized_value_is_not_cached(self):
+        """Test that a value larger than the whole budget is skipped."""
+        cache = ByteSizeLRUCache(max_bytes=10)
+        cache.put("a", b"a", 4)
+        cache.put("big", b"big", 11)
+
+        assert cache.get("big") is None
+        assert cache.get("a") == b"a"
+        assert cache.stats()["evictions"] == 0
+
+    def test_put_replaces_existing_entry_size(self):
+        """Test that overwriting a key replaces its accounted size."""
+        cache = ByteSizeLRUCache(max_bytes=10)
+        cache.put("a", b"a", 4)
+        cache.put("a", b"aa", 6)
+
+        assert cache.stats()["size_bytes"] == 6
+        assert cache.stats()["entries"] == 1
+
+    def test_invalidate(self):
+        """Test that invalidation removes the entry and frees its bytes."""
+        cache = ByteSizeLRUCache(max_bytes=10)
+        cache.put("a", b"a", 4)
+        cache.invalidate("a")
+        cache.invalidate("unknown")
+
+        assert cache.get("a") is None
+        assert cache.stats()["size_bytes"] == 0
+
+
+class TestTTLCache:
+    """Tests for TTLCache."""
+
+    def test_entry_expires_after_ttl(self):
+        """Test that an entry is returned until its TTL passes."""
+        cache = TTLCache(max_entries=10)
+        with patch("src.infrastructure.cache.time.monotonic", return_value=100.0):
+            cache.put("a", 1, ttl=5)
+            assert cache.get("a") == 1
+        with patch("src.infrastructure.cache.time.monotonic", return_value=105.0):
+            assert cache.get("a") is None
+
+    def test_evicts_oldest_entry_over_limit(self):
+        """Test that the earliest written entry is dropped when the cache is full."""
+        cache = TTLCache(max_entries=2)
+        cache.put("a", 1, ttl=60)
+        cache.put("b", 2, ttl=60)
+        cache.put("c", 3, ttl=60)
+
+        assert cache.get("a") is None
+        assert (cache.get("b"), cache.get("c")) == (2, 3)
+
+    def test_non_positive_ttl_is_not_stored(self):
+        """Test that a zero TTL disables caching."""
+        cache = TTLCache(max_entries=2)
+        cache.put("a", 1, ttl=0)
+
+        assert cache.get("a") is None
@@ -1,9 +1,11 @@
 """Tests for LDAP client."""
+import asyncio
+import threading
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import ssl
 
-from src.infrastructure.ldap_client import LdapClient, from_env
+from src.infrastructure.ldap_client import AsyncLdapClient, LdapClient, from_env
 
 
 class TestLdapClient:
@@ -143,6 +145,81 @@ class TestLdapClient:
             with pytest.raises(RuntimeError, match="Search error"):
                 client.search(search_base="dc=example,dc=com", ldap_filter="(objectClass=*)")
     
+    def test_search_without_results(self):
+        """Test a successful search with no matches returns an empty list."""
+        with patch('src.infrastructure.ldap_client.Server') as mock_server, \
+             patch('src.infrastructure.ldap_client.Connection') as mock_conn:
+
+            mock_conn_instance = MagicMock()
+            mock_conn_instance.search.return_value = False
+            mock_conn_instance.result = {"result": 0, "description": "success"}
+            mock_conn_instance.response = []
+            mock_conn.return_value = mock_conn_instance
+
+            client = LdapClient(host="ldap.example.com")
+
+            assert client.search(search_base="dc=example,dc=com", ldap_filter="(mail=nobody@example.com)") == []
+
+    def test_verify_password_rejects_empty_password(self):
+        """Test an empty password is refused without an (anonymous) bind."""
+        with patch('src.infrastructure.ldap_client.Server') as mock_server, \
+             patch('src.infrastructure.ldap_client.Connection') as mock_conn:
+
+            client = LdapClient(host="ldap.example.com")
+
+            assert client.verify_password("cn=user1,ou=users,dc=example,dc=com", "") is False
+            mock_conn.assert_called_once()
+
+    def test_iter_search_follows_paged_cookie(self):
+        """Test iter_search yields entries page by page until the server returns an empty cookie."""
+        with patch('src.infrastructure.ldap_client.Server') as mock_server, \
+             patch('src.infrastructure.ldap_client.Connection') as mock_conn:
+
+            mock_conn_instance = MagicMock()
+            pages = iter([
+                (["cn=user1", "cn=user2"], b"next"),
+                (["cn=user3"], b""),
+            ])
+
+            def search(**kwargs):
+                dns, cookie = next(pages)
+                mock_conn_instance.response = [
+                    {"type": "searchResEntry", "dn": dn, "attributes": {}} for dn in dns
+                ] + [{"type": "searchResRef", "uri": ["ldap://other"]}]
+                mock_conn_instance.result = {
+                    "result": 0,
+                    "controls": {"1.2.840.113556.1.4.319": {"value": {"cookie": cookie}}},
+                }
+                return True
+
+            mock_conn_instance.search.side_effect = search
+            mock_conn.return_value = mock_conn_instance
+
+            client = LdapClient(host="ldap.example.com", base_dn="dc=example,dc=com")
+            entries = client.iter_search(None, "(objectClass=person)", page_size=2)
+
+            assert next(entries)["dn"] == "cn=user1"
+            # The next page is requested only once the first one is consumed
+            assert mock_conn_instance.search.call_count == 1
+            assert [entry["dn"] for entry in entries] == ["cn=user2", "cn=user3"]
+            assert mock_conn_instance.search.call_args_list[1].kwargs["paged_cookie"] == b"next"
+            assert mock_conn_instance.search.call_args_list[0].kwargs["paged_size"] == 2
+
+    def test_iter_search_failure(self):
+        """Test iter_search raises on an unsuccessful result code."""
+        with patch('src.infrastructure.ldap_client.Server') as mock_server, \
+             patch('src.infrastructure.ldap_client.Connection') as mock_conn:
+
+            mock_conn_instance = MagicMock()
+            mock_conn_instance.search.return_value = False
+            mock_conn_instance.result = {"result": 32, "description": "noSuchObject"}
+            mock_conn.return_value = mock_conn_instance
+
+            client = LdapClient(host="ldap.example.com")
+
+            with pytest.raises(RuntimeError, match="Search error"):
+                list(client.iter_search("ou=missing,dc=example,dc=com", "(objectClass=*)"))
+
     def test_verify_password_success(self):
         """Test password verification success."""
         with patch('src.infrastructure.ldap_client.Server') as mock_server, \
@@ -284,6 +361,59 @@ class TestLdapClient:
             mock_conn_instance.unbind.assert_called_once()
 
 
+@pytest.mark.asyncio
+class TestAsyncLdapClient:
+    """Tests for AsyncLdapClient."""
+
+    async def test_calls_run_in_worker_thread(self):
+        """Test blocking methods run off the event loop thread and return their results."""
+        client = Mock(spec=LdapClient)
+        loop_thread = threading.get_ident()
+        client.search.side_effect = lambda *args: [{"dn": "cn=user1", "thread": threading.get_ident()}]
+        client.verify_password.return_value = True
+        async_client = AsyncLdapClient(client)
+
+        results = await async_client.search(None, "(objectClass=person)")
+        assert await async_client.verify_password("cn=user1", "secret") is True
+        await async_client.delete_entry("cn=user1")
+        await async_client.close()
+
+        assert results[0]["thread"] != loop_thread
+        client.delete_entry.assert_called_once_with("cn=user1")
+        client.close.assert_called_once()
+
+    async def test_call_times_out(self):
+        """Test a call exceeding its timeout raises TimeoutError."""
+        client = Mock(spec=LdapClient)
+        release = threading.Event()
+        client.search.side_effect = lambda *args: release.wait()
+        async_client = AsyncLdapClient(client, timeout=5)
+
+        with pytest.raises(TimeoutError):
+            await async_client.search(None, "(objectClass=*)", timeout=0.05)
+
+        release.set()
+        await async_client.close()
+
+    async def test_timed_out_queued_call_never_runs(self):
+        """Test a call waiting for a free worker is dropped when it times out."""
+        client = Mock(spec=LdapClient)
+        release = threading.Event()
+        client.search.side_effect = lambda *args: release.wait()
+        async_client = AsyncLdapClient(client, max_workers=1)
+
+        running = asyncio.create_task(async_client.search(None, "(objectClass=*)"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(TimeoutError):
+            await async_client.delete_entry("cn=user1", timeout=0.05)
+
+        release.set()
+        await running
+        await async_client.close()
+
+        client.delete_entry.assert_not_called()
+
+
 def test_from_env():
     """Test creating LdapClient from environment variables."""
     with patch.dict('os.environ', {
@@ -0,0 +1,157 @@
+"""Tests for the shared LDAP connection pool."""
+from unittest.mock import MagicMock, patch
+
+import pytest
+from ldap3.core.exceptions import LDAPSocketReceiveError
+
+from src.infrastructure.ldap_client import LdapClient
+from src.infrastructure.ldap_pool import LdapConnectionPool
+
+
+def make_pool(**kwargs) -> LdapConnectionPool:
+    return LdapConnectionPool(["dc1.example.com", "dc2.example.com"], user="svc", password="secret", **kwargs)
+
+
+def make_connection() -> MagicMock:
+    conn = MagicMock()
+    conn.closed = False
+    return conn
+
+
+class TestLdapConnectionPool:
+    """Tests for LdapConnectionPool."""
+
+    def test_reuses_released_connection(self):
+        """Test a released connection is handed out again instead of binding a new one."""
+        pool = make_pool()
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=lambda *a, **kw: make_connection()) as connection:
+            with pool.acquire() as first:
+                pass
+            with pool.acquire() as second:
+                pass
+
+        assert first is second
+        assert connection.call_count == 1
+        assert pool.stats() == {
+            "size": 1, "in_use": 0, "idle": 1, "max_size": 8,
+            "created": 1, "discarded": 0, "acquired": 2, "waits": 0,
+        }
+
+    def test_discards_connection_after_ldap_error(self):
+        """Test a connection that failed with an LDAP error is not reused."""
+        pool = make_pool()
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=lambda *a, **kw: make_connection()):
+            with pytest.raises(LDAPSocketReceiveError):
+                with pool.acquire() as broken:
+                    raise LDAPSocketReceiveError("connection reset")
+            with pool.acquire() as fresh:
+                pass
+
+        assert fresh is not broken
+        broken.unbind.assert_called_once()
+        assert pool.stats()["discarded"] == 1
+
+    def test_keeps_connection_after_application_error(self):
+        """Test errors unrelated to LDAP return the connection to the pool."""
+        pool = make_pool()
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=lambda *a, **kw: make_connection()):
+            with pytest.raises(ValueError):
+                with pool.acquire():
+                    raise ValueError("bad input")
+
+        assert pool.stats()["idle"] == 1
+
+    def test_probes_idle_connection_before_reuse(self):
+        """Test a connection idle longer than keepalive is checked and replaced when dead."""
+        pool = make_pool(keepalive_seconds=0)
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=lambda *a, **kw: make_connection()):
+            with pool.acquire() as stale:
+                stale.search.return_value = False
+            with pool.acquire() as fresh:
+                pass
+
+        assert fresh is not stale
+        stale.search.assert_called_once()
+        assert pool.stats()["created"] == 2
+
+    def test_raises_when_exhausted(self):
+        """Test acquire gives up once max_size connections are busy for the whole timeout."""
+        pool = make_pool(max_size=1, acquire_timeout=0.01)
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=lambda *a, **kw: make_connection()):
+            with pool.acquire():
+                with pytest.raises(RuntimeError, match="exhausted"):
+                    with pool.acquire():
+                        pass
+
+        assert pool.stats()["waits"] >= 1
+
+    def test_pinned_acquire_returns_connection_to_requested_server(self):
+        """Test acquire(server) reuses only a connection to that DC and binds a new one otherwise."""
+        pool = make_pool()
+        dc1, dc2 = pool.server_pool.servers
+
+        def open_connection(server, **kwargs):
+            conn = make_connection()
+            conn.server = dc1 if server is pool.server_pool else server
+            return conn
+
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=open_connection) as connection:
+            with pool.acquire() as pooled:
+                pass
+            with pool.acquire(dc2) as pinned:
+                pass
+            with pool.acquire(dc1) as reused:
+                pass
+
+        assert connection.call_args_list[1].args == (dc2,)
+        assert pinned.server is dc2
+        assert reused is pooled
+        assert pool.stats()["idle"] == 2
+
+    def test_pinned_acquire_evicts_idle_connection_to_other_server(self):
+        """Test a full pool closes an idle connection to another DC to open a pinned one."""
+        pool = make_pool(max_size=1)
+        dc1, dc2 = pool.server_pool.servers
+
+        def open_connection(server, **kwargs):
+            conn = make_connection()
+            conn.server = dc1 if server is pool.server_pool else server
+            return conn
+
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=open_connection):
+            with pool.acquire() as pooled:
+                pass
+            with pool.acquire(dc2) as pinned:
+                pass
+
+        pooled.unbind.assert_called_once()
+        assert pinned.server is dc2
+        assert pool.stats()["size"] == 1
+
+    def test_close_unbinds_idle_connections(self):
+        """Test closing the pool unbinds idle connections and rejects new checkouts."""
+        pool = make_pool()
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=lambda *a, **kw: make_connection()):
+            with pool.acquire() as conn:
+                pass
+            pool.close()
+
+            with pytest.raises(RuntimeError, match="closed"):
+                with pool.acquire():
+                    pass
+
+        conn.unbind.assert_called_once()
+        assert pool.stats()["size"] == 0
+
+    def test_ldap_client_runs_operations_on_pool(self):
+        """Test LdapClient built with a pool does not open its own connection."""
+        pool = make_pool()
+        with patch("src.infrastructure.ldap_pool.Connection", side_effect=lambda *a, **kw: make_connection()), \
+                patch("src.infrastructure.ldap_client.Connection") as own_connection:
+            client = LdapClient(host="ignored", pool=pool)
+            client.delete_entry("cn=user1,dc=example,dc=com")
+            client.close()
+
+        own_connection.assert_not_called()
+        assert pool.stats()["acquired"] == 1
+        assert pool.stats()["idle"] == 1
@@ -1,10 +1,191 @@
 """Tests for other application services."""
+import csv
+import hashlib
+import json
+import multiprocessing
+import zipfile
 import pytest
+import pytest_asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
+from unittest.mock import AsyncMock, Mock, patch
+from xml.etree import ElementTree
 from uuid import uuid4
 
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.application.services.ad_auth import AdAuthService
 from src.application.services.avatar import AvatarService
+from src.application.services.csv_import import CsvRecordReader, EmployeeCsvImportService, iter_csv_records
+from src.application.services.export import DirectoryExportService
+from src.infrastructure.cache import TTLCache
+from src.infrastructure.ldap_client import AsyncLdapClient
+from src.domain.models import Avatar, AvatarRendition, EmployeeStatus, User
+from src.infrastructure.repositories import PositionRepository, TeamRepository, UserRepository
 from src.infrastructure.repositories.avatar import AvatarRepository
+from src.infrastructure.repositories.employee import EmployeeRepository
+
+
+class TestAvatarFormatNegotiation:
+    """Tests for choosing the avatar format from the Accept header."""
+
+    def test_webp_when_accepted(self):
+        """Test that WebP is served to clients that list it."""
+        service = AvatarService(Mock(spec=AvatarRepository))
+        accept = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+
+        assert service.preferred_mime_type(accept) == "image/webp"
+
+    def test_png_without_accept_header(self):
+        """Test that PNG is the fallback when no Accept header is sent."""
+        service = AvatarService(Mock(spec=AvatarRepository))
+
+        assert service.preferred_mime_type(None) == "image/png"
+
+    def test_png_when_webp_rejected(self):
+        """Test that q=0 excludes WebP."""
+        service = AvatarService(Mock(spec=AvatarRepository))
+
+        assert service.preferred_mime_type("image/webp;q=0, */*") == "image/png"
+
+
+def encode_image(size: tuple[int, int], image_format: str, mode: str = "RGB") -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        pytest.skip("PIL not available")
+
+    buffer = BytesIO()
+    image = Image.new("RGB", size, color="blue") if mode == "RGB" else Image.new(mode, size)
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def image_size(content: bytes) -> tuple[int, int]:
+    from PIL import Image
+
+    with Image.open(BytesIO(content)) as image:
+        return image.size
+
+
+@pytest.mark.asyncio
+class TestAvatarDecoding:
+    """Tests for bounded avatar decoding."""
+
+    @staticmethod
+    def make_service() -> AvatarService:
+        repository = Mock(spec=AvatarRepository)
+        repository.upsert = AsyncMock(side_effect=lambda avatar: avatar)
+        return AvatarService(repository)
+
+    async def test_rejects_too_many_pixels(self):
+        """Test that images above the pixel limit are rejected before decoding."""
+        service = self.make_service()
+        content = encode_image((400, 300), "PNG")
+
+        with patch("src.application.services.avatar.settings") as mock_settings:
+            mock_settings.avatar.max_image_pixels = 100_000
+            with pytest.raises(ValueError, match="too large"):
+                await service.save_avatar(uuid4(), content)
+
+    async def test_large_jpeg_is_downscaled_to_master(self):
+        """Test that a large JPEG is stored as a square master of the configured size."""
+        service = self.make_service()
+        content = encode_image((3000, 2000), "JPEG")
+
+        avatar = await service.save_avatar(uuid4(), content)
+
+        assert avatar.mime_type == "image/png"
+        assert image_size(avatar.master) == (512, 512)
+
+    @pytest.mark.parametrize("mode", ["P", "1", "I;16"])
+    async def test_large_image_in_non_rgb_mode_is_downscaled(self, mode: str):
+        """Test that palette, bilevel and 16-bit images are converted before the fast reduce."""
+        service = self.make_service()
+        content = encode_image((2400, 2400), "PNG", mode)
+
+        avatar = await service.save_avatar(uuid4(), content)
+
+        assert image_size(avatar.master) == (512, 512)
+
+    async def test_truncated_image_is_rejected(self):
+        """Test a decoder error on truncated data surfaces as a validation error."""
+        service = self.make_service()
+        content = encode_image((300, 300), "JPEG")[:400]
+
+        with pytest.raises(ValueError, match="truncated or corrupt"):
+            await service.save_avatar(uuid4(), content)
+
+    async def test_small_image_is_not_upscaled(self):
+        """Test that the master keeps the source resolution when it is below master size."""
+        service = self.make_service()
+        content = encode_image((100, 80), "PNG")
+
+        avatar = await service.save_avatar(uuid4(), content)
+
+        assert image_size(avatar.master) == (80, 80)
+
+    async def test_identical_uploads_share_hash(self):
+        """Test that the same image uploaded for two employees hashes identically."""
+        service = self.make_service()
+        content = encode_image((300, 300), "PNG")
+
+        first = await service.save_avatar(uuid4(), content)
+        second = await service.save_avatar(uuid4(), content)
+
+        assert first.image_hash == second.image_hash
+        assert len(first.image_hash) == 64
+
+
+@pytest.mark.asyncio
+class TestAvatarRenditions:
+    """Tests for lazily rendered avatar sizes."""
+
+    @staticmethod
+    def make_service(stored: AvatarRendition | None = None) -> tuple[AvatarService, Mock]:
+        repository = Mock(spec=AvatarRepository)
+        repository.get_image_hash = AsyncMock(return_value="a" * 64)
+        repository.get_rendition = AsyncMock(return_value=stored)
+        repository.get_master = AsyncMock(return_value=encode_image((512, 512), "PNG"))
+        repository.save_rendition = AsyncMock(side_effect=lambda rendition: rendition)
+        return AvatarService(repository), repository
+
+    async def test_renders_missing_size_from_master(self):
+        """Test that a missing rendition is rendered and saved."""
+        service, repository = self.make_service()
+
+        rendition = await service.get_rendition(uuid4(), 256, "image/webp")
+
+        assert rendition.mime_type == "image/webp"
+        assert rendition.image_hash == "a" * 64
+        assert image_size(rendition.content) == (256, 256)
+        repository.save_rendition.assert_awaited_once()
+
+    async def test_returns_stored_rendition(self):
+        """Test that an existing rendition is returned without rendering."""
+        stored = AvatarRendition(image_hash="a" * 64, size=64, mime_type="image/png", content=b"png")
+        service, repository = self.make_service(stored)
+
+        rendition = await service.get_rendition(uuid4(), 64, "image/png")
+
+        assert rendition is stored
+        repository.get_master.assert_not_awaited()
+        repository.save_rendition.assert_not_awaited()
+
+    async def test_rejects_unknown_size(self):
+        """Test that sizes outside the configured presets are rejected."""
+        service, _ = self.make_service()
+
+        with pytest.raises(ValueError, match="Unsupported avatar size"):
+            await service.get_rendition(uuid4(), 100, "image/png")
+
+    async def test_missing_avatar_returns_none(self):
+        """Test that no rendition is produced when the employee has no avatar."""
+        service, repository = self.make_service()
+        repository.get_image_hash.return_value = None
+
+        assert await service.get_rendition(uuid4(), 32, "image/png") is None
+
 
 @pytest.mark.integration
 class TestAvatarService:
@@ -40,8 +221,14 @@ class TestAvatarService:
         assert avatar is not None
         assert avatar.employee_id == sample_employee.id
         assert avatar.mime_type == "image/png"
-        assert len(avatar.image_small) > 0
-        assert len(avatar.image_large) > 0
+        assert len(avatar.master) > 0
+
+        rendition = await avatar_service.get_rendition(sample_employee.id, 64, "image/webp")
+        await session.commit()
+
+        assert rendition is not None
+        assert rendition.size == 64
+        assert len(rendition.content) > 0
 
     @pytest.mark.asyncio
     async def test_save_avatar_empty_content(
@@ -66,7 +253,7 @@ class TestAvatarService:
             await avatar_service.save_avatar(sample_employee.id, invalid_data)
 
     @pytest.mark.asyncio
-    async def test_get_avatar_existing(
+    async def test_get_image_hash_existing(
         self,
         avatar_service: AvatarService,
         sample_employee,
@@ -80,22 +267,20 @@ class TestAvatarService:
         await session.commit()
         
         # Retrieve avatar
-        avatar = await avatar_service.get_avatar(sample_employee.id)
+        image_hash = await avatar_service.avatar_repository.get_image_hash(sample_employee.id)
         
-        assert avatar is not None
-        assert avatar.employee_id == sample_employee.id
+        assert image_hash is not None
+        assert await avatar_service.avatar_repository.get_master(image_hash)
 
     @pytest.mark.asyncio
-    async def test_get_avatar_nonexistent(
+    async def test_get_image_hash_nonexistent(
         self,
         avatar_service: AvatarService,
     ):
-        """Test getting a non-existent avatar returns None."""
+        """Test a missing avatar has no image hash."""
         fake_id = uuid4()
         
-        avatar = await avatar_service.get_avatar(fake_id)
-        
-        assert avatar is None
+        assert await avatar_service.avatar_repository.get_image_hash(fake_id) is None
 
     @pytest.mark.asyncio
     async def test_delete_avatar_existing(
@@ -116,8 +301,7 @@ class TestAvatarService:
         await session.commit()
         
         # Verify deletion
-        avatar = await avatar_service.get_avatar(sample_employee.id)
-        assert avatar is None
+        assert await avatar_service.avatar_repository.get_image_hash(sample_employee.id) is None
 
     @pytest.mark.asyncio
     async def test_delete_avatar_nonexistent(
@@ -153,5 +337,504 @@ class TestAvatarService:
         assert avatar1.employee_id == avatar2.employee_id
         
         # Verify only one avatar exists
-        avatar = await avatar_service.get_avatar(sample_employee.id)
-        assert avatar is not None
+        assert await avatar_service.avatar_repository.get_image_hash(sample_employee.id) is not None
+
+    @pytest.mark.asyncio
+    async def test_identical_avatars_are_deduplicated(
+        self,
+        avatar_service: AvatarService,
+        sample_employee,
+        admin_employee,
+        session,
+    ):
+        """Test that identical uploads share one stored image with a reference count."""
+        import sqlalchemy
+
+        image_data = self.create_test_image()
+
+        first = await avatar_service.save_avatar(sample_employee.id, image_data)
+        await avatar_service.save_avatar(admin_employee.id, image_data)
+        await session.commit()
+
+        count_stmt = sqlalchemy.text("SELECT hash, ref_count FROM avatar_images")
+        rows = (await session.execute(count_stmt)).all()
+        assert rows == [(first.image_hash, 2)]
+
+        await avatar_service.delete_avatar(sample_employee.id)
+        await session.commit()
+        rows = (await session.execute(count_stmt)).all()
+        assert rows == [(first.image_hash, 1)]
+
+        await avatar_service.delete_avatar(admin_employee.id)
+        await session.commit()
+        rows = (await session.execute(count_stmt)).all()
+        assert rows == []
+
+    @pytest.mark.asyncio
+    async def test_shared_image_survives_concurrent_delete_of_last_reference(
+        self,
+        engine,
+        avatar_service: AvatarService,
+        sample_employee,
+        admin_employee,
+        session,
+    ):
+        """Test that deleting the last reference while another upload of the same image is in flight keeps it."""
+        import asyncio
+        import sqlalchemy
+
+        image_data = self.create_test_image()
+        first = await avatar_service.save_avatar(sample_employee.id, image_data)
+        await session.commit()
+
+        async def delete_first_avatar():
+            async with async_sessionmaker(engine)() as other_session:
+                await AvatarRepository(other_session).delete_by_employee_id(sample_employee.id)
+                await other_session.commit()
+
+        # Удаление запускается между записью изображения и вставкой ссылающегося аватара
+        execute = session.execute
+        deletion: list[asyncio.Task] = []
+
+        async def execute_with_concurrent_delete(statement, *args, **kwargs):
+            result = await execute(statement, *args, **kwargs)
+            if not deletion:
+                deletion.append(asyncio.create_task(delete_first_avatar()))
+                await asyncio.wait([deletion[0]], timeout=0.5)
+            return result
+
+        with patch.object(session, "execute", side_effect=execute_with_concurrent_delete):
+            await avatar_service.save_avatar(admin_employee.id, image_data)
+        await session.commit()
+        await deletion[0]
+
+        rows = (await session.execute(sqlalchemy.text("SELECT hash, ref_count FROM avatar_images"))).all()
+        assert rows == [(first.image_hash, 1)]
+        assert await avatar_service.avatar_repository.get_image_hash(admin_employee.id) == first.image_hash
+        assert await avatar_service.avatar_repository.get_image_hash(sample_employee.id) is None
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestAvatarPhotoImport:
+    """Integration tests for bulk photo import into avatars."""
+
+    async def test_imports_in_process_pool_and_skips_unchanged(
+        self,
+        avatar_service: AvatarService,
+        avatar_repo: AvatarRepository,
+        sample_employee,
+        session,
+    ):
+        """Test photos are rendered in worker processes and an unchanged photo is not rendered again."""
+        photo = TestAvatarService.create_test_image()
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            assert await avatar_service.import_photos({sample_employee.id: photo}, executor) == 1
+            await session.commit()
+            assert await avatar_service.import_photos({sample_employee.id: photo}, executor) == 0
+
+        assert await avatar_service.avatar_repository.get_image_hash(sample_employee.id) is not None
+        assert await avatar_repo.get_source_hashes([sample_employee.id]) == {
+            sample_employee.id: hashlib.sha256(photo).hexdigest()
+        }
+
+    async def test_keeps_manual_upload_and_skips_broken_photo(
+        self,
+        avatar_service: AvatarService,
+        sample_employee,
+        session,
+    ):
+        """Test an uploaded avatar is not replaced by the AD photo and a broken photo is ignored."""
+        uploaded = await avatar_service.save_avatar(sample_employee.id, TestAvatarService.create_test_image())
+        await session.commit()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert await avatar_service.import_photos({sample_employee.id: b"other photo"}, executor) == 0
+            assert await avatar_service.import_photos({uuid4(): b"not an image"}, executor) == 0
+
+        assert await avatar_service.avatar_repository.get_image_hash(sample_employee.id) == uploaded.image_hash
+
+    async def test_truncated_photo_does_not_block_other_photos(
+        self,
+        avatar_service: AvatarService,
+        sample_employee,
+        admin_employee,
+        session,
+    ):
+        """Test a truncated JPEG is skipped while the valid photo in the same import is stored."""
+        truncated = encode_image((300, 300), "JPEG")[:400]
+        photos = {sample_employee.id: TestAvatarService.create_test_image(), admin_employee.id: truncated}
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert await avatar_service.import_photos(photos, executor) == 1
+        await session.commit()
+
+        assert await avatar_service.avatar_repository.get_image_hash(sample_employee.id) is not None
+        assert await avatar_service.avatar_repository.get_image_hash(admin_employee.id) is None
+
+    async def test_skipped_manual_avatar_leaves_no_orphan_image(
+        self,
+        avatar_repo: AvatarRepository,
+        sample_employee,
+        session,
+    ):
+        """Test an AD image that ends up unreferenced is removed in the same transaction."""
+        import sqlalchemy
+
+        await avatar_repo.upsert(
+            Avatar(employee_id=sample_employee.id, image_hash="a" * 64, mime_type="image/png", master=b"manual")
+        )
+        await avatar_repo.upsert_many([
+            Avatar(
+                employee_id=sample_employee.id,
+                image_hash="b" * 64,
+                mime_type="image/png",
+                master=b"from ad",
+                source_hash="c" * 64,
+            )
+        ])
+        await session.commit()
+
+        rows = (await session.execute(sqlalchemy.text("SELECT hash, ref_count FROM avatar_images"))).all()
+        assert rows == [("a" * 64, 1)]
+
+
+@pytest.mark.asyncio
+class TestAdAuthService:
+    """Tests for AD bind-as-user login."""
+
+    def make_service(self, client) -> AdAuthService:
+        return AdAuthService(
+            client,
+            TTLCache(max_entries=100),
+            search_bases=["OU=Staff,DC=example,DC=com"],
+            success_ttl=60,
+            failure_ttl=15,
+        )
+
+    async def test_binds_as_found_user(self):
+        """Test the password is checked by binding as the DN found for the login."""
+        client = AsyncMock(spec=AsyncLdapClient)
+        client.search.return_value = [{"dn": "CN=Ivan,OU=Staff,DC=example,DC=com", "attributes": {}}]
+        client.verify_password.return_value = True
+        service = self.make_service(client)
+
+        assert await service.authenticate("ivan@example.com", "secret") is True
+        client.verify_password.assert_awaited_once_with("CN=Ivan,OU=Staff,DC=example,DC=com", "secret")
+        assert "(mail=ivan@example.com)" in client.search.await_args.args[1]
+
+    async def test_repeated_attempts_are_served_from_cache(self):
+        """Test the same credentials hit the directory once, different passwords are checked again."""
+        client = AsyncMock(spec=AsyncLdapClient)
+        client.search.return_value = [{"dn": "CN=Ivan,OU=Staff,DC=example,DC=com", "attributes": {}}]
+        client.verify_password.return_value = False
+        service = self.make_service(client)
+
+        for _ in range(3):
+            assert await service.authenticate("Ivan@example.com", "wrong") is False
+        assert await service.authenticate("ivan@example.com", "wrong") is False
+        assert client.verify_password.await_count == 1
+
+        client.verify_password.return_value = True
+        assert await service.authenticate("ivan@example.com", "right") is True
+        assert client.verify_password.await_count == 2
+
+    async def test_unknown_login_defers_to_local_check(self):
+        """Test a login missing from AD returns None without binding."""
+        client = AsyncMock(spec=AsyncLdapClient)
+        client.search.return_value = []
+        service = self.make_service(client)
+
+        assert await service.authenticate("admin@example.com", "secret") is None
+        client.verify_password.assert_not_awaited()
+
+    async def test_rejects_empty_password_and_ambiguous_login(self):
+        """Test an empty password never reaches AD and a login matching several accounts is refused."""
+        client = AsyncMock(spec=AsyncLdapClient)
+        client.search.return_value = [
+            {"dn": "CN=Ivan,OU=Staff,DC=example,DC=com", "attributes": {}},
+            {"dn": "CN=Ivan2,OU=Staff,DC=example,DC=com", "attributes": {}},
+        ]
+        service = self.make_service(client)
+
+        assert await service.authenticate("ivan@example.com", "") is False
+        client.search.assert_not_awaited()
+        assert await service.authenticate("ivan@example.com", "secret") is False
+        client.verify_password.assert_not_awaited()
+
+    async def test_escapes_login_in_search_filter(self):
+        """Test LDAP filter metacharacters in the login cannot alter the search."""
+        client = AsyncMock(spec=AsyncLdapClient)
+        client.search.return_value = []
+        service = self.make_service(client)
+
+        await service.authenticate("*)(objectClass=*", "secret")
+
+        assert "(mail=\\2a\\29\\28objectClass=\\2a)" in client.search.await_args.args[1]
+
+
+async def byte_chunks(content: bytes, size: int):
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+class TestCsvRecordReader:
+    """Tests for incremental CSV record splitting."""
+
+    def test_joins_records_split_across_chunks(self):
+        """Test records split mid-line and quoted newlines survive arbitrary chunking."""
+        reader = CsvRecordReader()
+        records = reader.feed('a,"b')
+        records += reader.feed('\nc",d\r\n\n"e""f",')
+        records += reader.feed("g")
+        records += reader.close()
+
+        assert records == [(1, ["a", "b\nc", "d"]), (4, ['e"f', "g"])]
+
+    def test_reports_unterminated_quote_and_resumes(self):
+        """Test a quote left open at the end of the file is reported and the next lines still parse."""
+        reader = CsvRecordReader()
+        records = reader.feed('"open,x\nb,c\n')
+        records += reader.close()
+
+        assert [line for line, _ in records] == [1, 2]
+        assert isinstance(records[0][1], ValueError)
+        assert records[1] == (2, ["b", "c"])
+
+    def test_stray_quote_inside_field_does_not_join_lines(self):
+        """Test a quote in the middle of an unquoted field is data, not the start of a quoted field."""
+        reader = CsvRecordReader()
+        records = reader.feed('a,b"c\nd,e\n')
+        records += reader.close()
+
+        assert records == [(1, ["a", 'b"c']), (2, ["d", "e"])]
+
+    def test_caps_quoted_record_line_span(self):
+        """Test an opening quote that never closes stops swallowing lines after the cap."""
+        reader = CsvRecordReader()
+        with patch("src.application.services.csv_import.MAX_RECORD_LINES", 3):
+            records = reader.feed('"runaway,x\n' + "".join(f"row{index},y\n" for index in range(5)))
+            records += reader.close()
+
+        assert str(records[0][1]) == "Unterminated quoted field"
+        assert records[0][0] == 1
+        assert records[1:] == [(index + 2, [f"row{index}", "y"]) for index in range(5)]
+
+    def test_caps_line_without_newline(self):
+        """Test an endless line is reported once and dropped without growing the buffer."""
+        reader = CsvRecordReader()
+        with patch("src.application.services.csv_import.MAX_RECORD_CHARS", 20):
+            records = reader.feed("a,b\n")
+            for _ in range(50):
+                records += reader.feed("x" * 10)
+                assert len(reader._pending) <= 20
+            records += reader.feed("tail\nc,d\n")
+            records += reader.close()
+
+        assert records[0] == (1, ["a", "b"])
+        assert records[1][0] == 2
+        assert str(records[1][1]) == "CSV record is longer than 20 characters"
+        assert records[2:] == [(3, ["c", "d"])]
+
+    def test_caps_record_length(self):
+        """Test complete and multi-line quoted records over the length cap are reported, not returned."""
+        reader = CsvRecordReader()
+        with patch("src.application.services.csv_import.MAX_RECORD_CHARS", 20):
+            records = reader.feed("y" * 30 + ",z\n" + '"open\n' + "w" * 10 + "\n" + "v" * 10 + "\nok,1\n")
+            records += reader.close()
+
+        assert [line for line, _ in records[:2]] == [1, 2]
+        assert all(isinstance(record, ValueError) for _, record in records[:2])
+        assert records[-1] == (5, ["ok", "1"])
+
+    @pytest.mark.asyncio
+    async def test_decodes_utf8_with_bom_byte_by_byte(self):
+        """Test the BOM is dropped and multibyte characters split across chunks decode correctly."""
+        content = "\ufeffName\nИван Петров\n".encode()
+        records = [record async for record in iter_csv_records(byte_chunks(content, 1))]
+        assert records == [(1, ["Name"]), (2, ["Иван Петров"])]
+
+    @pytest.mark.asyncio
+    async def test_rejects_non_utf8(self):
+        """Test a non-UTF-8 upload fails with a readable error."""
+        with pytest.raises(ValueError, match="UTF-8"):
+            _ = [record async for record in iter_csv_records(byte_chunks("Имя".encode("cp1251"), 4))]
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestEmployeeCsvImport:
+    """Integration tests for the streaming CSV employee import."""
+
+    async def test_imports_sample_export_with_row_errors(
+        self,
+        employee_repo: EmployeeRepository,
+        position_repo: PositionRepository,
+        team_repo: TeamRepository,
+        user_repo: UserRepository,
+        admin_user,
+        admin_employee,
+        sample_employee,
+        session,
+    ):
+        """Test the bundled export imports in batches and bad rows are reported by line."""
+        with open("src/res/test_users.csv", "rb") as file:
+            content = file.read()
+        content += (
+            b'"User One Again","userone2","USERONE@stud.local","True"\n'
+            b'"John Doe","jdoe","test@example.com","True"\n'
+            b'"Maybe Enabled","maybe","maybe@stud.local","Yes"\n'
+            b'"Bad "Quote"","bad","bad@stud.local","True"\n'
+            # Кавычка внутри неквотированного поля — данные, следующие строки не склеиваются
+            b'"Stray Quote",stray"quote,"stray@stud.local","True"\n'
+        )
+        await user_repo.create(User(id=uuid4(), email="orgdir@stud.local", password_hash="existing", role="user"))
+        service = EmployeeCsvImportService(employee_repo, position_repo, team_repo, user_repo)
+
+        with patch("src.application.services.csv_import.IMPORT_BATCH_SIZE", 4):
+            report = await service.import_employees(
+                byte_chunks(content, 7),
+                team_name="Contractors",
+                position_title="Contractor",
+                creator=admin_user,
+                password_hash="$argon2id$unusable",
+            )
+        await session.commit()
+
+        assert report == {
+            "imported": 11,
+            "skipped": 2,
+            "failed": 5,
+            "errors": [
+                {"line": 2, "error": "UserPrincipalName is required"},
+                {"line": 15, "error": "Duplicate UserPrincipalName 'USERONE@stud.local'"},
+                {"line": 16, "error": "Employee with the same email already exists"},
+                {"line": 17, "error": "Enabled must be True or False"},
+                {"line": 18, "error": "Malformed CSV record: ',' expected after '\"'"},
+            ],
+        }
+
+        employee = await employee_repo.get_by_email("user1manager@stud.local")
+        assert (employee.first_name, employee.middle_name, employee.last_name) == ("User", "One", "Manager")
+        assert employee.team.name == "Contractors"
+        assert employee.team.leader_employee_id == admin_employee.id
+        assert employee.position.title == "Contractor"
+
+        assert (await employee_repo.get_by_email("stray@stud.local")).first_name == "Stray"
+
+        user = await user_repo.find_by_email("user1manager@stud.local")
+        assert (user.role, user.password_hash) == ("user", "$argon2id$unusable")
+        # Учётная запись без сотрудника сохраняется как есть, вторая не создаётся
+        assert (await user_repo.find_by_email("orgdir@stud.local")).password_hash == "existing"
+
+    async def test_rejects_missing_columns(
+        self,
+        employee_repo: EmployeeRepository,
+        position_repo: PositionRepository,
+        team_repo: TeamRepository,
+        user_repo: UserRepository,
+        admin_user,
+        sample_team,
+    ):
+        """Test a file without the required header fails before any row is written."""
+        service = EmployeeCsvImportService(employee_repo, position_repo, team_repo, user_repo)
+
+        with pytest.raises(ValueError, match="UserPrincipalName, Enabled"):
+            await service.import_employees(
+                byte_chunks(b"Name,SamAccountName\nA,a\n", 64),
+                team_name=sample_team.name,
+                position_title="Contractor",
+                creator=admin_user,
+                password_hash="hash",
+            )
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+class TestDirectoryExport:
+    """Integration tests for the streaming directory export."""
+
+    async def export(self, engine, export_format: str) -> bytes:
+        service = DirectoryExportService(async_sessionmaker(engine, expire_on_commit=False))
+        with patch("src.application.services.export.EXPORT_BATCH_SIZE", 1):
+            return b"".join([chunk async for chunk in service.stream(export_format)])
+
+    @pytest_asyncio.fixture
+    async def employee_on_vacation(self, employee_repo: EmployeeRepository, sample_employee, session):
+        await employee_repo.set_status(sample_employee.id, EmployeeStatus.VACATION)
+        await session.commit()
+        return sample_employee
+
+    async def test_csv_has_team_path_and_current_status(self, engine, employee_on_vacation, admin_employee):
+        """Test CSV rows carry the team path and the open status record."""
+        content = await self.export(engine, "csv")
+
+        assert content.startswith("\ufeff".encode())
+        rows = list(csv.DictReader(content.decode("utf-8-sig").splitlines()))
+        by_email = {row["email"]: row for row in rows}
+        assert len(rows) == 3
+        assert by_email["test@example.com"]["status"] == "vacation"
+        assert by_email["test@example.com"]["team"] == "Development"
+        assert by_email["test@example.com"]["hireDate"] == "2020-01-01"
+        assert by_email["admin@example.com"]["status"] == "active"
+
+    async def test_csv_neutralizes_formulas(self, engine, employee_repo: EmployeeRepository, sample_employee, session):
+        """Test cells that a spreadsheet would evaluate as formulas are exported as text."""
+        await employee_repo.update_partial(
+            sample_employee.id,
+            {"first_name": '=HYPERLINK("http://evil.example","x")', "city": "@SUM(1)"},
+        )
+        await session.commit()
+
+        content = await self.export(engine, "csv")
+
+        rows = csv.DictReader(content.decode("utf-8-sig").splitlines())
+        row = next(row for row in rows if row["email"] == "test@example.com")
+        assert row["firstName"] == '\'=HYPERLINK("http://evil.example","x")'
+        assert row["city"] == "'@SUM(1)"
+        assert row["lastName"] == "Doe"
+
+    async def test_csv_keeps_phone_numbers(self, engine, employee_repo: EmployeeRepository, sample_employee, session):
+        """Test phone numbers and negative numbers are exported unchanged, other +/- cells are not."""
+        await employee_repo.update_partial(
+            sample_employee.id,
+            {"phone": "+7 (900) 000-00-00", "city": "-15", "legal_entity": "+cmd|' /C calc'!A0"},
+        )
+        await session.commit()
+
+        content = await self.export(engine, "csv")
+
+        rows = csv.DictReader(content.decode("utf-8-sig").splitlines())
+        row = next(row for row in rows if row["email"] == "test@example.com")
+        assert row["phone"] == "+7 (900) 000-00-00"
+        assert row["city"] == "-15"
+        assert row["legalEntity"] == "'+cmd|' /C calc'!A0"
+
+    async def test_ndjson_keeps_team_as_list(self, engine, employee_on_vacation):
+        """Test each NDJSON line is a standalone JSON object."""
+        content = await self.export(engine, "ndjson")
+
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        record = next(record for record in records if record["email"] == "test@example.com")
+        assert record["team"] == ["Development"]
+        assert record["birthDate"] == "1990-01-01"
+        assert record["middleName"] == "Michael"
+
+    async def test_xlsx_is_a_valid_workbook(self, engine, employee_on_vacation, admin_employee):
+        """Test the streamed zip opens and the sheet holds the header plus one row per employee."""
+        content = await self.export(engine, "xlsx")
+
+        with zipfile.ZipFile(BytesIO(content)) as workbook:
+            assert workbook.testzip() is None
+            assert "xl/workbook.xml" in workbook.namelist()
+            sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+
+        namespace = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        rows = [
+            [cell.text or "" for cell in row.findall("x:c/x:is/x:t", namespace)]
+            for row in sheet.findall("x:sheetData/x:row", namespace)
+        ]
+        assert rows[0][:3] == ["id", "lastName", "firstName"]
+        assert len(rows) == 4
+        assert ["Doe", "John", "Michael", "test@example.com"] in [row[1:5] for row in rows]
@@ -1,6 +1,7 @@
 """Tests for repository layer."""
 import pytest
 import pytest_asyncio
+from datetime import date, datetime, timezone
 from uuid6 import uuid7
 
 from src.domain.models import User, Team, Position
@@ -8,6 +9,24 @@ from src.infrastructure.repositories.user import UserRepository
 from src.infrastructure.repositories.team import TeamRepository
 from src.infrastructure.repositories.position import PositionRepository
 from src.infrastructure.repositories.employee import EmployeeRepository
+from src.infrastructure.repositories.ad_sync_state import AdSyncStateRepository
+from src.utils.user import build_team_lookup, resolve_boss_id
+
+
+def employee_row(prefix: str, index: int, team_id, position_id, **overrides) -> dict:
+    """Row for EmployeeRepository.create_many with the required columns filled in."""
+    return {
+        "id": uuid7(),
+        "first_name": prefix.capitalize(),
+        "middle_name": "",
+        "birth_date": date(1990, 1, 1),
+        "hire_date": date(2020, 1, 1),
+        "email": f"{prefix}{index}@example.com",
+        "team_id": team_id,
+        "position_id": position_id,
+        "object_id": f"{prefix}-guid-{index}",
+        **overrides,
+    }
 
 
 @pytest.mark.integration
@@ -94,6 +113,54 @@ class TestTeamRepository:
         updated = await team_repo.update_parent(sample_team.id, None)
         assert updated.parent_id is None
     
+    @pytest.mark.asyncio
+    async def test_create_many(self, team_repo: TeamRepository, sample_team: Team, session):
+        """Test batch creation of child teams normalizes names."""
+        created = await team_repo.create_many([
+            {"name": "  Backend   Team ", "parent_id": sample_team.id, "leader_employee_id": sample_team.leader_employee_id},
+            {"name": "Frontend", "parent_id": sample_team.id, "leader_employee_id": sample_team.leader_employee_id},
+        ])
+        await session.commit()
+
+        assert sorted(team.name for team in created) == ["Backend Team", "Frontend"]
+        assert all(team.parent_id == sample_team.id for team in created)
+        assert await team_repo.find_by_name("backend team", parent_id=sample_team.id) is not None
+
+    @pytest.mark.asyncio
+    async def test_normalize_names_matches_stored_key(self, team_repo: TeamRepository, sample_team: Team, session):
+        """Test names are keyed by the same SQL expression as teams.normalized_name."""
+        created = await team_repo.create_many([
+            {"name": name, "parent_id": sample_team.id, "leader_employee_id": sample_team.leader_employee_id}
+            for name in ("Отдел Продаж", "Dev  Ops")
+        ])
+        await session.commit()
+
+        keys = await team_repo.normalize_names([team.name for team in created] + ["  dev ops"])
+
+        # lower() и \s в PostgreSQL зависят от локали базы, поэтому ключ не обязан совпадать с str.lower()
+        assert {team.name: keys[team.name] for team in created} == {
+            team.name: team.normalized_name for team in created
+        }
+        assert keys["  dev ops"] == keys["Dev Ops"]
+
+    @pytest.mark.asyncio
+    async def test_get_or_create_returns_existing_normalized(self, team_repo: TeamRepository, sample_team: Team, session):
+        """Test get_or_create matches an existing root team ignoring case and extra spaces."""
+        await session.commit()
+        team = await team_repo.get_or_create(
+            name="  development ", leader_employee_id=sample_team.leader_employee_id, parent_id=None
+        )
+        assert team.id == sample_team.id
+
+    @pytest.mark.asyncio
+    async def test_create_duplicate_root_team_rejected(self, team_repo: TeamRepository, sample_team: Team, session):
+        """Test the unique index treats NULL parent_id as equal for root teams."""
+        from sqlalchemy.exc import IntegrityError
+
+        await session.commit()
+        with pytest.raises(IntegrityError):
+            await team_repo.create(name="DEVELOPMENT", leader_employee_id=sample_team.leader_employee_id, parent_id=None)
+
     @pytest.mark.asyncio
     async def test_update_leader(self, team_repo: TeamRepository, sample_team: Team, session):
         """Test updating team leader."""
@@ -130,6 +197,44 @@ class TestPositionRepository:
         assert position.title == "New Position Title"
         assert position.id is not None
     
+    @pytest.mark.asyncio
+    async def test_create_many_and_get_by_titles(self, position_repo: PositionRepository, session):
+        """Test batch creation of positions with a single insert."""
+        created = await position_repo.create_many(["Analyst", "Designer"])
+        await session.commit()
+
+        assert sorted(position.title for position in created) == ["Analyst", "Designer"]
+        assert len({position.id for position in created}) == 2
+        assert {position.title for position in await position_repo.get_by_titles(["Analyst", "Nope"])} == {"Analyst"}
+        assert {"Analyst", "Designer"} <= {position.title for position in await position_repo.get_all()}
+        assert await position_repo.create_many([]) == []
+
+    @pytest.mark.asyncio
+    async def test_create_duplicate_title_rejected(self, position_repo: PositionRepository, sample_position: Position):
+        """Test the unique index on positions.title."""
+        from sqlalchemy.exc import IntegrityError
+
+        with pytest.raises(IntegrityError):
+            await position_repo.create(title=sample_position.title)
+
+    @pytest.mark.asyncio
+    async def test_get_or_create_caches_after_commit(self, session):
+        """Test positions reach the shared cache only once the transaction commits."""
+        from src.infrastructure.cache import PositionCache
+
+        cache = PositionCache()
+        repo = PositionRepository(session, cache=cache)
+
+        await repo.get_or_create(title="Rolled Back")
+        await session.rollback()
+        assert cache.get("Rolled Back") is None
+
+        position = await repo.get_or_create(title="Cached")
+        assert cache.get("Cached") is None
+        await session.commit()
+        assert cache.get("Cached") == position
+        assert await repo.get_or_create(title="Cached") is cache.get("Cached")
+    
     @pytest.mark.asyncio
     async def test_get_by_title_not_found(self, position_repo: PositionRepository):
         """Test finding position by non-existent title."""
@@ -153,6 +258,18 @@ class TestEmployeeRepository:
         employee = await employee_repo.get_by_email("nonexistent@example.com")
         assert employee is None
     
+    @pytest.mark.asyncio
+    async def test_lookups_hide_archived_employee(self, employee_repo: EmployeeRepository, sample_employee):
+        """Test archived employees are found only when explicitly requested."""
+        await employee_repo.update_partial(sample_employee.id, {"archived_at": datetime.now(timezone.utc)})
+
+        assert await employee_repo.get_by_id(sample_employee.id) is None
+        assert await employee_repo.get_by_email(sample_employee.email) is None
+        assert (await employee_repo.get_by_id(sample_employee.id, include_archived=True)).archived_at is not None
+        assert await employee_repo.get_by_email(sample_employee.email, include_archived=True) is not None
+        assert await employee_repo.is_archived(sample_employee.email) is True
+        assert await employee_repo.is_archived("nonexistent@example.com") is False
+
     @pytest.mark.asyncio
     async def test_get_all(self, employee_repo: EmployeeRepository, sample_employee, session):
         """Test getting all employees."""
@@ -161,3 +278,153 @@ class TestEmployeeRepository:
         assert isinstance(employees, list)
         # At least one from sample_employee
         assert len(employees) >= 1
+    
+    @pytest.mark.asyncio
+    async def test_create_many(
+        self, employee_repo: EmployeeRepository, sample_team: Team, sample_position: Position, session
+    ):
+        """Test bulk insert returns ids of all inserted employees."""
+        rows = [
+            employee_row("bulk", index, sample_team.id, sample_position.id, last_name=str(index))
+            for index in range(3)
+        ]
+
+        inserted_ids = await employee_repo.create_many(rows)
+        await session.commit()
+
+        assert sorted(inserted_ids) == sorted(row["id"] for row in rows)
+        assert {"bulk-guid-0", "bulk-guid-1", "bulk-guid-2"} <= await employee_repo.get_object_ids()
+    
+    @pytest.mark.asyncio
+    async def test_create_many_empty(self, employee_repo: EmployeeRepository):
+        """Test bulk insert of nothing is a no-op."""
+        assert await employee_repo.create_many([]) == []
+    
+    @pytest.mark.asyncio
+    async def test_update_many_and_fingerprints(
+        self, employee_repo: EmployeeRepository, sample_team: Team, sample_position: Position, session
+    ):
+        """Test batched update by id changes only the targeted rows."""
+        rows = [
+            employee_row("synced", index, sample_team.id, sample_position.id, ad_fingerprint="old")
+            for index in range(2)
+        ]
+        await employee_repo.create_many(rows)
+
+        await employee_repo.update_many([
+            {"id": rows[0]["id"], "phone": "+79000000000", "ad_fingerprint": "new"},
+        ])
+        await session.commit()
+
+        fingerprints = await employee_repo.get_ad_fingerprints()
+        assert fingerprints["synced-guid-0"] == (rows[0]["id"], "new")
+        assert fingerprints["synced-guid-1"] == (rows[1]["id"], "old")
+
+        updated = await employee_repo.get_by_id(rows[0]["id"])
+        assert updated.phone == "+79000000000"
+        assert updated.birth_date == date(1990, 1, 1)
+    
+    @pytest.mark.asyncio
+    async def test_archive_and_restore_by_object_ids(
+        self, employee_repo: EmployeeRepository, sample_team: Team, sample_position: Position, session
+    ):
+        """Test archived employees disappear from directory queries until restored."""
+        rows = [employee_row("archived", index, sample_team.id, sample_position.id) for index in range(2)]
+        await employee_repo.create_many(rows)
+
+        assert await employee_repo.archive_by_object_ids(["archived-guid-0", "unknown-guid"]) == 1
+        assert await employee_repo.archive_by_object_ids(["archived-guid-0"]) == 0
+        await session.commit()
+
+        visible_ids = {employee.id for employee in await employee_repo.get_all()}
+        team_ids = {employee.id for employee in await employee_repo.get_by_team_id(sample_team.id)}
+        assert rows[0]["id"] not in visible_ids | team_ids
+        assert rows[1]["id"] in visible_ids & team_ids
+        assert await employee_repo.get_archived_object_ids() == {"archived-guid-0"}
+        assert (await employee_repo.get_by_id(rows[0]["id"], include_archived=True)).archived_at is not None
+
+        assert await employee_repo.restore_by_object_ids(["archived-guid-0"]) == 1
+        await session.commit()
+
+        assert await employee_repo.get_archived_object_ids() == set()
+        assert rows[0]["id"] in {employee.id for employee in await employee_repo.get_all()}
+
+    @pytest.mark.asyncio
+    async def test_set_managers_by_object_id(
+        self, employee_repo: EmployeeRepository, sample_team: Team, sample_position: Position, session
+    ):
+        """Test manager links resolve by object id and unknown managers clear the link."""
+        rows = [employee_row("linked", index, sample_team.id, sample_position.id) for index in range(3)]
+        await employee_repo.create_many(rows)
+
+        links = [("linked-guid-1", "linked-guid-0"), ("linked-guid-2", "linked-guid-0")]
+        assert await employee_repo.set_managers_by_object_id(links) == 2
+        assert await employee_repo.set_managers_by_object_id(links) == 0
+
+        assert await employee_repo.set_managers_by_object_id([("linked-guid-2", "unknown-guid")]) == 1
+        await session.commit()
+
+        assert (await employee_repo.get_by_id(rows[1]["id"])).manager_id == rows[0]["id"]
+        assert (await employee_repo.get_by_id(rows[2]["id"])).manager_id is None
+        assert await employee_repo.set_managers_by_object_id([]) == 0
+
+    @pytest.mark.asyncio
+    async def test_direct_reports_and_chain_match_resolve_boss_id(
+        self, employee_repo: EmployeeRepository, team_repo: TeamRepository, sample_position: Position, session
+    ):
+        """Test the recursive queries agree with resolve_boss_id on a small org tree."""
+        a, b, c, d, e, f = (uuid7() for _ in range(6))
+        root, child, grandchild, sibling = (uuid7() for _ in range(4))
+        # Связь команды с лидером отложенная, поэтому команды вставляются раньше сотрудников
+        await team_repo.create_many([
+            {"id": root, "name": "Org Root", "parent_id": None, "leader_employee_id": a},
+            {"id": child, "name": "Child", "parent_id": root, "leader_employee_id": b},
+            {"id": grandchild, "name": "Grandchild", "parent_id": child, "leader_employee_id": b},
+            {"id": sibling, "name": "Sibling", "parent_id": root, "leader_employee_id": d},
+        ])
+        members = {a: root, e: root, b: child, c: grandchild, d: sibling, f: sibling}
+        await employee_repo.create_many([
+            employee_row(
+                "org",
+                index,
+                team_id,
+                sample_position.id,
+                id=employee_id,
+                last_name=str(index),
+                object_id=None,
+                manager_id=e if employee_id == f else None,
+            )
+            for index, (employee_id, team_id) in enumerate(members.items())
+        ])
+        await session.commit()
+
+        lookup = build_team_lookup(await team_repo.get_all())
+        employees = [await employee_repo.get_by_id(employee_id) for employee_id in members]
+        for manager_id in members:
+            reports = {employee.id for employee in await employee_repo.get_direct_reports(manager_id)}
+            expected = {employee.id for employee in employees if resolve_boss_id(employee, lookup) == manager_id}
+            assert reports == expected
+
+        assert {employee.id for employee in await employee_repo.get_direct_reports(a)} == {b, d, e}
+        assert [employee.id for employee in await employee_repo.get_reporting_chain(c)] == [b, a]
+        assert [employee.id for employee in await employee_repo.get_reporting_chain(f)] == [e, a]
+        assert await employee_repo.get_reporting_chain(a) == []
+
+
+@pytest.mark.integration
+class TestAdSyncStateRepository:
+    """Tests for AdSyncStateRepository."""
+    
+    @pytest.mark.asyncio
+    async def test_save_upserts_watermark_per_server(self, session):
+        """Test watermarks are stored per domain controller and overwritten on save."""
+        repo = AdSyncStateRepository(session)
+        
+        await repo.save("CN=DC1", 100)
+        await repo.save("CN=DC2", 7)
+        state = await repo.save("CN=DC1", 250)
+        await session.commit()
+        
+        assert state.server_id == "CN=DC1"
+        assert state.highest_usn == 250
+        assert await repo.get_watermarks() == {"CN=DC1": 250, "CN=DC2": 7}
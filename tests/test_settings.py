@@ -17,3 +17,19 @@ class TestSettings:
     def test_ad_settings_exist(self):
         """Test that AD settings exist."""
         assert hasattr(settings, 'ad')
+    
+    def test_ad_attributes_cover_mapped_fields(self):
+        """Test the default AD attribute list includes what the import maps."""
+        from src.config.settings import ActiveDirectorySettings
+
+        ad_settings = ActiveDirectorySettings(host="localhost", base_dn="DC=example,DC=com")
+        assert {"objectGUID", "mail", "manager", "distinguishedName"} <= set(ad_settings.attributes)
+    
+    def test_ad_attributes_from_env(self, monkeypatch):
+        """Test the AD attribute list can be overridden with a JSON env value."""
+        from src.config.settings import Settings
+
+        monkeypatch.setenv("AD__HOST", "localhost")
+        monkeypatch.setenv("AD__BASE_DN", "DC=example,DC=com")
+        monkeypatch.setenv("AD__ATTRIBUTES", '["objectGUID", "mail"]')
+        assert Settings().ad.attributes == ["objectGUID", "mail"]
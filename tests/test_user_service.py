@@ -5,7 +5,7 @@ testing all main functionality including CRUD operations, team management,
 and user role handling.
 """
 import pytest
-from datetime import date
+from datetime import date, datetime, timezone
 from uuid import UUID
 
 from uuid6 import uuid7
@@ -228,6 +228,57 @@ class TestUserServiceGetUser:
         assert user_dto.boss.fullName == "Manager Boss The"
 
 
+@pytest.mark.integration
+class TestUserServiceReports:
+    """Tests for the list_reports and get_chain methods."""
+
+    @pytest.mark.asyncio
+    async def test_reports_and_chain_of_team_members(
+        self,
+        user_service: UserService,
+        sample_employee: Employee,
+        sample_user: User,
+        sample_team: Team,
+        session,
+    ):
+        """Test team members report to the team leader and the chain points back to them."""
+        await session.commit()
+        leader_id = sample_team.leader_employee_id
+
+        reports = await user_service.list_reports(leader_id)
+        assert [report.id for report in reports] == [str(sample_employee.id)]
+        assert reports[0].boss.id == str(leader_id)
+        assert reports[0].isAdmin is False
+
+        chain = await user_service.get_chain(sample_employee.id)
+        assert [boss.id for boss in chain] == [str(leader_id)]
+        assert chain[0].boss is None
+        assert await user_service.list_reports(sample_employee.id) == []
+
+    @pytest.mark.asyncio
+    async def test_reports_and_chain_nonexistent(
+        self,
+        user_service: UserService,
+    ):
+        """Test unknown employees return None rather than an empty list."""
+        assert await user_service.list_reports(uuid7()) is None
+        assert await user_service.get_chain(uuid7()) is None
+
+    @pytest.mark.asyncio
+    async def test_archived_employee_is_not_found(
+        self,
+        user_service: UserService,
+        employee_repo: EmployeeRepository,
+        sample_employee: Employee,
+    ):
+        """Test an archived employee is hidden from the profile, reports and chain lookups."""
+        await employee_repo.update_partial(sample_employee.id, {"archived_at": datetime.now(timezone.utc)})
+
+        assert await user_service.get_user(sample_employee.id) is None
+        assert await user_service.list_reports(sample_employee.id) is None
+        assert await user_service.get_chain(sample_employee.id) is None
+
+
 @pytest.mark.integration
 class TestUserServiceGetMe:
     """Tests for the get_me method."""
@@ -518,6 +569,32 @@ class TestUserServiceUpdateUser:
         assert updated_user is not None
         assert "Backend Team" in updated_user.team
 
+    @pytest.mark.asyncio
+    async def test_update_user_sets_and_clears_manager(
+        self,
+        user_service: UserService,
+        sample_employee: Employee,
+        admin_employee: Employee,
+        sample_user: User,
+        session,
+    ):
+        """Test an explicit manager becomes the boss and null clears it."""
+        await session.commit()
+
+        updated_user = await user_service.update_user(
+            sample_employee.id, AdminUserUpdatePayload(managerId=admin_employee.id)
+        )
+        assert updated_user.boss.id == str(admin_employee.id)
+
+        with pytest.raises(ValueError, match="own manager"):
+            await user_service.update_user(sample_employee.id, AdminUserUpdatePayload(managerId=sample_employee.id))
+        with pytest.raises(ValueError, match="not found"):
+            await user_service.update_user(sample_employee.id, AdminUserUpdatePayload(managerId=uuid7()))
+
+        await user_service.update_user(sample_employee.id, AdminUserUpdatePayload(managerId=None))
+        employee = await user_service.employee_repo.get_by_id(sample_employee.id)
+        assert employee.manager_id is None
+
     @pytest.mark.asyncio
     async def test_update_user_nonexistent(
         self,
@@ -207,6 +207,23 @@ def test_resolve_boss_id():
     assert boss_id == leader_id
 
 
+def test_resolve_boss_id_prefers_manager():
+    """Test an explicit manager wins over the team leader."""
+    manager_id = uuid7()
+    team_obj = Team(id=uuid7(), name="Team", parent_id=None, leader_employee_id=uuid7())
+
+    class MockEmp:
+        id = uuid7()
+        team = team_obj
+
+    employee = MockEmp()
+    employee.manager_id = manager_id
+    assert resolve_boss_id(employee, {team_obj.id: team_obj}) == manager_id
+
+    employee.manager_id = employee.id
+    assert resolve_boss_id(employee, {team_obj.id: team_obj}) == team_obj.leader_employee_id
+
+
 def test_resolve_boss_id_no_team():
     """Test resolving boss ID with no team."""
     class MockEmp: